@@ -0,0 +1,274 @@
+"""
+Per-user candidate pools, precomputed offline and re-ranked online.
+
+build_pools() scores every user with purchase history against the whole
+catalogue, a block of users at a time:
+    - collaborative: ALS preference (user factors x item factors)
+    - content: mean content similarity to the user's last three products
+    - popular-expiring: units sold and buyers of products expiring within 30 days
+Purchased, expired, out-of-stock and diet/allergy incompatible products are
+dropped, and each source contributes its best products to a pool of
+`pool_size`, ranked by the urgency-free hybrid base score
+0.6 * collaborative + 0.4 * content.
+
+save_pools() writes the pools as one file of consecutive .npy arrays (meta,
+user ids, product ids, candidate positions, base scores); load_pools()
+memory-maps them, so serving processes share the pages and only touch the
+rows they read. recommend() re-ranks a pool with today's urgency, stock,
+the user's purchases so far and at-risk flags, so request cost depends on pool_size,
+not on the catalogue.
+
+    python scripts/build_candidate_pools.py --output candidate_pools.npy   # hourly, e.g. from cron
+    CANDIDATE_POOLS_PATH=candidate_pools.npy uvicorn main_supabase_unified:app
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from unified_waste_reduction_system import compatible_products_mask, diet_ranks, user_allergy_mask
+
+POOL_SIZE = 200
+# Share of the pool each source fills before ranking
+SOURCE_SHARES = {'collaborative': 0.5, 'content': 0.3, 'popular': 0.2}
+URGENCY_BOOST = 0.5   # hybrid: score * (1 + urgency * 0.5)
+AT_RISK_BOOST = 0.15  # hybrid: + 0.15 for dead stock risk products
+
+
+def _top(scores, k):
+    """Column positions of the k best finite scores per row, -1 where a row has fewer"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.full((scores.shape[0], 0), -1, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.where(np.isfinite(np.take_along_axis(scores, top, axis=1)), top, -1)
+
+
+def _last_products(transactions_df, seeds=3):
+    """The last `seeds` distinct products per user, in the order the hybrid recommender picks them"""
+    history = transactions_df[['user_id', 'product_id']].drop_duplicates()
+    return history.groupby('user_id', sort=False).tail(seeds)
+
+
+def _popularity(system):
+    """Urgency-free popular-expiring score per products_df row (-inf outside the 30 day window)"""
+    products = system.products_df
+    sold = system.transactions_df.groupby('product_id').agg(quantity=('quantity', 'sum'), buyers=('user_id', 'nunique'))
+    sold = sold.reindex(products['product_id'])
+    score = sold['quantity'].fillna(0).to_numpy() * 0.3 + sold['buyers'].fillna(0).to_numpy() * 0.2
+    days = products['days_until_expiry'].to_numpy()
+    return np.where((days > 0) & (days <= 30), score, -np.inf)
+
+
+def build_pools(system, pool_size=POOL_SIZE, collaborative_weight=0.6, content_weight=0.4, block_elements=4_000_000):
+    """Pools for every user with purchase history; returns a CandidatePools"""
+    if system.content_similarity_matrix is None:
+        system.build_content_similarity_matrix()
+    if system.collaborative_model is None:
+        system.build_collaborative_filtering_model()
+    products = system.products_df
+    n_products = len(products)
+    product_ids = products['product_id'].astype(str).to_numpy()
+    similarity = np.asarray(system.content_similarity_matrix, dtype=np.float32)
+
+    # Catalogue-wide vectors (positions are products_df rows)
+    available = (products['days_until_expiry'].to_numpy() > 0) & (products['inventory_quantity'].to_numpy() > 0)
+    product_ranks = diet_ranks(products['diet_type'])
+    product_allergens = products['allergen_bits'].to_numpy().astype(np.int64)
+    popularity = np.where(available, _popularity(system), -np.inf).astype(np.float32)
+    model_columns = system.product_index.get_indexer(product_ids)  # -1: never sold, no item factors
+    sold = model_columns >= 0
+    catalogue_of_column = np.full(len(system.product_index), -1, dtype=np.int64)
+    catalogue_of_column[model_columns[sold]] = np.flatnonzero(sold)
+
+    # Users with purchase history, and their seed products for content similarity
+    seeds = _last_products(system.transactions_df)
+    users = system.users_df[system.users_df['user_id'].isin(seeds['user_id'])].drop_duplicates('user_id')
+    user_ids = users['user_id'].astype(str).to_numpy()
+    user_ranks = diet_ranks(users['diet_type'])
+    user_allergies = np.array([user_allergy_mask(user, system.allergen_vocabulary)
+                               for user in users[['allergies']].to_dict('records')], dtype=np.int64)
+    user_rows = system.user_index.get_indexer(users['user_id'])
+    seed_users = pd.Index(users['user_id']).get_indexer(seeds['user_id'])
+    seed_products = system.product_positions(seeds['product_id'])
+    alive = (seed_users >= 0) & (seed_products >= 0)  # expired seeds have no similarity row
+    seed_users, seed_products = seed_users[alive], seed_products[alive]
+    seeds_per_user = np.bincount(seed_users, minlength=len(users))
+
+    shares = {name: int(pool_size * share) for name, share in SOURCE_SHARES.items()}
+    shares['collaborative'] += pool_size - sum(shares.values())
+    candidates = np.full((len(users), pool_size), -1, dtype=np.int32)
+    scores = np.zeros((len(users), pool_size), dtype=np.float32)
+    block = max(1, block_elements // max(n_products, 1))
+    seed_matrix = csr_matrix(
+        (1 / seeds_per_user[seed_users], (seed_users, seed_products)), shape=(len(users), n_products), dtype=np.float32
+    )
+
+    for start in range(0, len(users), block):
+        stop = min(start + block, len(users))
+        rows = user_rows[start:stop]
+        known = rows >= 0
+
+        collaborative = np.zeros((stop - start, n_products), dtype=np.float32)
+        purchased = np.zeros((stop - start, n_products), dtype=bool)
+        if known.any():
+            collaborative[np.ix_(known, sold)] = (system.user_factors[rows[known]] @ system.item_factors.T)[:, model_columns[sold]]
+            bought = system.user_item_matrix[rows[known]].tocoo()
+            in_catalogue = catalogue_of_column[bought.col] >= 0
+            purchased[np.flatnonzero(known)[bought.row[in_catalogue]], catalogue_of_column[bought.col[in_catalogue]]] = True
+        content = (seed_matrix[start:stop] @ similarity).astype(np.float32, copy=False)
+        allowed = (
+            available[None, :] & ~purchased
+            & (product_ranks[None, :] <= user_ranks[start:stop, None])
+            & ((product_allergens[None, :] & user_allergies[start:stop, None]) == 0)
+        )
+        base = collaborative_weight * collaborative + content_weight * content
+
+        picked = np.concatenate([
+            _top(np.where(allowed, collaborative, -np.inf), shares['collaborative']),
+            _top(np.where(allowed, content, -np.inf), shares['content']),
+            _top(np.where(allowed, popularity[None, :], -np.inf), shares['popular']),
+        ], axis=1)
+        # One entry per product, ranked by base score
+        picked.sort(axis=1)
+        picked[:, 1:][picked[:, 1:] == picked[:, :-1]] = -1
+        ranked = np.where(picked >= 0, np.take_along_axis(base, np.maximum(picked, 0), axis=1), -np.inf)
+        order = np.argsort(-ranked, axis=1, kind='stable')[:, :pool_size]
+        picked = np.take_along_axis(picked, order, axis=1)
+        ranked = np.take_along_axis(ranked, order, axis=1)
+        width = picked.shape[1]
+        candidates[start:stop, :width] = np.where(np.isfinite(ranked), picked, -1)
+        scores[start:stop, :width] = np.where(np.isfinite(ranked), ranked, 0)
+
+    return CandidatePools(user_ids, product_ids, candidates, scores, generated_at=time.time())
+
+
+class CandidatePools:
+    """candidates[u] are positions into product_ids (-1 padded), scores[u] their base scores"""
+
+    def __init__(self, user_ids, product_ids, candidates, scores, generated_at):
+        self.user_ids = user_ids
+        self.product_ids = product_ids
+        self.candidates = candidates
+        self.scores = scores
+        self.generated_at = generated_at
+        self._rows = pd.Index(user_ids)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def pool(self, user_id):
+        """(product ids, base scores) of the user's pool, or None if there is none"""
+        row = self._rows.get_indexer([user_id])[0]
+        if row < 0:
+            return None
+        candidates = np.asarray(self.candidates[row])
+        valid = candidates >= 0
+        return self.product_ids[candidates[valid]], np.asarray(self.scores[row])[valid]
+
+    def recommend(self, system, user_id, n_recommendations=10):
+        """
+        Re-rank the user's pool with current urgency, stock, purchases and
+        compatibility, in the hybrid recommender's output format. None if the
+        user has no pool.
+        """
+        pool = self.pool(user_id)
+        user = system.user_record(user_id) if pool is not None else None
+        if user is None:
+            return None
+        product_ids, base = pool
+        positions = system.product_positions(product_ids)
+        # Everything bought by now, including purchases after the pools were built
+        keep = (positions >= 0) & ~np.isin(product_ids, system.purchased_products(user_id))
+        products = system.products_df.iloc[positions[keep]]
+        base = base[keep].astype(np.float64)
+
+        keep = (products['inventory_quantity'].to_numpy() > 0) & compatible_products_mask(
+            user, products, system.allergen_vocabulary
+        )
+        products, base = products[keep], base[keep]
+        urgency = system.pricing_engine.calculate_dynamic_urgency_scores(products)
+        at_risk = products['is_dead_stock_risk'].to_numpy() == 1
+        ranked = pd.DataFrame({
+            'product_id': products['product_id'].to_numpy(),
+            'product_name': products['name'].to_numpy(),
+            # The hybrid recommender boosts each source by (1 + urgency), then the blend by (1 + 0.5 * urgency)
+            'hybrid_score': base * (1 + urgency) * (1 + URGENCY_BOOST * urgency) + AT_RISK_BOOST * at_risk,
+            'base_score': base,
+            'urgency_score': urgency,
+            'days_until_expiry': products['days_until_expiry'].to_numpy(),
+            'category': products['category'].astype(str).to_numpy(),
+            'price': products['price_mrp'].to_numpy(),
+            'discount': products['current_discount_percent'].to_numpy(),
+            'is_dead_stock_risk': products['is_dead_stock_risk'].to_numpy(),
+        })
+        return ranked.nlargest(n_recommendations, 'hybrid_score')
+
+
+def save_pools(path, pools):
+    """Write the pools to `path` atomically (readers of the old file keep their mapping)"""
+    arrays = (
+        np.array([pools.generated_at], dtype=np.float64),
+        np.asarray(pools.user_ids, dtype=str),
+        np.asarray(pools.product_ids, dtype=str),
+        np.ascontiguousarray(pools.candidates, dtype=np.int32),
+        np.ascontiguousarray(pools.scores, dtype=np.float32),
+    )
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as f:
+        for array in arrays:
+            np.lib.format.write_array(f, array, allow_pickle=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def load_pools(path):
+    """Memory-map a file written by save_pools"""
+    arrays = []
+    with open(path, 'rb') as f:
+        for _ in range(5):
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+            size = int(np.prod(shape)) * dtype.itemsize
+            if size:
+                arrays.append(np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                                        order='F' if fortran_order else 'C'))
+            else:
+                arrays.append(np.empty(shape, dtype=dtype))
+            f.seek(offset + size)
+    meta, user_ids, product_ids, candidates, scores = arrays
+    return CandidatePools(np.asarray(user_ids), np.asarray(product_ids), candidates, scores, generated_at=float(meta[0]))
+
+
+class PoolFile:
+    """Pools at a path, reloaded when the offline job replaces the file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.pools = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return self.pools
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self.pools = load_pools(self.path)
+                    self._mtime = mtime
+        return self.pools
+
+    def recommend(self, system, user_id, n_recommendations=10):
+        pools = self.current()
+        return pools.recommend(system, user_id, n_recommendations) if pools is not None else None
@@ -0,0 +1,59 @@
+"""
+Fast JSON serialization path for large list endpoints.
+
+Builds response bodies as plain dicts/lists and encodes them with orjson,
+skipping per-row pydantic model construction and FastAPI's response
+re-validation. Endpoints keep their declared response models, so the OpenAPI
+schema is unchanged; the fast path is enabled with FAST_JSON_RESPONSES=true.
+"""
+import json
+import os
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library encoder
+    orjson = None
+
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+
+def _default(obj):
+    """Encode numpy scalars/arrays and anything else orjson does not know about"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (numpy aware) when available"""
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def columns_to_records(columns):
+    """Zip a dict of equal-length column lists into row dicts"""
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*(columns[key] for key in keys))]
+
+
+def paginated_body(items, total_items, page, page_size, items_key="products"):
+    """Same layout as the Paginated*Response models"""
+    total_pages = (total_items + page_size - 1) // page_size
+    return {
+        items_key: items,
+        "total_items": total_items,
+        "total_pages": total_pages,
+        "current_page": page,
+        "page_size": page_size,
+        "has_next": page < total_pages,
+        "has_previous": page > 1,
+    }
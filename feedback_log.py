@@ -0,0 +1,184 @@
+"""
+Append-only feedback event log with periodic compaction.
+
+Purchases, clicks and views are appended to per-column lists (O(1) per
+event, no DataFrame work on the hot path). Once `max_events` events are
+buffered or the oldest is `max_age_seconds` old, compact() swaps the buffer
+out and hands one FeedbackBatch to `on_compact`: purchases as transaction
+rows to append to the transactions store in a single concat, and views and
+clicks counted per (user, product), kept apart from purchases.
+
+    log = FeedbackLog(on_compact=apply_feedback, max_events=1000, max_age_seconds=300)
+    log.append('U1', 'P7', 'view')
+    log.compact_if_due()
+
+start() moves compaction to a background thread: appends only buffer, and the
+compactor runs on_compact (e.g. a model refresh) when the buffer fills or its
+oldest event ages out, also after a quiet period with no appends.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_TYPES = ('purchase', 'click', 'view')
+COLUMNS = ('user_id', 'product_id', 'feedback_type', 'quantity', 'rating', 'timestamp')
+ENGAGEMENT_COLUMNS = ['user_id', 'product_id', 'clicks', 'views']
+
+# purchases: transaction rows; engagement: clicks/views per (user_id, product_id); events: every raw event
+FeedbackBatch = namedtuple('FeedbackBatch', ['purchases', 'engagement', 'events'])
+
+
+def merge_engagement(engagement_df, new_engagement):
+    """Add new click/view counts onto a running per (user, product) engagement table"""
+    if engagement_df is None or engagement_df.empty:
+        return new_engagement.reset_index(drop=True)
+    if new_engagement.empty:
+        return engagement_df
+    return pd.concat([engagement_df, new_engagement]).groupby(
+        ['user_id', 'product_id'], as_index=False, sort=False
+    )[['clicks', 'views']].sum()
+
+
+class FeedbackLog:
+    def __init__(self, on_compact=None, max_events=1000, max_age_seconds=300.0, clock=time.monotonic):
+        """on_compact(batch) is called with each FeedbackBatch, one compaction at a time and in order"""
+        self.on_compact = on_compact
+        self.max_events = max_events
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self.events_total = 0
+        self.compactions = 0
+        self._buffer = self._empty_buffer()
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        self._thread = None
+
+    @staticmethod
+    def _empty_buffer():
+        return {column: [] for column in COLUMNS}
+
+    def append(self, user_id, product_id, feedback_type='purchase', quantity=None, rating=None, timestamp=None):
+        """Buffer one event; returns True when a compaction is due"""
+        if feedback_type not in FEEDBACK_TYPES:
+            raise ValueError(f"Unknown feedback type: {feedback_type}")
+        if quantity is None:
+            quantity = 1 if feedback_type == 'purchase' else 0
+        with self._lock:
+            buffer = self._buffer
+            buffer['user_id'].append(user_id)
+            buffer['product_id'].append(product_id)
+            buffer['feedback_type'].append(feedback_type)
+            buffer['quantity'].append(quantity)
+            buffer['rating'].append(rating)
+            buffer['timestamp'].append(timestamp or datetime.now())
+            if self._oldest is None:
+                self._oldest = self.clock()
+            self.events_total += 1
+            full = len(buffer['user_id']) >= self.max_events
+            if full:
+                self._wakeup.notify()
+            return full
+
+    def __len__(self):
+        return len(self._buffer['user_id'])
+
+    def due(self):
+        """Size or age threshold reached"""
+        oldest = self._oldest
+        return len(self) >= self.max_events or (
+            oldest is not None and self.clock() - oldest >= self.max_age_seconds
+        )
+
+    def compact(self):
+        """Drain the buffer into one FeedbackBatch (None if empty) and pass it to on_compact"""
+        with self._compact_lock:
+            with self._lock:
+                buffer, self._buffer = self._buffer, self._empty_buffer()
+                self._oldest = None
+            if not buffer['user_id']:
+                return None
+            batch = self._batch(pd.DataFrame(buffer))
+            if self.on_compact is not None:
+                self.on_compact(batch)
+            self.compactions += 1
+            return batch
+
+    def compact_if_due(self):
+        return self.compact() if self.due() else None
+
+    # --- background compactor ---
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        """Compact in a background thread from now on; callers only append"""
+        self._thread = threading.Thread(target=self._run, name="feedback-compactor", daemon=True)
+        self._thread.start()
+        return self
+
+    def _seconds_until_due(self):
+        oldest = self._oldest
+        if oldest is None:
+            return self.max_age_seconds
+        return max(0.0, self.max_age_seconds - (self.clock() - oldest))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._stopping and not self.due():
+                    self._wakeup.wait(self._seconds_until_due())
+                stopping = self._stopping
+            try:
+                if stopping:
+                    self.compact()
+                    return
+                self.compact_if_due()
+            except Exception as e:
+                logger.error(f"Feedback compaction failed: {e}")
+
+    def close(self):
+        """Stop the compactor after compacting whatever is buffered"""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def _batch(events):
+        bought = events[events['feedback_type'] == 'purchase']
+        purchases = pd.DataFrame({
+            'user_id': bought['user_id'].to_numpy(),
+            'product_id': bought['product_id'].to_numpy(),
+            'purchase_date': pd.to_datetime(bought['timestamp']).to_numpy(),
+            'quantity': bought['quantity'].to_numpy(),
+            'user_engaged_with_deal': 0,
+        })
+        if bought['rating'].notna().any():
+            purchases['rating'] = bought['rating'].to_numpy()
+
+        engaged = events[events['feedback_type'] != 'purchase']
+        if engaged.empty:
+            engagement = pd.DataFrame(columns=ENGAGEMENT_COLUMNS)
+        else:
+            engagement = (
+                engaged.groupby(['user_id', 'product_id', 'feedback_type'], sort=False).size()
+                .unstack(fill_value=0)
+                .reindex(columns=['click', 'view'], fill_value=0)
+                .rename(columns={'click': 'clicks', 'view': 'views'})
+                .reset_index()
+            )
+            engagement.columns.name = None
+        return FeedbackBatch(purchases, engagement, events)
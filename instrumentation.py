@@ -0,0 +1,180 @@
+"""
+Lightweight per-stage timers and counters for the recommendation and pricing engines.
+
+    with instrumentation.stage('hybrid.collaborative'):
+        ...
+    instrumentation.count('hybrid.candidates', len(candidates))
+
+Disabled by default (STAGE_TIMING=true enables it at startup, enable() at
+runtime). When disabled stage() returns a shared no-op context manager and
+count() returns immediately, so the hooks cost one flag check. When enabled,
+stages aggregate count/total/max per name, and trace() optionally emits one
+structured JSON log line per traced call with that call's stage breakdown.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+_enabled = os.getenv("STAGE_TIMING", "false").lower() == "true"
+_log_traces = os.getenv("STAGE_TIMING_LOG", "false").lower() == "true"
+_lock = threading.Lock()
+_stages = {}    # name -> [count, total_seconds, max_seconds]
+_counters = {}  # name -> int
+_current_trace = ContextVar("stage_trace", default=None)
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def enable(enabled=True, log_traces=None):
+    """Switch instrumentation (and optionally structured trace logs) at runtime"""
+    global _enabled, _log_traces
+    _enabled = bool(enabled)
+    if log_traces is not None:
+        _log_traces = bool(log_traces)
+
+
+def is_enabled():
+    return _enabled
+
+
+def stage(name):
+    """Context manager timing one stage"""
+    if not _enabled:
+        return _NOOP
+    return _Stage(name)
+
+
+def timed(name):
+    """Decorator timing every call of a function as one stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def record(name, seconds):
+    """Add one timed observation of a stage"""
+    with _lock:
+        entry = _stages.get(name)
+        if entry is None:
+            _stages[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["stages"][name] = trace["stages"].get(name, 0.0) + seconds
+
+
+def count(name, n=1):
+    """Increment a counter (candidates seen, items filtered, ...)"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["counters"][name] = trace["counters"].get(name, 0) + n
+
+
+class _Trace:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.data = {"stages": {}, "counters": {}}
+        self.token = _current_trace.set(self.data)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        total = time.perf_counter() - self.started
+        _current_trace.reset(self.token)
+        record(self.name, total)
+        logger.info(json.dumps({
+            "trace": self.name,
+            **self.fields,
+            "total_ms": round(total * 1000, 3),
+            "stages_ms": {name: round(s * 1000, 3) for name, s in self.data["stages"].items()},
+            "counters": self.data["counters"],
+        }, default=str))
+        return False
+
+
+def trace(name, **fields):
+    """Time a whole call; with trace logging on, log its per-stage breakdown as one JSON line"""
+    if not _enabled:
+        return _NOOP
+    if not _log_traces:
+        return _Stage(name)
+    return _Trace(name, fields)
+
+
+def snapshot():
+    """Aggregated stage timings and counters since the last reset"""
+    with _lock:
+        stages = {name: list(entry) for name, entry in _stages.items()}
+        counters = dict(_counters)
+    return {
+        "enabled": _enabled,
+        "log_traces": _log_traces,
+        "stages": {
+            name: {
+                "count": n,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total / n * 1000, 3),
+                "max_ms": round(peak * 1000, 3),
+            }
+            for name, (n, total, peak) in sorted(stages.items())
+        },
+        "counters": dict(sorted(counters.items())),
+    }
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
@@ -0,0 +1,331 @@
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# Cost price fallback used across the API when a product has no cost_price
+COST_PRICE_FALLBACK_RATIO = 0.45
+
+# Bucket for products with no category, so they still count towards the totals
+UNKNOWN_CATEGORY = 'Unknown'
+
+
+def expiry_week_id(dates):
+    """
+    Map dates to absolute expiry-week bucket ids.
+
+    Weeks follow the /weekly_expired windows: week N ends on a Monday and covers
+    the six days before it, so every date belongs to the bucket of the first
+    Monday on or after it. Ids are absolute (not relative to today), which means
+    a day rollover only moves the current id - nothing has to be rebuilt.
+    """
+    ordinals = pd.to_datetime(pd.Series(dates)).dt.normalize()
+    days = ((ordinals - pd.Timestamp('1970-01-05')) // pd.Timedelta(days=1)).to_numpy()
+    # 1970-01-05 is a Monday: a date is in the bucket ending ceil(days / 7) weeks later
+    return -((-days) // 7)
+
+
+class WeeklyExpiredCube:
+    """
+    Precomputed (expiry week x category) cube of expired count, MRP value and cost value.
+    Built with one vectorized groupby; any weeks_back/metric_type window is a slice-and-sum.
+    """
+    def __init__(self, products_df):
+        self._reset()
+        self.build(products_df)
+
+    def build(self, products_df):
+        """(Re)build the cube from a products DataFrame"""
+        if products_df is None or products_df.empty:
+            self._reset()
+            return self
+
+        df = products_df[['product_id', 'category', 'expiry_date', 'inventory_quantity', 'price_mrp']].copy()
+        unit_cost = products_df['cost_price'] if 'cost_price' in products_df.columns else pd.Series(np.nan, index=df.index)
+        df['unit_cost'] = unit_cost
+        # A product without an expiry date never lands in a week; one without a category goes to UNKNOWN_CATEGORY
+        df['expiry_date'] = pd.to_datetime(df['expiry_date'])
+        df = df[df['expiry_date'].notna()]
+        if df.empty:
+            self._reset()
+            return self
+        df['category'] = df['category'].fillna(UNKNOWN_CATEGORY)
+        df['unit_cost'] = df['unit_cost'].fillna(df['price_mrp'] * COST_PRICE_FALLBACK_RATIO)
+        df['week_id'] = expiry_week_id(df['expiry_date'].values)
+        df['mrp_value'] = df['inventory_quantity'] * df['price_mrp']
+        df['cost_value'] = df['inventory_quantity'] * df['unit_cost']
+
+        category_codes, self.categories = pd.factorize(df['category'], sort=True)
+        self.categories = list(self.categories)
+        self.category_index = {category: i for i, category in enumerate(self.categories)}
+        self.first_week_id = int(df['week_id'].min())
+        week_rows = (df['week_id'] - self.first_week_id).to_numpy()
+        n_weeks = int(week_rows.max()) + 1
+
+        grouped = df.assign(week_row=week_rows, category_code=category_codes).groupby(
+            ['week_row', 'category_code']
+        ).agg(count=('product_id', 'size'), mrp_value=('mrp_value', 'sum'), cost_value=('cost_value', 'sum'))
+        rows = grouped.index.get_level_values(0).to_numpy()
+        cols = grouped.index.get_level_values(1).to_numpy()
+
+        shape = (n_weeks, len(self.categories))
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.mrp_values = np.zeros(shape)
+        self.cost_values = np.zeros(shape)
+        self.counts[rows, cols] = grouped['count'].to_numpy()
+        self.mrp_values[rows, cols] = grouped['mrp_value'].to_numpy()
+        self.cost_values[rows, cols] = grouped['cost_value'].to_numpy()
+        return self
+
+    def _reset(self):
+        self.categories = []
+        self.category_index = {}
+        self.first_week_id = 0
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.mrp_values = np.zeros((0, 0))
+        self.cost_values = np.zeros((0, 0))
+
+    def window(self, weeks_back, today=None):
+        """
+        Return (week_ids, counts, mrp_values, cost_values) for the last `weeks_back` weeks,
+        most recent week first. Weeks outside the cube come back as zero rows.
+        """
+        today = pd.Timestamp(today or datetime.now().date())
+        current_week_start = today - pd.Timedelta(days=today.weekday())  # Monday of current week
+        current_week_id = int(expiry_week_id([current_week_start])[0])
+        week_ids = current_week_id - np.arange(weeks_back)
+        rows = week_ids - self.first_week_id
+        valid = (rows >= 0) & (rows < self.counts.shape[0])
+
+        n_categories = len(self.categories)
+        counts = np.zeros((weeks_back, n_categories), dtype=np.int64)
+        mrp_values = np.zeros((weeks_back, n_categories))
+        cost_values = np.zeros((weeks_back, n_categories))
+        counts[valid] = self.counts[rows[valid]]
+        mrp_values[valid] = self.mrp_values[rows[valid]]
+        cost_values[valid] = self.cost_values[rows[valid]]
+        return week_ids, counts, mrp_values, cost_values
+
+    def category_breakdown(self, counts_row, cost_row, metric_type):
+        """Per-category dict for one week, matching the /weekly_expired response shape"""
+        present = np.nonzero(counts_row)[0]
+        if metric_type == "qty":
+            return {self.categories[i]: int(counts_row[i]) for i in present}
+        return {self.categories[i]: round(float(cost_row[i]), 2) for i in present}
+
+
+# Inventory status buckets used by the inventory_summary view
+STATUS_ALIVE = 0
+STATUS_AT_RISK = 1
+STATUS_EXPIRED = 2
+STATUS_NAMES = ['alive', 'at_risk', 'expired']
+
+
+class InventorySummaryStore:
+    """
+    Running alive / at-risk / expired / expiring-within-week counters (count, cost, qty),
+    overall and per category. Mirrors the inventory_summary views but is maintained in
+    memory: sales and inventory changes adjust one product's contribution, and a day
+    rollover re-buckets only the products whose status changed.
+    """
+    def __init__(self, products_df, today=None):
+        self._lock = threading.Lock()
+        self.build(products_df, today)
+
+    def build(self, products_df, today=None):
+        """(Re)build all counters from a products DataFrame (products or products_enriched)"""
+        with self._lock:
+            self.as_of = pd.Timestamp(today or datetime.now().date()).normalize()
+            products_df = products_df if products_df is not None else pd.DataFrame()
+            n = len(products_df)
+
+            def column(name, default):
+                if name in products_df.columns:
+                    return pd.to_numeric(products_df[name], errors='coerce').fillna(default).to_numpy(dtype=float, copy=True)
+                return np.full(n, default, dtype=float)
+
+            category_codes, categories = pd.factorize(
+                products_df['category'] if n else pd.Series([], dtype=object), sort=True
+            )
+            self.categories = list(categories)
+            self.product_index = dict(zip(products_df['product_id'], range(n))) if n else {}
+            self.category_code = category_codes.astype(np.int64)
+            expiry = pd.to_datetime(products_df['expiry_date']) if n else pd.Series([], dtype='datetime64[ns]')
+            self.expiry_day = ((expiry.dt.normalize() - pd.Timestamp('1970-01-01')) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+            self.cost_price = column('cost_price', 0.0)
+            self.inventory_qty = column('inventory_quantity', 0.0)
+            self.discount = column('current_discount_percent', 0.0)
+            self.sales_velocity = column('sales_velocity', 0.0)
+            if 'transaction_count' in products_df.columns:
+                self.has_sales = products_df['transaction_count'].notna().to_numpy(copy=True)
+            elif 'total_quantity_sold' in products_df.columns:
+                self.has_sales = (column('total_quantity_sold', 0.0) > 0)
+            else:
+                self.has_sales = np.zeros(n, dtype=bool)
+
+            self.status, self.expiring_soon = self._classify(np.arange(n))
+            shape = (len(STATUS_NAMES), len(self.categories))
+            self.counts = np.zeros(shape, dtype=np.int64)
+            self.costs = np.zeros(shape)
+            self.qtys = np.zeros(shape)
+            self.week_counts = np.zeros(len(self.categories), dtype=np.int64)
+            self.week_costs = np.zeros(len(self.categories))
+            self._apply(np.arange(n), +1)
+        return self
+
+    def _days_until_expiry(self, idx):
+        today_day = (self.as_of - pd.Timestamp('1970-01-01')) // pd.Timedelta(days=1)
+        return self.expiry_day[idx] - today_day
+
+    def _classify(self, idx):
+        """Same rules as products_enriched.calculated_dead_stock_risk and inventory_summary"""
+        days = self._days_until_expiry(idx)
+        at_risk = (
+            ((days <= 7) & (self.discount[idx] < 30)) |
+            ((days <= 14) & (self.sales_velocity[idx] < 0.5)) |
+            ((self.inventory_qty[idx] > 100) & ~self.has_sales[idx])
+        )
+        status = np.where(days < 0, STATUS_EXPIRED, np.where(at_risk, STATUS_AT_RISK, STATUS_ALIVE))
+        return status, (days >= 0) & (days <= 7)
+
+    def _apply(self, idx, sign):
+        """Add (sign=+1) or remove (sign=-1) the contribution of products `idx`"""
+        if len(idx) == 0:
+            return
+        cats = self.category_code[idx]
+        statuses = self.status[idx]
+        product_cost = self.inventory_qty[idx] * self.cost_price[idx]
+        np.add.at(self.counts, (statuses, cats), sign)
+        np.add.at(self.costs, (statuses, cats), sign * product_cost)
+        np.add.at(self.qtys, (statuses, cats), sign * self.inventory_qty[idx])
+        soon = self.expiring_soon[idx]
+        np.add.at(self.week_counts, cats[soon], sign)
+        np.add.at(self.week_costs, cats[soon], sign * product_cost[soon])
+
+    def _update_product(self, product_id, quantity=None, quantity_delta=0, sold=False):
+        with self._lock:
+            i = self.product_index.get(product_id)
+            if i is None:
+                return False
+            idx = np.array([i])
+            self._apply(idx, -1)
+            self.inventory_qty[i] = (quantity if quantity is not None else self.inventory_qty[i]) + quantity_delta
+            if sold:
+                self.has_sales[i] = True
+            self.status[idx], self.expiring_soon[idx] = self._classify(idx)
+            self._apply(idx, +1)
+            return True
+
+    def record_sale(self, product_id, quantity):
+        """A transaction sold `quantity` units of a product"""
+        return self._update_product(product_id, quantity_delta=-quantity, sold=True)
+
+    def return_sale(self, product_id, quantity):
+        """A sale counted by record_sale never reached the database; put its units back"""
+        return self._update_product(product_id, quantity_delta=quantity)
+
+    def set_inventory(self, product_id, quantity):
+        """A product's inventory was changed outside of a sale (restock, correction)"""
+        return self._update_product(product_id, quantity=quantity)
+
+    def roll_day(self, today=None):
+        """
+        Day-rollover job: re-evaluate expiry thresholds for the new date and move
+        only the products whose bucket changed. Returns the number of products moved.
+        """
+        with self._lock:
+            today = pd.Timestamp(today or datetime.now().date()).normalize()
+            if today == self.as_of:
+                return 0
+            self.as_of = today
+            all_idx = np.arange(len(self.status))
+            new_status, new_soon = self._classify(all_idx)
+            changed = np.nonzero((new_status != self.status) | (new_soon != self.expiring_soon))[0]
+            self._apply(changed, -1)
+            self.status[changed] = new_status[changed]
+            self.expiring_soon[changed] = new_soon[changed]
+            self._apply(changed, +1)
+            return len(changed)
+
+    def summary(self):
+        """Overall counters in the shape of the inventory_summary view, in O(categories)"""
+        self.roll_day()
+        with self._lock:
+            counts = self.counts.sum(axis=1)
+            costs = self.costs.sum(axis=1)
+            qtys = self.qtys.sum(axis=1)
+            total_cost = float(costs.sum())
+            week_count = int(self.week_counts.sum())
+            week_cost = float(self.week_costs.sum())
+
+        def pct(value):
+            return round(value / total_cost * 100, 2) if total_cost > 0 else 0.0
+
+        summary = {}
+        for status, name in enumerate(STATUS_NAMES):
+            summary[f'{name}_products_count'] = int(counts[status])
+            summary[f'{name}_inventory_cost'] = float(costs[status])
+            summary[f'{name}_inventory_qty'] = int(qtys[status])
+        summary.update({
+            'total_products_count': int(counts.sum()),
+            'total_inventory_cost': total_cost,
+            'total_inventory_qty': int(qtys.sum()),
+            'expiring_within_week_count': week_count,
+            'expiring_within_week_cost': week_cost,
+            'at_risk_cost_percentage': pct(float(costs[STATUS_AT_RISK])),
+            'expired_cost_percentage': pct(float(costs[STATUS_EXPIRED])),
+        })
+        return summary
+
+    def by_category(self):
+        """Per-category counters in the shape of inventory_summary_by_category"""
+        self.roll_day()
+        with self._lock:
+            rows = []
+            for c, category in enumerate(self.categories):
+                row = {'category': category}
+                for status, name in enumerate(STATUS_NAMES):
+                    row[f'{name}_products_count'] = int(self.counts[status, c])
+                    row[f'{name}_inventory_cost'] = float(self.costs[status, c])
+                row['total_products_count'] = int(self.counts[:, c].sum())
+                row['total_inventory_cost'] = float(self.costs[:, c].sum())
+                rows.append(row)
+        return sorted(rows, key=lambda row: row['total_inventory_cost'], reverse=True)
+
+
+def expired_category_stats(expired_df, unit_value_column):
+    """
+    Vectorized per-category stats for expired products: product_count, total_value
+    (inventory_quantity * unit_value_column), total_quantity and percentage of total value.
+    Returns (stats DataFrame sorted by value descending, unrounded total value).
+    """
+    values = expired_df['inventory_quantity'] * expired_df[unit_value_column]
+    stats = expired_df[['category', 'inventory_quantity']].assign(total_value=values).groupby('category', observed=True).agg(
+        product_count=('inventory_quantity', 'size'),
+        total_value=('total_value', 'sum'),
+        total_quantity=('inventory_quantity', 'sum')
+    ).reset_index()
+    total_value = float(stats['total_value'].sum())
+    stats['percentage'] = (stats['total_value'] / total_value * 100).round(2) if total_value > 0 else 0.0
+    stats['total_value'] = stats['total_value'].round(2)
+    stats['product_count'] = stats['product_count'].astype(int)
+    stats['total_quantity'] = stats['total_quantity'].astype(int)
+    return stats.sort_values('total_value', ascending=False), total_value
+
+
+def category_performance_stats(products_df, days_until_expiry):
+    """
+    Per-category aggregates equivalent to the product_performance_summary view,
+    computed from the in-memory products_enriched table with one groupby.
+    """
+    df = products_df[['category', 'product_id', 'inventory_quantity', 'total_cost',
+                      'actual_revenue_generated', 'inventory_turnover_rate', 'calculated_dead_stock_risk']]
+    return df.assign(expired=(days_until_expiry < 0).astype(int)).groupby('category', observed=True).agg(
+        product_count=('product_id', 'nunique'),
+        total_inventory=('inventory_quantity', 'sum'),
+        total_inventory_value=('total_cost', 'sum'),
+        total_revenue=('actual_revenue_generated', 'sum'),
+        avg_turnover_rate=('inventory_turnover_rate', 'mean'),
+        at_risk_products=('calculated_dead_stock_risk', 'sum'),
+        expired_products=('expired', 'sum')
+    ).reset_index()
@@ -0,0 +1,141 @@
+"""
+In-process inventory reservation ledger for the transaction endpoints.
+
+Stock is reserved atomically before the insert instead of read-check-insert
+against the database, so concurrent checkouts on the same SKU fail fast without
+a wasted round trip and the response can report an exact inventory_remaining.
+Per-product state is guarded by lock striping (product_id -> one of N locks), so
+checkouts on different products rarely contend.
+
+The database stays the source of truth: committed sales are accumulated and
+flushed behind the request path, reconciling touched products against one bulk
+read of their inventory_quantity.
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+class InventoryLedger:
+    """available = database inventory - in-flight reservations, per product"""
+
+    def __init__(self, products_df=None, stripes: int = 64, flush_interval: float = 30.0):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._flush_lock = threading.Lock()
+        self._touched_lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.available: Dict[str, int] = {}
+        self.pending: Dict[str, int] = {}
+        self.committed: Dict[str, int] = {}  # monotonic per product, used to detect commits during a flush
+        self.touched = set()
+        if products_df is not None:
+            self.seed(products_df)
+
+    def _lock(self, product_id) -> threading.Lock:
+        return self._locks[hash(product_id) % len(self._locks)]
+
+    def commit_counts(self) -> Dict[str, int]:
+        """Snapshot of per-product commits; take it before reading a table to pass to seed()"""
+        return dict(self.committed)
+
+    def seed(self, products_df, committed_before: Optional[Dict[str, int]] = None):
+        """
+        (Re)load quantities from a product table, keeping in-flight reservations.
+        With `committed_before` (commit_counts() taken before the table was read), sales
+        committed while the read was in flight are subtracted as in flush(): a commit
+        the read already saw is under-counted until the next seed, never oversold.
+        """
+        if products_df is None or products_df.empty:
+            return
+        quantities = products_df.drop_duplicates('product_id').set_index('product_id')['inventory_quantity']
+        for product_id, quantity in quantities.fillna(0).astype(int).items():
+            committed_during_read = 0
+            if committed_before is not None:
+                committed_during_read = self.committed.get(product_id, 0) - committed_before.get(product_id, 0)
+            self.reconcile(product_id, quantity, committed_during_read)
+
+    def reserve(self, product_id, quantity: int, fallback_available=None) -> Tuple[bool, int]:
+        """
+        Atomically take `quantity` units. Returns (reserved, available after the call).
+        Products not seen yet are seeded from `fallback_available` (e.g. a fresh read).
+        """
+        with self._lock(product_id):
+            if product_id not in self.available:
+                if fallback_available is None:
+                    return False, 0
+                self.available[product_id] = int(fallback_available) - self.pending.get(product_id, 0)
+            available = self.available[product_id]
+            if available < quantity:
+                return False, available
+            self.available[product_id] = available - quantity
+            self.pending[product_id] = self.pending.get(product_id, 0) + quantity
+            return True, available - quantity
+
+    def hold(self, product_id, quantity: int):
+        """Reserve unconditionally, for sales already accepted but not yet in the database"""
+        with self._lock(product_id):
+            self.available[product_id] = self.available.get(product_id, 0) - quantity
+            self.pending[product_id] = self.pending.get(product_id, 0) + quantity
+
+    def commit(self, product_id, quantity: int):
+        """The insert succeeded; the database now reflects the reservation"""
+        with self._lock(product_id):
+            self.pending[product_id] = self.pending.get(product_id, 0) - quantity
+            self.committed[product_id] = self.committed.get(product_id, 0) + quantity
+        self._touch(product_id)
+
+    def release(self, product_id, quantity: int):
+        """The insert failed; give the stock back"""
+        with self._lock(product_id):
+            self.pending[product_id] = self.pending.get(product_id, 0) - quantity
+            self.available[product_id] = self.available.get(product_id, 0) + quantity
+        self._touch(product_id)
+
+    def _touch(self, product_id):
+        with self._touched_lock:
+            self.touched.add(product_id)
+
+    def reconcile(self, product_id, db_quantity: int, committed_during_read: int = 0):
+        """Reset a product from a database read, minus what is still in flight. Returns the new available"""
+        with self._lock(product_id):
+            available = int(db_quantity) - self.pending.get(product_id, 0) - committed_during_read
+            self.available[product_id] = available
+            return available
+
+    def flush(self, fetch_quantities: Callable[[Iterable[str]], Dict[str, int]],
+              on_reconcile: Optional[Callable[[str, int], None]] = None) -> int:
+        """
+        Reconcile products touched since the last flush with one bulk read.
+        Commits that land while the read is in flight are subtracted again, which can
+        only under-count stock until the next flush, never oversell.
+        `on_reconcile(product_id, available)` is called for every reconciled product,
+        so other in-memory views of inventory can be reset from the same read.
+        """
+        with self._flush_lock:
+            with self._touched_lock:
+                touched, self.touched = self.touched, set()
+            if not touched:
+                self.last_flush = time.monotonic()
+                return 0
+            before = {product_id: self.committed.get(product_id, 0) for product_id in touched}
+            try:
+                quantities = fetch_quantities(sorted(touched))
+            except Exception:
+                with self._touched_lock:
+                    self.touched |= touched
+                raise
+            for product_id, db_quantity in quantities.items():
+                available = self.reconcile(
+                    product_id, db_quantity, self.committed.get(product_id, 0) - before.get(product_id, 0)
+                )
+                if on_reconcile is not None:
+                    on_reconcile(product_id, available)
+            self.last_flush = time.monotonic()
+            return len(quantities)
+
+    def maybe_flush(self, fetch_quantities, on_reconcile=None) -> int:
+        """Flush when flush_interval has elapsed and no other flush is running"""
+        if time.monotonic() - self.last_flush < self.flush_interval or self._flush_lock.locked():
+            return 0
+        return self.flush(fetch_quantities, on_reconcile)
@@ -0,0 +1,324 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters and histograms are sharded per thread: each thread only ever writes
+to its own shard, so recording takes no lock (requests served by the event
+loop share one shard, sync endpoints get one per threadpool worker). A scrape
+merges the shards, which may miss an observation that is in flight at that
+instant but never loses one. Gauges are single assignments.
+
+    metrics.observe('supabase_request_duration_seconds', 0.012, table='products', operation='select')
+    metrics.inc('cache_requests_total', cache='inventory_summary', result='hit')
+
+Exposed by the API modules at GET /metrics (text format, or JSON with ?format=json).
+"""
+import bisect
+import functools
+import os
+import resource
+import sys
+import threading
+import time
+
+import instrumentation
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FAMILIES = {
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route template, method and status"),
+    "supabase_requests_total": ("counter", "Supabase REST calls by table/view/RPC, operation and outcome"),
+    "supabase_request_duration_seconds": ("histogram", "Supabase REST call latency by table/view/RPC and operation"),
+    "cache_requests_total": ("counter", "In-memory cache lookups by cache and result (hit/miss)"),
+    "cache_hit_ratio": ("gauge", "Share of cache lookups served from memory since start"),
+    "model_build_duration_seconds": ("gauge", "Duration of the most recent model build, by stage"),
+    "model_builds_total": ("counter", "Model builds by stage"),
+    "collaborative_fold_ins_total": ("counter", "Users re-projected onto the item factors after new interactions"),
+    "product_store_bytes": ("gauge", "Memory of the model's product table by column"),
+    "data_snapshot_generation": ("gauge", "Number of times the in-memory data snapshot has been (re)loaded"),
+    "data_snapshot_age_seconds": ("gauge", "Seconds since the in-memory data snapshot was loaded"),
+    "data_snapshot_rows": ("gauge", "Rows in the in-memory data snapshot by table"),
+    "stage_duration_seconds_total": ("counter", "Time spent per instrumented stage (needs stage timing enabled)"),
+    "stage_calls_total": ("counter", "Calls per instrumented stage (needs stage timing enabled)"),
+    "stage_events_total": ("counter", "Instrumentation counters (candidates, filtered products, ...)"),
+    "process_resident_memory_bytes": ("gauge", "Resident set size"),
+    "process_peak_resident_memory_bytes": ("gauge", "Peak resident set size"),
+    "process_cpu_seconds_total": ("counter", "User and system CPU time"),
+    "process_start_time_seconds": ("gauge", "Process start time since the epoch"),
+}
+
+_local = threading.local()
+_shards = []   # every thread's {"counters": {...}, "histograms": {...}}
+_gauges = {}   # (name, labels) -> value
+_snapshot = {"generation": 0, "loaded_at": None}
+_START_TIME = time.time()
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = {"counters": {}, "histograms": {}}
+        _shards.append(shard)  # list.append is atomic
+    return shard
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    counters = _shard()["counters"]
+    key = _key(name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    histograms = _shard()["histograms"]
+    key = _key(name, labels)
+    entry = histograms.get(key)
+    if entry is None:
+        # Per-bucket counts (not cumulative), the +Inf bucket, then the sum
+        entry = histograms[key] = [0] * (len(buckets) + 2)
+        entry.append(buckets)
+    entry[bisect.bisect_left(buckets, value)] += 1
+    entry[-2] += value
+
+
+def set_gauge(name, value, **labels):
+    _gauges[_key(name, labels)] = value
+
+
+def cache_lookup(cache, hit):
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def timed_build(stage):
+    """Decorator recording the duration of a model build stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            set_gauge("model_build_duration_seconds", time.perf_counter() - started, stage=stage)
+            inc("model_builds_total", stage=stage)
+            return result
+        return wrapper
+    return decorator
+
+
+def mark_snapshot(**rows):
+    """Record that the in-memory data snapshot was (re)loaded, with row counts per table"""
+    _snapshot["generation"] += 1
+    _snapshot["loaded_at"] = time.time()
+    for table, count in rows.items():
+        set_gauge("data_snapshot_rows", count, table=table)
+
+
+class _QueryProxy:
+    """Wraps a postgrest query builder so execute() is counted and timed"""
+    __slots__ = ("_query", "_table", "_operation")
+
+    def __init__(self, query, table, operation):
+        self._query = query
+        self._table = table
+        self._operation = operation
+
+    def _wrap(self, value, operation):
+        if hasattr(value, "execute"):
+            return _QueryProxy(value, self._table, operation)
+        return value
+
+    def __getattr__(self, name):
+        if name == "execute":
+            return self._execute
+        attr = getattr(self._query, name)
+        operation = name if name in ("select", "insert", "upsert", "update", "delete") else self._operation
+        if not callable(attr):
+            return self._wrap(attr, operation)
+
+        def chained(*args, **kwargs):
+            return self._wrap(attr(*args, **kwargs), operation)
+        return chained
+
+    def _execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self._query.execute(*args, **kwargs)
+            status = "ok"
+            return response
+        finally:
+            observe("supabase_request_duration_seconds", time.perf_counter() - started,
+                    table=self._table, operation=self._operation)
+            inc("supabase_requests_total", table=self._table, operation=self._operation, status=status)
+
+
+class InstrumentedClient:
+    """Supabase client whose table()/rpc() queries report per-table call counts and latency"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _QueryProxy(self._client.table(name), name, "select")
+
+    from_ = table
+
+    def rpc(self, name, *args, **kwargs):
+        return _QueryProxy(self._client.rpc(name, *args, **kwargs), name, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument_client(client):
+    return InstrumentedClient(client)
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing request latency by route template (not raw path), method and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            observe("http_request_duration_seconds", time.perf_counter() - started,
+                    route=route, method=scope["method"], status=str(status))
+
+
+def _resident_memory_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _computed_gauges():
+    """Values derived at scrape time: snapshot age, cache ratios, process and stage stats"""
+    samples = []
+    if _snapshot["loaded_at"] is not None:
+        samples.append(("data_snapshot_generation", (), _snapshot["generation"]))
+        samples.append(("data_snapshot_age_seconds", (), round(time.time() - _snapshot["loaded_at"], 3)))
+
+    counters = _merge("counters")
+    lookups = {}
+    for (name, labels), value in counters.items():
+        if name == "cache_requests_total":
+            labels = dict(labels)
+            hits_total = lookups.setdefault(labels["cache"], [0, 0])
+            hits_total[1] += value
+            if labels["result"] == "hit":
+                hits_total[0] += value
+    for cache, (hits, total) in sorted(lookups.items()):
+        samples.append(("cache_hit_ratio", (("cache", cache),), round(hits / total, 6) if total else 0.0))
+
+    stage_snapshot = instrumentation.snapshot()
+    for stage, stats in stage_snapshot["stages"].items():
+        samples.append(("stage_duration_seconds_total", (("stage", stage),), stats["total_ms"] / 1000))
+        samples.append(("stage_calls_total", (("stage", stage),), stats["count"]))
+    for name, value in stage_snapshot["counters"].items():
+        samples.append(("stage_events_total", (("name", name),), value))
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    resident = _resident_memory_bytes()
+    if resident is not None:
+        samples.append(("process_resident_memory_bytes", (), resident))
+    # ru_maxrss is KB on Linux, bytes on macOS
+    samples.append(("process_peak_resident_memory_bytes", (),
+                    usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)))
+    samples.append(("process_cpu_seconds_total", (), round(usage.ru_utime + usage.ru_stime, 3)))
+    samples.append(("process_start_time_seconds", (), round(_START_TIME, 3)))
+    return samples
+
+
+def _merge(kind):
+    merged = {}
+    for shard in list(_shards):
+        for key, value in shard[kind].copy().items():  # dict.copy is atomic
+            if kind == "counters":
+                merged[key] = merged.get(key, 0) + value
+            elif key in merged:
+                merged[key] = [a + b for a, b in zip(merged[key][:-1], value[:-1])] + [value[-1]]
+            else:
+                merged[key] = list(value)
+    return merged
+
+
+def _collect():
+    """{family: [(suffix, labels, value), ...]} across counters, histograms and gauges"""
+    families = {}
+    for (name, labels), value in sorted(_merge("counters").items()):
+        families.setdefault(name, []).append(("", labels, value))
+    for (name, labels), entry in sorted(_merge("histograms").items()):
+        buckets, sum_ = entry[-1], entry[-2]
+        cumulative = 0
+        samples = families.setdefault(name, [])
+        for bound, n in zip(buckets, entry):
+            cumulative += n
+            samples.append(("_bucket", labels + (("le", repr(float(bound))),), cumulative))
+        cumulative += entry[len(buckets)]
+        samples.append(("_bucket", labels + (("le", "+Inf"),), cumulative))
+        samples.append(("_sum", labels, sum_))
+        samples.append(("_count", labels, cumulative))
+    for (name, labels), value in sorted(_gauges.copy().items()):
+        families.setdefault(name, []).append(("", labels, value))
+    for name, labels, value in _computed_gauges():
+        families.setdefault(name, []).append(("", labels, value))
+    return families
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+def render():
+    """Prometheus text exposition (format 0.0.4)"""
+    lines = []
+    for name, samples in _collect().items():
+        kind, help_text = FAMILIES.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """The same samples as render(), as JSON-ready dicts"""
+    return {
+        name: [{"name": name + suffix, "labels": dict(labels), "value": value} for suffix, labels, value in samples]
+        for name, samples in _collect().items()
+    }
+
+
+def reset():
+    for shard in list(_shards):
+        shard["counters"].clear()
+        shard["histograms"].clear()
+    _gauges.clear()
+    _snapshot.update(generation=0, loaded_at=None)
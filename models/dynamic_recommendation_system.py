@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -8,27 +10,54 @@ from sklearn.preprocessing import StandardScaler, LabelEncoder
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feedback_log import FeedbackLog, merge_engagement
+
 
 class DynamicRecommendationSystem:
     """
     Advanced recommendation system combining content-based and collaborative filtering
     """
     
-    def __init__(self, users_df, products_df, transactions_df):
+    def __init__(self, users_df, products_df, transactions_df, feedback_max_events=1000, feedback_max_age_seconds=300,
+                 feedback_background=True):
         self.users_df = users_df
         self.products_df = products_df
         self.transactions_df = transactions_df
         
+        # Feedback: events are buffered and compacted into transactions / engagement in batches
+        self.engagement_df = pd.DataFrame(columns=['user_id', 'product_id', 'clicks', 'views'])
+        self.feedback_log = FeedbackLog(
+            on_compact=self.apply_feedback,
+            max_events=feedback_max_events,
+            max_age_seconds=feedback_max_age_seconds
+        )
+        if feedback_background:
+            # Compactions (and the model refresh they trigger) run off the feedback ingest path
+            self.feedback_log.start()
+        
         # Preprocessing
         self.le_diet = LabelEncoder()
         self.le_category = LabelEncoder()
         
         # Models
         self.content_similarity_matrix = None
-        self.user_item_matrix = None
-        self.user_factors = None
-        self.item_factors = None
+        # (user_item_matrix, user_factors, item_factors), replaced as one tuple so readers on
+        # other threads never pair a new matrix with old factors while the compactor refits
+        self.collaborative_model = (None, None, None)
         self.product_features = None
+    
+    @property
+    def user_item_matrix(self):
+        return self.collaborative_model[0]
+    
+    @property
+    def user_factors(self):
+        return self.collaborative_model[1]
+    
+    @property
+    def item_factors(self):
+        return self.collaborative_model[2]
         
     def prepare_content_features(self):
         """
@@ -99,35 +128,32 @@ class DynamicRecommendationSystem:
         Build collaborative filtering model using matrix factorization (SVD)
         """
         # Create user-item interaction matrix
-        pivot_table = self.transactions_df.pivot_table(
-            index='user_id',
-            columns='product_id',
-            values='quantity',
-            aggfunc='sum',
-            fill_value=0
-        )
-        
-        # Add implicit feedback from engagement
-        engagement_pivot = self.transactions_df.pivot_table(
-            index='user_id',
-            columns='product_id',
-            values='user_engaged_with_deal',
-            aggfunc='mean',
-            fill_value=0
-        )
+        grouped = self.transactions_df.groupby(['user_id', 'product_id'])
+        quantity = grouped['quantity'].sum()
+        engaged = grouped['user_engaged_with_deal'].sum()
+        observations = grouped.size()
+        
+        # Add implicit feedback: every view or click is an engaged, zero-quantity observation
+        if not self.engagement_df.empty:
+            feedback = self.engagement_df.set_index(['user_id', 'product_id'])
+            feedback_events = feedback['clicks'] + feedback['views']
+            quantity = quantity.add(feedback_events * 0, fill_value=0)
+            engaged = engaged.add(feedback_events, fill_value=0)
+            observations = observations.add(feedback_events, fill_value=0)
         
         # Combine explicit (purchases) and implicit (engagement) feedback
-        self.user_item_matrix = pivot_table + 0.5 * engagement_pivot
+        user_item_matrix = (quantity + 0.5 * engaged / observations).unstack(fill_value=0)
         
         # Convert to sparse matrix for efficiency
-        sparse_matrix = csr_matrix(self.user_item_matrix.values)
+        sparse_matrix = csr_matrix(user_item_matrix.values)
         
         # Apply SVD for matrix factorization
         svd = TruncatedSVD(n_components=n_factors, random_state=42)
-        self.user_factors = svd.fit_transform(sparse_matrix)
-        self.item_factors = svd.components_.T
+        user_factors = svd.fit_transform(sparse_matrix)
+        item_factors = svd.components_.T
         
-        return self.user_factors, self.item_factors
+        self.collaborative_model = (user_item_matrix, user_factors, item_factors)
+        return user_factors, item_factors
     
     def get_content_based_recommendations(self, product_id, n_recommendations=10, 
                                         filter_expired=True, urgency_boost=True):
@@ -184,20 +210,22 @@ class DynamicRecommendationSystem:
         """
         if self.user_factors is None:
             self.build_collaborative_filtering_model()
+        # One consistent model for the whole request, even if the compactor publishes a new one
+        user_item_matrix, user_factors, item_factors = self.collaborative_model
         
         # Get user index
-        if user_id not in self.user_item_matrix.index:
+        if user_id not in user_item_matrix.index:
             # Cold start problem - return popular expiring items
             return self.get_popular_expiring_products(n_recommendations)
         
-        user_idx = self.user_item_matrix.index.get_loc(user_id)
+        user_idx = user_item_matrix.index.get_loc(user_id)
         
         # Calculate predicted ratings for all items
-        user_vector = self.user_factors[user_idx]
-        predicted_ratings = np.dot(user_vector, self.item_factors.T)
+        user_vector = user_factors[user_idx]
+        predicted_ratings = np.dot(user_vector, item_factors.T)
         
         # Get product IDs
-        product_ids = self.user_item_matrix.columns
+        product_ids = user_item_matrix.columns
         
         # Create recommendations
         recommendations = []
@@ -205,7 +233,7 @@ class DynamicRecommendationSystem:
             product_id = product_ids[idx]
             
             # Filter already purchased items
-            if filter_purchased and self.user_item_matrix.iloc[user_idx, idx] > 0:
+            if filter_purchased and user_item_matrix.iloc[user_idx, idx] > 0:
                 continue
             
             product = self.products_df[self.products_df['product_id'] == product_id].iloc[0]
@@ -392,31 +420,29 @@ class DynamicRecommendationSystem:
     
     def update_model_with_feedback(self, user_id, product_id, feedback_type='purchase', rating=None):
         """
-        Update the model with new user feedback
-        """
-        # Add to transactions for retraining
-        new_transaction = {
-            'user_id': user_id,
-            'product_id': product_id,
-            'purchase_date': pd.Timestamp.now(),
-            'quantity': 1 if feedback_type == 'purchase' else 0,
-            'user_engaged_with_deal': 1 if feedback_type in ['click', 'view'] else 0
-        }
-        
-        if rating:
-            new_transaction['rating'] = rating
-        
-        # In production, this would update the database
-        # Here we just show the concept
-        self.transactions_df = pd.concat([
-            self.transactions_df,
-            pd.DataFrame([new_transaction])
-        ], ignore_index=True)
+        Record user feedback (purchase, click or view)
         
-        # Retrain models periodically (in production, this would be scheduled)
-        if len(self.transactions_df) % 100 == 0:
-            self.build_collaborative_filtering_model()
-            self.build_content_similarity_matrix()
+        Events go to an append-only log; once enough have been buffered (or the
+        oldest is old enough) they are compacted into the model data in one batch,
+        by the background compactor unless the system was built without one.
+        """
+        self.feedback_log.append(user_id, product_id, feedback_type, rating=rating)
+        if not self.feedback_log.running:
+            self.feedback_log.compact_if_due()
+    
+    def apply_feedback(self, batch):
+        """
+        Compact a batch of feedback: purchases become transactions, views and
+        clicks are counted separately, then the collaborative model is refreshed
+        """
+        # In production, purchases would be written to the database
+        if not batch.purchases.empty:
+            self.transactions_df = pd.concat([self.transactions_df, batch.purchases], ignore_index=True)
+        self.engagement_df = merge_engagement(self.engagement_df, batch.engagement)
+        
+        # Content similarity depends only on product attributes, so only the collaborative model is rebuilt
+        if self.user_factors is not None:
+            self.build_collaborative_filtering_model(n_factors=self.user_factors.shape[1])
 
 
 # Example usage
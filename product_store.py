@@ -0,0 +1,106 @@
+"""
+Compact column layout for the product table held by UnifiedRecommendationSystem.
+
+compact_products() rewrites a product DataFrame with fixed-width dtypes:
+low-cardinality strings (category, brand, diet_type, name, allergens) become
+categoricals, day counts int16, quantities int32, flags int8 and derived
+sales statistics float32, and allergens also get an integer bitmask
+(allergen_bits) so compatibility checks need no string parsing. Prices,
+costs, discounts and coordinates keep float64 so API values are unchanged.
+"""
+import numpy as np
+import pandas as pd
+
+IDENTIFIER_COLUMNS = ('product_id',)
+# Strings with at most this share of distinct values are stored as categoricals
+CATEGORICAL_MAX_RATIO = 0.5
+INT8_COLUMNS = ('is_dead_stock_risk',)
+INT16_COLUMNS = ('shelf_life_days', 'days_until_expiry', 'total_shelf_life', 'days_on_market')
+INT32_COLUMNS = ('weight_grams', 'inventory_quantity', 'initial_inventory_quantity',
+                 'total_quantity_sold', 'number_of_sales', 'transaction_count')
+FLOAT32_COLUMNS = ('shelf_life_remaining_pct', 'avg_quantity_per_sale', 'avg_discount_given',
+                   'avg_user_engagement', 'days_since_last_sale', 'sales_velocity',
+                   'avg_discount_taken', 'deal_engagement_rate', 'inventory_turnover_rate')
+
+
+def parse_allergens(value):
+    """Allergen names from a list, a "['a', 'b']" repr, a "{a,b}" array literal or "a,b" text"""
+    if isinstance(value, (list, tuple, set, np.ndarray)):
+        return [str(a).strip() for a in value if str(a).strip()]
+    if not isinstance(value, str):
+        return []
+    text = value.strip().strip('[]{}')
+    return [a.strip().strip('\'"') for a in text.split(',') if a.strip().strip('\'"')]
+
+
+def allergen_vocabulary(values):
+    """Sorted allergen names seen in a column; bit i of a mask is vocabulary[i]"""
+    return sorted({a for value in values for a in parse_allergens(value)})
+
+
+def allergen_mask(allergens, vocabulary):
+    """Bitmask of allergens over vocabulary; names outside it are ignored"""
+    positions = {name: i for i, name in enumerate(vocabulary)}
+    mask = 0
+    for allergen in parse_allergens(allergens):
+        if allergen in positions:
+            mask |= 1 << positions[allergen]
+    return mask
+
+
+def _mask_dtype(vocabulary):
+    if len(vocabulary) <= 15:
+        return np.int16
+    return np.int32 if len(vocabulary) <= 31 else np.int64
+
+
+def _fits(values, dtype):
+    info = np.iinfo(dtype)
+    return values.empty or (values.min() >= info.min and values.max() <= info.max)
+
+
+def _downcast_int(series, dtype):
+    if series.isna().any() or not pd.api.types.is_numeric_dtype(series):
+        return series
+    if not pd.api.types.is_integer_dtype(series):
+        if not (series == np.floor(series)).all():
+            return series
+    return series.astype(dtype) if _fits(series, dtype) else series
+
+
+def compact_products(df):
+    """
+    Product table with compact dtypes plus allergen_bits. Returns (compacted
+    frame, allergen vocabulary); the input frame is left untouched.
+    """
+    columns = {}
+    vocabulary = allergen_vocabulary(df['allergens']) if 'allergens' in df else []
+    for name in df.columns:
+        series = df[name]
+        if name == 'allergens':
+            parsed = series.map(parse_allergens)
+            # Canonical "a,b" text keeps the order given and is what the API splits back into a list
+            columns[name] = parsed.map(','.join).astype('category')
+            columns['allergen_bits'] = parsed.map(lambda a: allergen_mask(a, vocabulary)).astype(_mask_dtype(vocabulary))
+        elif name in INT8_COLUMNS:
+            columns[name] = _downcast_int(series, np.int8)
+        elif name in INT16_COLUMNS:
+            columns[name] = _downcast_int(series, np.int16)
+        elif name in INT32_COLUMNS:
+            columns[name] = _downcast_int(series, np.int32)
+        elif name in FLOAT32_COLUMNS and pd.api.types.is_float_dtype(series):
+            columns[name] = series.astype(np.float32)
+        elif (name not in IDENTIFIER_COLUMNS and not isinstance(series.dtype, pd.CategoricalDtype)
+              and (pd.api.types.is_string_dtype(series) or series.dtype == object)
+              and series.map(type).eq(str).all()
+              and series.nunique() <= CATEGORICAL_MAX_RATIO * len(series)):
+            columns[name] = series.astype('category')
+        else:
+            columns[name] = series
+    return pd.DataFrame(columns, index=df.index), vocabulary
+
+
+def memory_report(*frames):
+    """Bytes per column (deep, summed over frames), largest first"""
+    usage = pd.concat([frame.memory_usage(deep=True) for frame in frames if frame is not None])
+    return usage.groupby(level=0).sum().sort_values(ascending=False)
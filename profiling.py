@@ -0,0 +1,211 @@
+"""
+Sampling profiler for slow requests.
+
+SlowRequestProfiler (ASGI middleware) opens a profiling session for requests
+to /recommendations/{user_id} and /products?dynamic=true. Endpoints decorated
+with @sampled register the worker thread that runs them, and one background
+thread samples the stacks of registered threads every PROFILE_SAMPLE_INTERVAL
+seconds via sys._current_frames(). When the request finishes over the latency
+budget its samples are kept in a bounded ring of recent profiles; otherwise
+they are dropped.
+
+Profiles are served in the collapsed-stack format ("frame;frame;frame count"
+per line) read by flamegraph.pl, speedscope and inferno.
+"""
+import collections
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("SLOW_REQUEST_PROFILING", "true").lower() == "true"
+LATENCY_BUDGET_MS = float(os.getenv("PROFILE_LATENCY_BUDGET_MS", "500"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "20"))
+MAX_STACK_DEPTH = 128
+
+_current_session = ContextVar("profile_session", default=None)
+_ids = itertools.count(1)
+
+
+def is_profiled_request(path, query_string):
+    """The requests worth profiling: recommendations and dynamically priced product pages"""
+    if path.startswith("/recommendations/"):
+        return True
+    if path == "/products":
+        dynamic = parse_qs(query_string.decode("latin-1")).get("dynamic", ["false"])[-1]
+        return dynamic.lower() in ("true", "1")
+    return False
+
+
+class ProfileSession:
+    def __init__(self, method, path, query_string):
+        self.id = next(_ids)
+        self.method = method
+        self.path = path
+        self.query = query_string.decode("latin-1")
+        self.started_at = datetime.now().isoformat(timespec="milliseconds")
+        self.thread_ids = set()
+        self.samples = collections.Counter()  # collapsed stack -> count
+        self.duration_ms = None
+        self.status = None
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "samples": sum(self.samples.values()),
+        }
+
+    def collapsed(self):
+        """flamegraph.pl input: one 'root;...;leaf count' line per distinct stack"""
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """One background thread sampling the threads of the active sessions"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL, ring_size=RING_SIZE):
+        self.interval = interval
+        self.profiles = collections.deque(maxlen=ring_size)
+        self._active = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def begin(self, session):
+        with self._lock:
+            self._active.add(session)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="slow-request-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def end(self, session, keep):
+        with self._lock:
+            self._active.discard(session)
+            if keep:
+                self.profiles.append(session)
+
+    def get(self, profile_id):
+        with self._lock:
+            for session in self.profiles:
+                if session.id == profile_id:
+                    return session
+        return None
+
+    def recent(self):
+        with self._lock:
+            return [session.summary() for session in reversed(self.profiles)]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wakeup.clear()
+                # Sampling under the lock means an ended session is never written to again
+                if not idle:
+                    frames = sys._current_frames()
+                    for session in self._active:
+                        for thread_id in list(session.thread_ids):
+                            frame = frames.get(thread_id)
+                            if frame is not None:
+                                session.samples[self._collapse(frame)] += 1
+                    del frames
+            if idle:
+                self._wakeup.wait(timeout=60)
+                continue
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _collapse(frame):
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            if code is _ENTRY_CODE:
+                break  # stacks are rooted at the endpoint, not the threadpool machinery
+            labels.append(_frame_label(code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+
+sampler = Sampler()
+
+
+def sampled(func):
+    """Endpoint decorator: lets an active profiling session sample the thread running func"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        session = _current_session.get()
+        if session is None:
+            return func(*args, **kwargs)
+        thread_id = threading.get_ident()
+        session.thread_ids.add(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            session.thread_ids.discard(thread_id)
+    return wrapper
+
+
+_ENTRY_CODE = sampled(lambda: None).__code__
+
+
+class SlowRequestProfiler:
+    """ASGI middleware keeping a sampled profile of profiled requests that exceed the latency budget"""
+
+    def __init__(self, app, budget_ms=None, enabled=None):
+        self.app = app
+        self.budget_ms = LATENCY_BUDGET_MS if budget_ms is None else budget_ms
+        self.enabled = ENABLED if enabled is None else enabled
+
+    async def __call__(self, scope, receive, send):
+        if (not self.enabled or scope["type"] != "http"
+                or not is_profiled_request(scope["path"], scope.get("query_string", b""))):
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(scope["method"], scope["path"], scope.get("query_string", b""))
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                session.status = message["status"]
+            await send(message)
+
+        token = _current_session.set(session)
+        sampler.begin(session)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_session.reset(token)
+            session.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            slow = session.duration_ms > self.budget_ms
+            sampler.end(session, keep=slow)
+            if slow:
+                logger.info(f"Kept profile {session.id} for slow request {session.path} "
+                            f"({session.duration_ms:.0f} ms, {sum(session.samples.values())} samples)")
@@ -0,0 +1,139 @@
+"""
+Column projections for the Supabase reads made by the API.
+
+Every endpoint declares the columns it needs from a table or view as a QuerySpec
+and issues a projected select instead of select("*"). Wide views such as
+products_enriched carry dozens of computed columns, so projecting keeps the
+payload and the JSON decoding cost proportional to what the endpoint uses.
+test_query_specs.py fails when an endpoint reads a column it did not project.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class QuerySpec:
+    """A table or view and the exact columns an endpoint reads from it"""
+    table: str
+    columns: Tuple[str, ...]
+
+    @property
+    def select_list(self) -> str:
+        return ",".join(self.columns)
+
+    def select(self, client, count: Optional[str] = None):
+        """Start a projected select on a supabase Client; filters are chained by the caller"""
+        if count:
+            return client.table(self.table).select(self.select_list, count=count)
+        return client.table(self.table).select(self.select_list)
+
+    def extend(self, *columns: str) -> "QuerySpec":
+        """Same table with additional columns"""
+        return QuerySpec(self.table, self.columns + tuple(c for c in columns if c not in self.columns))
+
+
+# Product attributes used by the recommendation/pricing models and the product listings
+PRODUCT_CORE_COLUMNS = (
+    'product_id', 'name', 'category', 'brand', 'diet_type', 'allergens', 'shelf_life_days',
+    'packaging_date', 'expiry_date', 'weight_grams', 'price_mrp', 'cost_price',
+    'current_discount_percent', 'inventory_quantity', 'initial_inventory_quantity', 'total_cost',
+)
+
+# Pre-computed sales/risk metrics from products_enriched that the API actually reads
+PRODUCT_ENRICHED_METRIC_COLUMNS = (
+    'days_until_expiry', 'transaction_count', 'total_quantity_sold', 'actual_revenue_generated',
+    'avg_discount_taken', 'deal_engagement_rate', 'last_sale_date', 'sales_velocity',
+    'inventory_turnover_rate', 'calculated_dead_stock_risk',
+)
+
+# --- Startup / refresh loads ---
+USERS_FOR_MODEL = QuerySpec('users', ('user_id', 'diet_type', 'allergies', 'prefers_discount'))
+PRODUCTS_FOR_MODEL = QuerySpec(
+    'products', PRODUCT_CORE_COLUMNS + ('revenue_generated', 'store_location_lat', 'store_location_lon')
+)
+PRODUCTS_ENRICHED_FOR_MODEL = QuerySpec('products_enriched', PRODUCT_CORE_COLUMNS + PRODUCT_ENRICHED_METRIC_COLUMNS)
+TRANSACTIONS_FOR_MODEL = QuerySpec('transactions', (
+    'user_id', 'product_id', 'purchase_date', 'quantity', 'discount_percent', 'user_engaged_with_deal',
+))
+
+# --- POST /transactions ---
+PRODUCT_FOR_TRANSACTION = QuerySpec('products', (
+    'product_id', 'category', 'diet_type', 'price_mrp', 'current_discount_percent', 'inventory_quantity',
+    'expiry_date',
+))
+PRODUCT_ENRICHED_FOR_TRANSACTION = QuerySpec('products_enriched', (
+    'product_id', 'category', 'diet_type', 'price_mrp', 'current_discount_percent', 'inventory_quantity',
+    'days_until_expiry', 'sales_velocity', 'deal_engagement_rate',
+))
+USER_FOR_TRANSACTION = QuerySpec('users', ('user_id', 'diet_type'))
+INVENTORY_LEVELS = QuerySpec('products', ('product_id', 'inventory_quantity'))
+
+# --- GET /products ---
+PRODUCTS_PAGE = QuerySpec('products_enriched', PRODUCT_CORE_COLUMNS + (
+    'days_until_expiry', 'revenue_generated', 'store_location_lat', 'store_location_lon',
+))
+
+# --- GET /dynamic_pricing/{product_id} ---
+PRODUCT_DYNAMIC_PRICING = QuerySpec('products_enriched', (
+    'product_id', 'name', 'category', 'days_until_expiry', 'current_discount_percent', 'price_mrp',
+    'inventory_quantity', 'sales_velocity', 'deal_engagement_rate', 'calculated_dead_stock_risk',
+    'inventory_turnover_rate', 'risk_score',
+))
+
+# --- GET /dead_stock_risk ---
+DEAD_STOCK_RISK = QuerySpec('dead_stock_risk_products', (
+    'product_id', 'name', 'category', 'days_until_expiry', 'current_discount_percent', 'price_mrp',
+    'inventory_quantity', 'expiry_date', 'risk_score', 'recommended_discount_percent',
+))
+
+# --- GET /weekly_inventory and /weekly_expired ---
+WEEKLY_INVENTORY_METRICS = QuerySpec('weekly_inventory_metrics', (
+    'week_number', 'week_start', 'week_end', 'alive_products_count', 'total_inventory_qty',
+    'total_inventory_cost', 'sold_inventory_qty', 'sold_inventory_cost', 'inventory_utilization_rate_pct',
+    'cost_utilization_rate_pct',
+))
+WEEKLY_EXPIRED_METRICS = QuerySpec('weekly_expired_metrics', (
+    'week_number', 'week_start', 'week_end', 'expired_count', 'expired_value_mrp', 'expired_value_cost',
+    'expired_by_category', 'waste_rate_pct',
+))
+
+# --- GET /categories and /users ---
+CATEGORIES = QuerySpec('product_performance_summary', ('category',))
+USER_PURCHASE_PATTERNS = QuerySpec('user_purchase_patterns', (
+    'user_id', 'diet_type', 'allergies', 'preferred_categories', 'total_purchases', 'unique_products_purchased',
+    'categories_purchased', 'total_spent', 'avg_order_value', 'last_purchase_date', 'avg_discount_taken',
+    'deal_engagement_rate', 'top_category', 'category_distribution', 'days_since_last_purchase',
+    'purchase_frequency_per_month',
+))
+
+# --- GET /expired_products ---
+EXPIRED_PRODUCTS = QuerySpec('products_enriched', ('category', 'cost_price', 'inventory_quantity'))
+
+# --- GET /inventory_analytics ---
+PRODUCT_PERFORMANCE_SUMMARY = QuerySpec('product_performance_summary', (
+    'category', 'product_count', 'total_inventory', 'total_inventory_value', 'total_revenue',
+    'avg_turnover_rate', 'at_risk_products', 'expired_products',
+))
+PRODUCTS_WITH_REVENUE = QuerySpec('products_enriched', (
+    'product_id', 'name', 'category', 'inventory_quantity', 'cost_price', 'actual_revenue_generated',
+    'total_quantity_sold', 'inventory_turnover_rate',
+))
+INVENTORY_ANALYTICS = QuerySpec('inventory_analytics', (
+    'product_id', 'name', 'category', 'brand', 'initial_inventory_quantity', 'current_inventory', 'units_sold',
+    'cost_price', 'price_mrp', 'initial_investment', 'revenue_generated', 'gross_profit', 'profit_margin',
+    'days_until_expiry', 'current_discount_percent', 'expiry_date', 'created_at', 'updated_at',
+))
+
+# --- GET /inventory_summary ---
+INVENTORY_SUMMARY = QuerySpec('inventory_summary', (
+    'alive_products_count', 'alive_inventory_cost', 'alive_inventory_qty',
+    'at_risk_products_count', 'at_risk_inventory_cost', 'at_risk_inventory_qty',
+    'expired_products_count', 'expired_inventory_cost', 'expired_inventory_qty',
+    'total_products_count', 'total_inventory_cost', 'total_inventory_qty',
+    'expiring_within_week_count', 'expiring_within_week_cost',
+    'at_risk_cost_percentage', 'expired_cost_percentage',
+))
+INVENTORY_SUMMARY_BY_CATEGORY = QuerySpec('inventory_summary_by_category', (
+    'category', 'alive_products_count', 'alive_inventory_cost', 'at_risk_products_count',
+    'at_risk_inventory_cost', 'expired_products_count', 'expired_inventory_cost', 'total_inventory_cost',
+))
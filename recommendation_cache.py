@@ -0,0 +1,129 @@
+"""
+Per-user cache of ranked recommendation lists for GET /recommendations.
+
+Recommendations for a user only change when they buy something, a cached
+product sells out, the model is rebuilt, the offline candidate pool file is
+replaced, or the day rolls over (days until expiry, and with them urgency,
+move daily). Each entry keeps a pool of
+`pool_size` ranked rows, so every n up to the pool size is a slice of it.
+Entries are dropped:
+    - for the buyer, on each purchase (invalidate_user / on_purchase)
+    - for every user whose pool holds a product whose stock falls to
+      `low_stock_threshold` (invalidate_products / on_purchase)
+    - on read, when the generation (model generation and candidate pool
+      build time, see generation()) or the date differs from the entry's
+An invalidation that lands while a list is being computed wins: recommendations()
+reads the user's invalidation version before computing and does not cache the
+result if it moved. The cache is a bounded LRU; lookups are counted as cache
+'recommendations'.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import metrics
+
+
+class RecommendationCache:
+    def __init__(self, max_users=10000, pool_size=50, low_stock_threshold=0, today=date.today):
+        self.max_users = max_users
+        self.pool_size = pool_size
+        self.low_stock_threshold = low_stock_threshold
+        self.today = today
+        self._entries = OrderedDict()  # user_id -> (generation, day, ranked rows)
+        self._users_by_product = {}    # product_id -> user_ids whose pool contains it
+        self._user_versions = {}       # user_id -> invalidations so far
+        self._product_version = 0      # product invalidations so far (they reach users without entries too)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id, generation):
+        """Ranked rows cached for the user, or None if missing or stale"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and (entry[0] != generation or entry[1] != self.today()):
+                self._drop(user_id)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+        metrics.cache_lookup('recommendations', entry is not None)
+        return entry[2] if entry is not None else None
+
+    def version(self, user_id):
+        """Token that changes whenever the user's recommendations are invalidated"""
+        with self._lock:
+            return self._user_versions.get(user_id, 0), self._product_version
+
+    def put(self, user_id, generation, rows, version=None):
+        """
+        Cache a ranked list (dicts with a 'product_id') computed for `generation`; returns it.
+        With `version` (read before computing), a list invalidated meanwhile is not cached.
+        """
+        with self._lock:
+            if version is not None and version != (self._user_versions.get(user_id, 0), self._product_version):
+                return rows
+            self._drop(user_id)
+            self._entries[user_id] = (generation, self.today(), rows)
+            for row in rows:
+                self._users_by_product.setdefault(row['product_id'], set()).add(user_id)
+            while len(self._entries) > self.max_users:
+                self._drop(next(iter(self._entries)))
+        return rows
+
+    def _drop(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        for row in entry[2]:
+            users = self._users_by_product.get(row['product_id'])
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._users_by_product[row['product_id']]
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._user_versions[user_id] = self._user_versions.get(user_id, 0) + 1
+            self._drop(user_id)
+
+    def invalidate_products(self, product_ids):
+        """Drop every entry whose pool contains one of the products"""
+        with self._lock:
+            self._product_version += 1
+            for product_id in product_ids:
+                for user_id in list(self._users_by_product.get(product_id, ())):
+                    self._drop(user_id)
+
+    def on_purchase(self, user_id, product_id, available=None):
+        """A sale: the buyer's list is stale, and so is every list holding a product that ran low"""
+        self.invalidate_user(user_id)
+        if available is not None and available <= self.low_stock_threshold:
+            self.invalidate_products([product_id])
+
+    @staticmethod
+    def generation(system):
+        """What cached rows were computed from: the model generation and, when offline pools are served, their build time"""
+        pools = system.candidate_pools
+        if pools is not None and hasattr(pools, 'current'):
+            pools = pools.current()  # PoolFile: reloads a replaced file
+        return system.model_generation, getattr(pools, 'generated_at', None)
+
+    def recommendations(self, system, user_id, n):
+        """Top n ranked rows for the user, computing and caching a full pool on a miss"""
+        generation = self.generation(system)
+        rows = self.get(user_id, generation)
+        if rows is None or (len(rows) < n and n > self.pool_size):
+            version = self.version(user_id)
+            ranked = system.get_hybrid_recommendations(user_id, n_recommendations=max(n, self.pool_size))
+            # The first request may build the model, moving the generation
+            rows = self.put(user_id, self.generation(system), ranked.to_dict('records'), version)
+        return rows[:n]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._users_by_product.clear()
+            self._user_versions.clear()
+            self._product_version += 1
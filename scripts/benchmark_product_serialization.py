@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request CPU of /products serialization: pydantic models vs the fast JSON path
+"""
+
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import supabase
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _offline(url, key):
+    raise RuntimeError("benchmark runs without a database")
+
+
+# Import the API without connecting to Supabase; only its serialization code is exercised
+supabase.create_client = _offline
+import main_supabase_optimized as api  # noqa: E402
+from fast_json import FastJSONResponse, paginated_body  # noqa: E402
+
+
+def make_rows(n):
+    today = date.today()
+    return [{
+        'product_id': f'P{i:05d}', 'name': f'Product {i}', 'category': 'Dairy', 'brand': 'Brand',
+        'diet_type': 'vegan', 'allergens': ['nuts', 'soy'], 'shelf_life_days': 30,
+        'packaging_date': (today - timedelta(days=20)).isoformat(), 'expiry_date': (today + timedelta(days=10)).isoformat(),
+        'days_until_expiry': 10, 'weight_grams': 250, 'price_mrp': 120.0 + i, 'cost_price': 55.0,
+        'current_discount_percent': 10.0, 'inventory_quantity': 80, 'initial_inventory_quantity': 200,
+        'total_cost': 11000.0, 'revenue_generated': 960.0, 'store_location_lat': 12.97, 'store_location_lon': 77.59,
+    } for i in range(n)]
+
+
+PRICING_INFO = {'urgency_score': 0.62, 'current_discount': 10.0, 'recommended_discount': 40,
+                'discount_increase': 30.0, 'reasoning': 'Expires in 10 days; Slow sales velocity'}
+
+
+def build_records(rows, dynamic):
+    records = []
+    for row in rows:
+        record = api._product_record(row)
+        if dynamic:
+            record['dynamic_pricing'] = api._dynamic_pricing_record(PRICING_INFO, record['price_mrp'])
+        records.append(record)
+    return records
+
+
+def model_path(rows, dynamic):
+    """Default path: per-row models, then FastAPI's jsonable_encoder + JSONResponse"""
+    records = build_records(rows, dynamic)
+    if dynamic:
+        body = api.PaginatedProductsResponseWithDynamicPricing(
+            products=[api.ProductWithDynamicPricing(**r) for r in records], total_items=5000, total_pages=50,
+            current_page=1, page_size=len(rows), has_next=True, has_previous=False)
+    else:
+        body = api.PaginatedProductsResponse(
+            products=[api.Product(**r) for r in records], total_items=5000, total_pages=50,
+            current_page=1, page_size=len(rows), has_next=True, has_previous=False)
+    return JSONResponse(jsonable_encoder(body)).body
+
+
+def fast_path(rows, dynamic):
+    return FastJSONResponse(paginated_body(build_records(rows, dynamic), 5000, 1, len(rows))).body
+
+
+def cpu_ms_per_request(fn, rows, dynamic, iterations):
+    fn(rows, dynamic)  # warm up
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(rows, dynamic)
+    return (time.process_time() - start) * 1000 / iterations
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark /products response serialization')
+    parser.add_argument('--page-size', type=int, default=100, help='Products per page')
+    parser.add_argument('--iterations', type=int, default=300, help='Requests to time per variant')
+    args = parser.parse_args()
+
+    rows = make_rows(args.page_size)
+    print(f"page_size={args.page_size}, iterations={args.iterations}")
+    for dynamic in (False, True):
+        model_ms = cpu_ms_per_request(model_path, rows, dynamic, args.iterations)
+        fast_ms = cpu_ms_per_request(fast_path, rows, dynamic, args.iterations)
+        print(f"dynamic={str(dynamic):5}  models: {model_ms:.3f} ms  fast: {fast_ms:.3f} ms  "
+              f"({model_ms / fast_ms:.1f}x less CPU per request)")
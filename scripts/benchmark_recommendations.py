@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark for UnifiedRecommendationSystem.
+
+For each scale a synthetic catalogue is generated (generate_synthetic_data.py,
+seeded) and the model stages are timed in a fresh process so peak RSS is per
+scale: preprocess_data (inside the constructor), calculate_all_thresholds,
+build_content_similarity_matrix, build_collaborative_filtering_model and
+per-user get_hybrid_recommendations (p50/p99 over a user sample).
+Stages whose dense matrices would not fit in memory are recorded as skipped.
+
+Usage:
+    python scripts/benchmark_recommendations.py --scales small medium --out bench/before.json
+    python scripts/benchmark_recommendations.py --scales small --out bench/after.json --compare bench/before.json
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SCALES = {
+    'small': {'products': 1_000, 'users': 10_000},
+    'medium': {'products': 10_000, 'users': 10_000},
+    'large': {'products': 100_000, 'users': 1_000_000},
+}
+STAGES = ['preprocess_data', 'calculate_all_thresholds', 'build_content_similarity_matrix',
+          'build_collaborative_filtering_model', 'get_hybrid_recommendations']
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def available_memory_bytes():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def dense_estimates(system):
+    """Rough bytes for the dense matrices each stage materializes"""
+    n_products = len(system.products_df)
+    n_users = system.transactions_df['user_id'].nunique()
+    n_sold = system.transactions_df['product_id'].nunique()
+    return {
+        'build_content_similarity_matrix': 8 * n_products * n_products,
+        # The collaborative model is sparse: only its float32 factors are dense
+        'build_collaborative_filtering_model': 4 * 50 * (n_users + n_sold),
+    }
+
+
+def make_data(products, users, transactions_per_user, seed, today):
+    from generate_synthetic_data import generate_products, generate_transactions, generate_users
+
+    users_seed, products_seed, transactions_seed = np.random.SeedSequence(seed).spawn(3)
+    users_df = generate_users(users, np.random.default_rng(users_seed), today)
+    products_df = generate_products(products, np.random.default_rng(products_seed), today)
+    transactions_df = pd.concat(generate_transactions(
+        users_df, products_df, users * transactions_per_user, np.random.default_rng(transactions_seed), today
+    ), ignore_index=True)
+    return (users_df.drop(columns=['allergy_bits']), products_df.drop(columns=['allergen_bits']), transactions_df)
+
+
+def run_scale(config):
+    """Benchmark one scale; runs in its own process"""
+    from unified_waste_reduction_system import UnifiedRecommendationSystem
+
+    result = {**config, 'stages': {}}
+    users_df, products_df, transactions_df = make_data(
+        config['products'], config['users'], config['transactions_per_user'], config['seed'], date.today()
+    )
+    result['transactions'] = len(transactions_df)
+    result['data_peak_rss_mb'] = peak_rss_mb()
+
+    def record(stage, seconds=None, skipped=None):
+        entry = {'peak_rss_mb': peak_rss_mb()}
+        if skipped:
+            entry['skipped'] = skipped
+        else:
+            entry['seconds'] = round(seconds, 4)
+        result['stages'][stage] = entry
+        logger.info(f"[{config['scale']}] {stage}: {skipped or f'{seconds:.3f}s'} (peak RSS {entry['peak_rss_mb']} MB)")
+
+    # preprocess_data runs inside the constructor; time it there without changing the model code
+    preprocess = UnifiedRecommendationSystem.preprocess_data
+    preprocess_seconds = []
+
+    def timed_preprocess(self):
+        started = time.perf_counter()
+        preprocess(self)
+        preprocess_seconds.append(time.perf_counter() - started)
+
+    UnifiedRecommendationSystem.preprocess_data = timed_preprocess
+    try:
+        started = time.perf_counter()
+        system = UnifiedRecommendationSystem(users_df, products_df, transactions_df)
+        result['init_seconds'] = round(time.perf_counter() - started, 4)
+    finally:
+        UnifiedRecommendationSystem.preprocess_data = preprocess
+    record('preprocess_data', preprocess_seconds[0])
+    result['product_store_mb'] = round(float(system.memory_usage().sum()) / 1e6, 2)
+
+    started = time.perf_counter()
+    system.threshold_calculator.calculate_all_thresholds()
+    record('calculate_all_thresholds', time.perf_counter() - started)
+
+    estimates = dense_estimates(system)
+    memory_limit = config['memory_limit_bytes']
+    built = True
+    for stage in ['build_content_similarity_matrix', 'build_collaborative_filtering_model']:
+        if memory_limit and estimates[stage] > memory_limit:
+            record(stage, skipped=f"needs ~{estimates[stage] / 1e9:.1f} GB dense")
+            built = False
+            continue
+        started = time.perf_counter()
+        getattr(system, stage)()
+        record(stage, time.perf_counter() - started)
+
+    if not built:
+        record('get_hybrid_recommendations', skipped="model stages skipped")
+        return result
+
+    rng = np.random.default_rng(config['seed'])
+    sample = rng.choice(users_df['user_id'].to_numpy(), size=min(config['sample_users'], len(users_df)), replace=False)
+    latencies = []
+    started = time.perf_counter()
+    for user_id in sample:
+        call_started = time.perf_counter()
+        system.get_hybrid_recommendations(user_id, n_recommendations=10)
+        latencies.append((time.perf_counter() - call_started) * 1000)
+    record('get_hybrid_recommendations', time.perf_counter() - started)
+    result['stages']['get_hybrid_recommendations'].update({
+        'users': len(latencies),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'mean_ms': round(float(np.mean(latencies)), 3),
+    })
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def stage_seconds(result, stage):
+    return result['stages'].get(stage, {}).get('seconds')
+
+
+def compare(results, baseline_path):
+    """Print speedups against a previous JSON report (matched by scale)"""
+    with open(baseline_path) as f:
+        baseline = {r['scale']: r for r in json.load(f)['results']}
+    for result in results:
+        before = baseline.get(result['scale'])
+        if before is None:
+            continue
+        print(f"\n{result['scale']} vs {baseline_path}")
+        for stage in STAGES:
+            old, new = stage_seconds(before, stage), stage_seconds(result, stage)
+            if old and new:
+                print(f"  {stage:<38}{old:>10.3f}s -> {new:>10.3f}s  ({old / new:5.2f}x)")
+        old_p99 = before['stages'].get('get_hybrid_recommendations', {}).get('p99_ms')
+        new_p99 = result['stages'].get('get_hybrid_recommendations', {}).get('p99_ms')
+        if old_p99 and new_p99:
+            print(f"  {'hybrid p99 (ms)':<38}{old_p99:>11.2f} -> {new_p99:>11.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark UnifiedRecommendationSystem stages on synthetic data")
+    parser.add_argument('--scales', nargs='+', default=['small'], choices=list(SCALES) + ['custom'])
+    parser.add_argument('--products', type=int, help="Products for --scales custom")
+    parser.add_argument('--users', type=int, help="Users for --scales custom")
+    parser.add_argument('--transactions-per-user', type=int, default=5)
+    parser.add_argument('--sample-users', type=int, default=200, help="Users timed for hybrid recommendations")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--memory-limit-gb', type=float, default=None,
+                        help="Skip dense stages estimated above this (default: physical memory)")
+    parser.add_argument('--out', default='benchmark_recommendations.json')
+    parser.add_argument('--compare', help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    memory_limit = args.memory_limit_gb * 1e9 if args.memory_limit_gb else available_memory_bytes()
+    configs = []
+    for scale in args.scales:
+        size = {'products': args.products, 'users': args.users} if scale == 'custom' else SCALES[scale]
+        if not size['products'] or not size['users']:
+            parser.error("--scales custom needs --products and --users")
+        configs.append({
+            'scale': scale, **size, 'transactions_per_user': args.transactions_per_user,
+            'sample_users': args.sample_users, 'seed': args.seed, 'memory_limit_bytes': memory_limit,
+        })
+
+    # A fresh process per scale keeps peak RSS and caches independent
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for config in configs:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_scale, (config,)))
+
+    report = {'environment': environment(), 'results': results}
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote {args.out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Generate a SQL benchmark comparing the old per-row transaction triggers with the
+statement-level triggers emitted by recreate_tables_fresh.py.
+Run the generated script in the Supabase SQL Editor (or psql); it works in a scratch
+schema and drops it afterwards, so existing tables are not touched.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from recreate_tables_fresh import TRANSACTION_TRIGGERS_SQL
+
+# FOR EACH ROW triggers as shipped before the statement-level rewrite (baseline)
+ROW_LEVEL_TRIGGERS_SQL = """
+-- Create function to update inventory on transaction
+CREATE OR REPLACE FUNCTION update_inventory_on_transaction_fn()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Update inventory quantity
+    UPDATE products 
+    SET inventory_quantity = inventory_quantity - NEW.quantity,
+        updated_at = NOW()
+    WHERE product_id = NEW.product_id;
+    
+    -- Check if inventory is negative (shouldn't happen with proper validation)
+    IF (SELECT inventory_quantity FROM products WHERE product_id = NEW.product_id) < 0 THEN
+        RAISE EXCEPTION 'Insufficient inventory for product %', NEW.product_id;
+    END IF;
+    
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create function to update revenue on transaction
+CREATE OR REPLACE FUNCTION update_revenue_on_transaction_fn()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Update revenue_generated
+    UPDATE products 
+    SET revenue_generated = revenue_generated + NEW.total_price_paid,
+        updated_at = NOW()
+    WHERE product_id = NEW.product_id;
+    
+    -- Update user's last purchase date
+    UPDATE users 
+    SET last_purchase_date = NEW.purchase_date,
+        updated_at = NOW()
+    WHERE user_id = NEW.user_id;
+    
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create triggers
+CREATE TRIGGER update_inventory_on_transaction
+AFTER INSERT ON transactions
+FOR EACH ROW
+EXECUTE FUNCTION update_inventory_on_transaction_fn();
+
+CREATE TRIGGER update_revenue_on_transaction
+AFTER INSERT ON transactions
+FOR EACH ROW
+EXECUTE FUNCTION update_revenue_on_transaction_fn();
+"""
+
+
+def timed_insert(variant, rows, products, users):
+    """Insert `rows` transactions in one statement and record elapsed time and a state checksum"""
+    return f"""
+DO $$
+DECLARE
+    started TIMESTAMPTZ := clock_timestamp();
+BEGIN
+    INSERT INTO transactions (user_id, product_id, purchase_date, quantity, total_price_paid)
+    SELECT 'U' || (1 + g % {users}), 'P' || (1 + g % {products}), CURRENT_DATE - (g % 30), 1 + g % 3, 99.50
+    FROM generate_series(1, {rows}) g;
+    
+    INSERT INTO bench_results
+    SELECT '{variant}', {rows}, ROUND((EXTRACT(EPOCH FROM clock_timestamp() - started) * 1000)::numeric, 1),
+           (SELECT SUM(inventory_quantity) FROM products),
+           (SELECT SUM(revenue_generated) FROM products),
+           (SELECT COUNT(*) FROM users WHERE last_purchase_date IS NOT NULL);
+END $$;
+"""
+
+
+def generate_benchmark_sql(rows=100000, products=2000, users=1000):
+    return f"""
+-- Transaction trigger benchmark: {rows} rows, {products} products, {users} users
+DROP SCHEMA IF EXISTS trigger_bench CASCADE;
+CREATE SCHEMA trigger_bench;
+SET search_path = trigger_bench;
+
+CREATE TABLE users (
+    user_id VARCHAR(10) PRIMARY KEY,
+    last_purchase_date DATE,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE products (
+    product_id VARCHAR(10) PRIMARY KEY,
+    inventory_quantity INTEGER CHECK (inventory_quantity >= 0),
+    revenue_generated DECIMAL(14, 2) DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE transactions (
+    transaction_id SERIAL PRIMARY KEY,
+    user_id VARCHAR(10) NOT NULL REFERENCES users(user_id),
+    product_id VARCHAR(10) NOT NULL REFERENCES products(product_id),
+    purchase_date DATE NOT NULL,
+    quantity INTEGER NOT NULL,
+    total_price_paid DECIMAL(10, 2) NOT NULL
+);
+
+INSERT INTO users (user_id) SELECT 'U' || g FROM generate_series(1, {users}) g;
+INSERT INTO products (product_id, inventory_quantity) SELECT 'P' || g, 1000000 FROM generate_series(1, {products}) g;
+
+CREATE TEMP TABLE bench_results (
+    variant TEXT, rows_inserted INTEGER, elapsed_ms NUMERIC,
+    total_inventory BIGINT, total_revenue NUMERIC, users_with_purchases BIGINT
+);
+
+-- 1. Row-level triggers
+{ROW_LEVEL_TRIGGERS_SQL}
+{timed_insert('row-level', rows, products, users)}
+
+-- Reset state
+DROP TRIGGER update_inventory_on_transaction ON transactions;
+DROP TRIGGER update_revenue_on_transaction ON transactions;
+TRUNCATE transactions;
+UPDATE products SET inventory_quantity = 1000000, revenue_generated = 0;
+UPDATE users SET last_purchase_date = NULL;
+
+-- 2. Statement-level triggers (as emitted by recreate_tables_fresh.py)
+{TRANSACTION_TRIGGERS_SQL}
+{timed_insert('statement-level', rows, products, users)}
+
+-- Both variants must leave identical totals
+SELECT * FROM bench_results ORDER BY elapsed_ms DESC;
+
+DROP SCHEMA trigger_bench CASCADE;
+RESET search_path;
+"""
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate the row-level vs statement-level trigger benchmark SQL')
+    parser.add_argument('--rows', type=int, default=100000, help='Transactions inserted per variant')
+    parser.add_argument('--products', type=int, default=2000, help='Distinct products')
+    parser.add_argument('--users', type=int, default=1000, help='Distinct users')
+    args = parser.parse_args()
+
+    sql_script = generate_benchmark_sql(args.rows, args.products, args.users)
+    script_filename = f"benchmark_triggers_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sql"
+    with open(script_filename, 'w') as f:
+        f.write(sql_script)
+
+    print(f"Benchmark SQL saved to: {script_filename}")
+    print("Run it in the Supabase SQL Editor or with: psql \"$DATABASE_URL\" -f " + script_filename)
+    print("The final SELECT lists elapsed time per variant; totals must match between rows.")
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Bulk loader for seeding large datasets.
+
+Rows are streamed in chunks and inserted through the Supabase REST API by a
+bounded pool of worker threads, retrying with exponential backoff on 429/5xx
+and connection errors. A timed-out insert may already have committed, so
+transaction rows (SERIAL key) get an idempotency_key and are written with an
+upsert that ignores keys already present: a retry cannot insert a sale twice. When a direct Postgres connection is configured
+(--dsn or DATABASE_URL) chunks are loaded with COPY instead, which is an order
+of magnitude faster; COPY chunks run sequentially on one connection so the
+statement-level transaction triggers never contend for the same product rows.
+
+Usage (files written by generate_synthetic_data.py):
+    python scripts/bulk_loader.py --dir synthetic_data --format parquet --workers 8
+    DATABASE_URL=postgresql://... python scripts/bulk_loader.py --dir synthetic_data
+"""
+
+import argparse
+import io
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+LIST_COLUMNS = ('allergies', 'allergens', 'preferred_categories')
+TABLE_ORDER = ('users', 'products', 'transactions')  # foreign keys need this order
+# Tables without a natural key: column to dedupe retried inserts on (users/products conflict on their own PK)
+IDEMPOTENCY_KEYS = {'transactions': 'idempotency_key'}
+
+
+def status_code(error):
+    """HTTP status of a client error, wherever the library put it"""
+    for candidate in (getattr(error, 'status_code', None),
+                      getattr(getattr(error, 'response', None), 'status_code', None),
+                      getattr(error, 'code', None)):
+        try:
+            return int(candidate)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if type(error).__module__.startswith('httpx') and 'Status' not in type(error).__name__:
+        return True  # transport errors: connect/read timeouts, resets
+    return status_code(error) in RETRYABLE_STATUS
+
+
+def _parse_array_literal(value):
+    if isinstance(value, str):
+        inner = value.strip('{}')
+        return inner.split(',') if inner else []
+    return list(value)
+
+
+def _to_array_literal(value):
+    if isinstance(value, str):
+        return value
+    return '{' + ','.join(value) + '}'
+
+
+def _normalize(chunk):
+    """Dicts -> DataFrame with ISO date strings"""
+    df = chunk if isinstance(chunk, pd.DataFrame) else pd.DataFrame(chunk)
+    dates = df.select_dtypes(include=['datetime64']).columns
+    return df.assign(**{c: df[c].dt.strftime('%Y-%m-%d') for c in dates})
+
+
+def rest_records(chunk):
+    """JSON-ready rows for a PostgREST insert"""
+    df = _normalize(chunk)
+    lists = [c for c in LIST_COLUMNS if c in df]
+    df = df.assign(**{c: df[c].map(_parse_array_literal) for c in lists})
+    return df.to_dict('records')
+
+
+def copy_buffer(chunk):
+    """(columns, CSV buffer) for COPY ... FROM STDIN WITH (FORMAT csv)"""
+    df = _normalize(chunk)
+    lists = [c for c in LIST_COLUMNS if c in df]
+    df = df.assign(**{c: df[c].map(_to_array_literal) for c in lists})
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    return list(df.columns), buffer
+
+
+class BulkLoader:
+    def __init__(self, client=None, dsn=None, workers=4, max_retries=6, backoff=0.5, progress_interval=5.0):
+        self.client = client
+        self.dsn = dsn
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.progress_interval = progress_interval
+        self._retries = 0
+        self._retries_lock = threading.Lock()
+
+    def load(self, table, chunks):
+        """Insert every chunk (DataFrame or list of dicts); returns throughput stats"""
+        started = time.perf_counter()
+        self._retries = 0
+        if self.dsn:
+            rows, count = self._copy_chunks(table, chunks, started)
+        else:
+            rows, count = self._insert_chunks(table, chunks, started)
+        elapsed = time.perf_counter() - started
+        stats = {
+            'table': table, 'rows': rows, 'chunks': count, 'seconds': round(elapsed, 2),
+            'rows_per_sec': round(rows / elapsed) if elapsed else rows, 'retries': self._retries,
+            'method': 'copy' if self.dsn else 'rest',
+        }
+        logger.info(f"Loaded {rows:,} rows into {table} in {elapsed:.1f}s "
+                    f"({stats['rows_per_sec']:,} rows/s, {stats['retries']} retries, {stats['method']})")
+        return stats
+
+    # --- REST ---
+
+    def _insert_chunks(self, table, chunks, started):
+        rows = count = 0
+        last_report = started
+        # At most 2x workers chunks in flight so a 10M-row stream never sits in memory at once
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = set()
+            for chunk in chunks:
+                records = rest_records(chunk)
+                if not records:
+                    continue
+                key_column = IDEMPOTENCY_KEYS.get(table)
+                if key_column:
+                    # Keys are fixed before the first attempt so every retry sends the same ones
+                    records = [record if record.get(key_column) else dict(record, **{key_column: uuid.uuid4().hex})
+                               for record in records]
+                if len(in_flight) >= 2 * self.workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        rows += future.result()
+                in_flight.add(pool.submit(self._insert_with_retry, table, records))
+                count += 1
+                if time.perf_counter() - last_report >= self.progress_interval:
+                    last_report = time.perf_counter()
+                    logger.info(f"{table}: {rows:,} rows ({rows / (last_report - started):,.0f} rows/s)")
+            for future in wait(in_flight).done:
+                rows += future.result()
+        return rows, count
+
+    def _insert_with_retry(self, table, records):
+        key_column = IDEMPOTENCY_KEYS.get(table)
+        for attempt in range(self.max_retries + 1):
+            try:
+                if key_column:
+                    self.client.table(table).upsert(records, on_conflict=key_column, ignore_duplicates=True).execute()
+                else:
+                    self.client.table(table).insert(records).execute()
+                return len(records)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                with self._retries_lock:
+                    self._retries += 1
+                # Exponential backoff with jitter so workers do not retry in lockstep
+                delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                logger.warning(f"Insert into {table} failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+    # --- COPY ---
+
+    def _connect(self):
+        try:
+            import psycopg
+            return psycopg.connect(self.dsn)
+        except ImportError:
+            pass
+        try:
+            import psycopg2
+            return psycopg2.connect(self.dsn)
+        except ImportError:
+            raise SystemExit("COPY loading needs psycopg (pip install 'psycopg[binary]') or psycopg2")
+
+    def _copy_chunks(self, table, chunks, started):
+        rows = count = 0
+        connection = self._connect()
+        try:
+            for chunk in chunks:
+                columns, buffer = copy_buffer(chunk)
+                if not columns:
+                    continue
+                sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+                with connection.cursor() as cursor:
+                    if hasattr(cursor, 'copy'):
+                        with cursor.copy(sql) as copy:
+                            copy.write(buffer.read())
+                    else:
+                        cursor.copy_expert(sql, buffer)
+                connection.commit()
+                rows += len(chunk)
+                count += 1
+                elapsed = time.perf_counter() - started
+                logger.info(f"{table}: {rows:,} rows ({rows / elapsed:,.0f} rows/s)")
+        finally:
+            connection.close()
+        return rows, count
+
+
+def iter_file_chunks(path, chunk_size):
+    """Stream a CSV or Parquet file as DataFrames of chunk_size rows"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, keep_default_na=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load users/products/transactions files into Supabase")
+    parser.add_argument('--dir', default='synthetic_data', help="Directory written by generate_synthetic_data.py")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--tables', nargs='+', default=list(TABLE_ORDER), choices=TABLE_ORDER)
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help="Rows per request (default 1000 for REST, 100000 for COPY)")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent REST insert workers")
+    parser.add_argument('--max-retries', type=int, default=6)
+    parser.add_argument('--dsn', default=os.getenv('DATABASE_URL'), help="Postgres DSN; enables COPY loading")
+    args = parser.parse_args()
+
+    client = None
+    if not args.dsn:
+        from faker_to_supabase import SUPABASE_KEY, SUPABASE_URL
+        from supabase import create_client
+        client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    chunk_size = args.chunk_size or (100_000 if args.dsn else 1000)
+
+    loader = BulkLoader(client, args.dsn, workers=args.workers, max_retries=args.max_retries)
+    for table in TABLE_ORDER:
+        if table in args.tables:
+            path = os.path.join(args.dir, f'{table}.{args.format}')
+            loader.load(table, iter_file_chunks(path, chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+-- =====================================================
+-- Set-based revenue/inventory reconciliation
+-- =====================================================
+
+-- Compare every product with the totals of its transactions in one statement:
+--   expected revenue_generated  = SUM(total_price_paid)
+--   expected inventory_quantity = initial_inventory_quantity - SUM(quantity)
+-- Returns only the products that drifted. With apply_changes the same statement
+-- also corrects them (one UPDATE ... FROM over the diff); without it it is a dry run.
+CREATE OR REPLACE FUNCTION reconcile_product_totals(apply_changes boolean DEFAULT false)
+RETURNS TABLE (
+    product_id varchar,
+    current_revenue numeric,
+    expected_revenue numeric,
+    current_inventory integer,
+    expected_inventory integer
+) AS $$
+    WITH sold AS (
+        SELECT t.product_id, SUM(t.quantity) AS quantity, SUM(t.total_price_paid) AS revenue
+        FROM transactions t
+        GROUP BY t.product_id
+    ),
+    diff AS (
+        SELECT
+            p.product_id,
+            p.revenue_generated AS current_revenue,
+            COALESCE(s.revenue, 0) AS expected_revenue,
+            p.inventory_quantity AS current_inventory,
+            (p.initial_inventory_quantity - COALESCE(s.quantity, 0))::integer AS expected_inventory
+        FROM products p
+        LEFT JOIN sold s ON s.product_id = p.product_id
+        WHERE p.revenue_generated IS DISTINCT FROM COALESCE(s.revenue, 0)
+           OR p.inventory_quantity IS DISTINCT FROM p.initial_inventory_quantity - COALESCE(s.quantity, 0)
+    ),
+    applied AS (
+        UPDATE products p
+        SET revenue_generated = d.expected_revenue,
+            inventory_quantity = d.expected_inventory
+        FROM diff d
+        WHERE apply_changes AND p.product_id = d.product_id
+        RETURNING p.product_id
+    )
+    SELECT d.product_id, d.current_revenue, d.expected_revenue, d.current_inventory, d.expected_inventory
+    FROM diff d
+    ORDER BY abs(d.expected_revenue - d.current_revenue) DESC, d.product_id;
+$$ LANGUAGE sql;
+
+-- Grant execute permissions
+GRANT EXECUTE ON FUNCTION reconcile_product_totals(boolean) TO anon;
+GRANT EXECUTE ON FUNCTION reconcile_product_totals(boolean) TO authenticated;
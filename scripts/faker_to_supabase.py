@@ -13,6 +13,7 @@ from supabase import create_client, Client
 import logging
 from typing import List, Dict, Any
 import json
+from bulk_loader import BulkLoader
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -392,16 +393,14 @@ class SupabaseFaker:
             logger.info(f"  - Skipped {skipped_date_issues} due to invalid date ranges")
         return transactions
     
-    def insert_data(self, table_name: str, data: List[Dict], batch_size: int = 100):
-        """Insert data into Supabase table in batches"""
+    def insert_data(self, table_name: str, data: List[Dict], batch_size: int = 1000, workers: int = 4):
+        """Insert data into Supabase table in concurrent batches with retry/backoff"""
         logger.info(f"Inserting {len(data)} records into {table_name}...")
         
         try:
-            for i in range(0, len(data), batch_size):
-                batch = data[i:i + batch_size]
-                response = self.supabase.table(table_name).insert(batch).execute()
-                logger.info(f"Inserted batch {i//batch_size + 1} of {len(data)//batch_size + 1} into {table_name}")
-            
+            # DATABASE_URL switches the loader to COPY over a direct Postgres connection
+            loader = BulkLoader(self.supabase, os.getenv("DATABASE_URL"), workers=workers)
+            loader.load(table_name, (data[i:i + batch_size] for i in range(0, len(data), batch_size)))
             logger.info(f"Successfully inserted all records into {table_name}")
             return True
         except Exception as e:
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Vectorized synthetic data generator for load testing.
+
+Produces users, products and transactions with the same distributions and
+constraints as faker_to_supabase.SupabaseFaker (diet/allergen compatibility,
+purchase dates inside the packaging/expiry window, discount engagement rules),
+but with NumPy instead of one Faker call per row, so millions of transactions
+take seconds. Output is seedable and written in chunks to CSV or Parquet.
+Each product's initial inventory covers the units the transactions sell, so the
+files load through the inventory triggers without an insufficient-inventory error.
+
+Usage:
+    python scripts/generate_synthetic_data.py --users 100000 --products 20000 \
+        --transactions 10000000 --format parquet --out data/synthetic --seed 42
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from faker_to_supabase import (  # noqa: E402
+    ADJECTIVES, BRANDS_BY_CATEGORY, CATEGORIES, COMMON_ALLERGENS, DIET_TYPES, PRODUCT_TEMPLATES
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# A product is compatible when its diet rank is <= the user's (vegan < vegetarian < eggitarian < non-veg)
+DIET_RANK = {'vegan': 0, 'vegetarian': 1, 'eggitarian': 2, 'non-vegetarian': 3}
+PERISHABLE = ['Dairy', 'Meat', 'Vegetables', 'Fruits']
+SHELF_LIFE_RANGES = {
+    **{c: (3, 14) for c in PERISHABLE},
+    'Beverages': (30, 365),
+    'Cheese': (30, 180), 'Spreads': (30, 180),
+    'Grains': (60, 730), 'Snacks': (60, 730), 'Biscuits': (60, 730), 'Sauces': (60, 730),
+}
+# (allergen, probability) added per category before the random extra allergen
+CATEGORY_ALLERGENS = {
+    'Dairy': [('dairy', 1.0)], 'Cheese': [('dairy', 1.0)],
+    'Grains': [('gluten', 0.3)], 'Biscuits': [('gluten', 0.3)],
+    'Snacks': [('nuts', 0.4)], 'Spreads': [('nuts', 0.4)],
+    'Sauces': [('soy', 0.2)],
+}
+
+
+def _ids(prefix, n):
+    """U0000-style ids, widened when n needs more digits"""
+    return prefix + pd.Series(np.arange(n)).astype(str).str.zfill(max(4, len(str(n - 1))))
+
+
+def _sample_without_replacement(rng, counts, allowed):
+    """Row-wise random subsets: counts[i] items from the True columns of allowed[i]"""
+    keys = rng.random(allowed.shape)
+    keys[~allowed] = np.inf
+    order = np.argsort(keys, axis=1)
+    chosen = np.zeros(allowed.shape, dtype=bool)
+    take = np.arange(allowed.shape[1]) < counts[:, None]
+    np.put_along_axis(chosen, order, take, axis=1)
+    return chosen
+
+
+def _mask_to_lists(chosen, labels):
+    """Boolean membership matrix -> list column"""
+    labels = np.array(labels, dtype=object)
+    return [list(labels[row]) for row in chosen]
+
+
+def _bits(chosen):
+    return (chosen * (1 << np.arange(chosen.shape[1]))).sum(axis=1).astype(np.int64)
+
+
+def _pick(rng, options, n, p=None):
+    return np.asarray(options, dtype=object)[rng.choice(len(options), size=n, p=p)]
+
+
+def generate_users(n, rng, today):
+    """Users with diet types, allergies (plus `allergy_bits`) and diet-appropriate preferred categories"""
+    diet_type = _pick(rng, DIET_TYPES, n, p=np.array([15, 40, 35, 10]) / 100)
+
+    allergy_counts = rng.choice(4, size=n, p=[0.5, 0.3, 0.15, 0.05])
+    allergies = _sample_without_replacement(rng, allergy_counts, np.ones((n, len(COMMON_ALLERGENS)), dtype=bool))
+
+    # Vegans skip Meat/Dairy/Cheese, vegetarians and eggitarians skip Meat
+    categories = np.array(CATEGORIES)
+    rank = pd.Series(diet_type).map(DIET_RANK).to_numpy()
+    allowed = np.ones((n, len(CATEGORIES)), dtype=bool)
+    allowed[:, categories == 'Meat'] = (rank == 3)[:, None]
+    allowed[:, np.isin(categories, ['Dairy', 'Cheese'])] = (rank > 0)[:, None]
+    max_categories = np.minimum(5, allowed.sum(axis=1))
+    category_counts = rng.integers(2, max_categories + 1)
+    preferred = _sample_without_replacement(rng, category_counts, allowed)
+
+    return pd.DataFrame({
+        'user_id': _ids('U', n),
+        'age': rng.integers(18, 71, n),
+        'gender': _pick(rng, ['male', 'female', 'other'], n),
+        'diet_type': diet_type,
+        'allergies': _mask_to_lists(allergies, COMMON_ALLERGENS),
+        'prefers_discount': rng.random(n) < 0.5,
+        'location_lat': np.round(rng.uniform(-90, 90, n), 7),
+        'location_lon': np.round(rng.uniform(-180, 180, n), 7),
+        'preferred_categories': _mask_to_lists(preferred, CATEGORIES),
+        'last_purchase_date': np.datetime64(today, 'D') - rng.integers(0, 61, n).astype('timedelta64[D]'),
+        'allergy_bits': _bits(allergies),
+    })
+
+
+def generate_products(n, rng, today):
+    """Products spread evenly over CATEGORIES with category-specific shelf life, diet and allergens"""
+    per_category = np.full(len(CATEGORIES), n // len(CATEGORIES))
+    per_category[:n % len(CATEGORIES)] += 1
+    category = np.repeat(np.array(CATEGORIES, dtype=object), per_category)
+
+    brand = np.empty(n, dtype=object)
+    name = np.empty(n, dtype=object)
+    shelf_life = np.empty(n, dtype=np.int64)
+    diet_type = np.empty(n, dtype=object)
+    allergens = np.zeros((n, len(COMMON_ALLERGENS)), dtype=bool)
+    start = 0
+    for c, count in zip(CATEGORIES, per_category):
+        rows = slice(start, start + count)
+        start += count
+        brand[rows] = _pick(rng, BRANDS_BY_CATEGORY[c], count)
+        templates = _pick(rng, PRODUCT_TEMPLATES[c], count)
+        adjectives = _pick(rng, ADJECTIVES, count)
+        name[rows] = [f"{b} {t.format(adjective=a)}" for b, t, a in zip(brand[rows], templates, adjectives)]
+        low, high = SHELF_LIFE_RANGES[c]
+        shelf_life[rows] = rng.integers(low, high + 1, count)
+        if c == 'Meat':
+            diet_type[rows] = 'non-vegetarian'
+        elif c in ['Dairy', 'Cheese']:
+            diet_type[rows] = _pick(rng, ['vegetarian', 'eggitarian'], count)
+        else:
+            diet_type[rows] = _pick(rng, ['vegan', 'vegetarian'], count)
+        for allergen, probability in CATEGORY_ALLERGENS.get(c, []):
+            allergens[rows, COMMON_ALLERGENS.index(allergen)] = rng.random(count) < probability
+
+    # 15% get one extra allergen they do not already have, appended after the category ones
+    extra = _sample_without_replacement(rng, (rng.random(n) < 0.15).astype(int), ~allergens)
+    allergen_lists = _mask_to_lists(allergens, COMMON_ALLERGENS)
+    extra_index = extra.argmax(axis=1)
+    for i in np.flatnonzero(extra.any(axis=1)):
+        allergen_lists[i].append(COMMON_ALLERGENS[extra_index[i]])
+
+    today64 = np.datetime64(today, 'D')
+    packaging_date = today64 - rng.integers(0, 61, n).astype('timedelta64[D]')
+    expiry_date = packaging_date + shelf_life.astype('timedelta64[D]')
+    days_until_expiry = (expiry_date - today64).astype(np.int64)
+
+    price_mrp = np.round(rng.uniform(20, 500, n), 2)
+    cost_price = np.round(price_mrp * rng.uniform(0.40, 0.45, n), 2)
+    inventory = np.where(rng.random(n) < 0.1, rng.integers(5, 51, n), rng.integers(100, 501, n))
+
+    # Higher discount for items close to expiry
+    discount = np.select(
+        [days_until_expiry <= 3, days_until_expiry <= 7, days_until_expiry <= 14],
+        [rng.choice([30, 40, 50, 60], n), rng.choice([20, 30, 40], n), rng.choice([10, 15, 20], n)],
+        rng.choice([0, 0, 0, 5, 10], n)
+    )
+
+    return pd.DataFrame({
+        'product_id': _ids('P', n),
+        'name': name,
+        'category': category,
+        'brand': brand,
+        'diet_type': diet_type,
+        'allergens': allergen_lists,
+        'shelf_life_days': shelf_life,
+        'packaging_date': packaging_date,
+        'expiry_date': expiry_date,
+        'weight_grams': rng.choice([100, 250, 500, 750, 1000, 1500, 2000], n),
+        'price_mrp': price_mrp,
+        'cost_price': cost_price,
+        'current_discount_percent': discount,
+        'inventory_quantity': inventory,
+        'initial_inventory_quantity': inventory,
+        'total_cost': np.round(inventory * cost_price, 2),
+        'revenue_generated': 0.0,
+        'store_location_lat': np.round(rng.uniform(-90, 90, n), 8),
+        'store_location_lon': np.round(rng.uniform(-180, 180, n), 8),
+        'allergen_bits': _bits(allergens | extra),
+    })
+
+
+def compatible_products(users, products, today):
+    """
+    For each distinct (diet, allergies) user profile, the indices of products it may buy.
+    Products whose purchase window (packaging .. min(expiry, today)) is empty are excluded.
+    Returns (profile id per user, list of product index arrays per profile).
+    """
+    today64 = np.datetime64(today, 'D')
+    in_window = products['packaging_date'].to_numpy() <= np.minimum(products['expiry_date'].to_numpy(), today64)
+    product_rank = products['diet_type'].map(DIET_RANK).to_numpy()
+    product_bits = products['allergen_bits'].to_numpy()
+
+    profiles = pd.DataFrame({'rank': users['diet_type'].map(DIET_RANK), 'bits': users['allergy_bits']})
+    profile_id, unique_profiles = pd.factorize(pd.MultiIndex.from_frame(profiles))
+    pools = [
+        np.flatnonzero(in_window & (product_rank <= rank) & ((product_bits & bits) == 0))
+        for rank, bits in unique_profiles
+    ]
+    return profile_id, pools
+
+
+def _sale_draws(users, products, n, rng, today, chunk_size):
+    """
+    Yield (user index, product index, quantity) arrays per chunk. Users without any compatible
+    product are never drawn, matching the retry loop of SupabaseFaker.generate_transactions;
+    products are uniform over each user's compatible set. `rng` is only used for these draws,
+    so the same seed gives the same sales in generate_transactions and sold_quantities.
+    """
+    profile_id, pools = compatible_products(users, products, today)
+    pool_sizes = np.array([len(pool) for pool in pools])
+    eligible = np.flatnonzero(pool_sizes[profile_id] > 0)
+    if len(eligible) == 0:
+        raise ValueError("No user can buy any product")
+    # Flattened pools: product = pool_flat[pool_start[profile] + offset]
+    pool_flat = np.concatenate(pools)
+    pool_start = np.concatenate([[0], np.cumsum(pool_sizes)[:-1]])
+    perishable = products['category'].isin(PERISHABLE).to_numpy()
+
+    for start in range(0, n, chunk_size):
+        m = min(chunk_size, n - start)
+        u = eligible[rng.integers(0, len(eligible), m)]
+        profile = profile_id[u]
+        p = pool_flat[pool_start[profile] + (rng.random(m) * pool_sizes[profile]).astype(np.int64)]
+        quantity = np.where(
+            perishable[p],
+            rng.choice([1, 2, 3], m, p=[0.5, 0.35, 0.15]),
+            rng.choice([1, 2, 3, 4, 5], m, p=[0.3, 0.3, 0.2, 0.15, 0.05])
+        )
+        yield u, p, quantity
+
+
+def _draw_rng(rng):
+    """Generator for _sale_draws, derived from (and advancing) rng identically for identically seeded rngs"""
+    return np.random.default_rng(rng.integers(2 ** 63))
+
+
+def sold_quantities(users, products, n, rng, today, chunk_size=1_000_000):
+    """Units generate_transactions will sell per product (aligned with products) for the same rng"""
+    draw_rng = _draw_rng(rng)
+    sold = np.zeros(len(products), dtype=np.int64)
+    for _, p, quantity in _sale_draws(users, products, n, draw_rng, today, chunk_size):
+        sold += np.bincount(p, weights=quantity, minlength=len(products)).astype(np.int64)
+    return sold
+
+
+def stock_for_sales(products, sold):
+    """
+    Products with initial inventory raised by the units sold, so loading the transactions
+    through the inventory triggers never drives a product below zero (the insufficient
+    inventory check and CHECK (inventory_quantity >= 0)); each product ends with its
+    generated stock once the transactions are applied.
+    """
+    initial = products['initial_inventory_quantity'].to_numpy() + sold
+    return products.assign(
+        inventory_quantity=initial,
+        initial_inventory_quantity=initial,
+        total_cost=np.round(initial * products['cost_price'].to_numpy(), 2),
+    )
+
+
+def generate_transactions(users, products, n, rng, today, chunk_size=1_000_000):
+    """
+    Yield transaction DataFrames of up to chunk_size rows (see _sale_draws for who buys what).
+    Load them against stock_for_sales(products, sold_quantities(...)) with an identically
+    seeded rng so no product sells more than its initial inventory.
+    """
+    draw_rng = _draw_rng(rng)
+    user_ids = users['user_id'].to_numpy()
+    user_diet = users['diet_type'].to_numpy()
+    prefers = users['prefers_discount'].to_numpy(dtype=bool)
+    product_ids = products['product_id'].to_numpy()
+    product_diet = products['diet_type'].to_numpy()
+    packaging = products['packaging_date'].to_numpy().astype('datetime64[D]')
+    expiry = products['expiry_date'].to_numpy().astype('datetime64[D]')
+    today64 = np.datetime64(today, 'D')
+    price_mrp = products['price_mrp'].to_numpy()
+    current_discount = products['current_discount_percent'].to_numpy()
+
+    for u, p, quantity in _sale_draws(users, products, n, draw_rng, today, chunk_size):
+        m = len(u)
+        # Purchase date uniform in [packaging, min(expiry, today)]
+        window = (np.minimum(expiry[p], today64) - packaging[p]).astype(np.int64)
+        purchase_date = packaging[p] + (rng.random(m) * (window + 1)).astype(np.int64).astype('timedelta64[D]')
+        days_to_expiry = (expiry[p] - purchase_date).astype(np.int64)
+
+        # Discount engagement rules
+        user_prefers = prefers[u]
+        product_discount = current_discount[p]
+        takes_deal = (days_to_expiry <= 7) | (user_prefers & (rng.random(m) < 0.7))
+        deal_hunter = ~takes_deal & user_prefers & (product_discount > 20)
+        hunter_discount = np.where(rng.random(m) < 0.4, product_discount, 0)
+        discount = np.select(
+            [takes_deal, deal_hunter],
+            [product_discount, hunter_discount],
+            rng.choice([0, 0, 0, 5, 10], m)
+        )
+        engaged = np.select([takes_deal, deal_hunter], [1, (hunter_discount > 0).astype(int)], 0)
+
+        price_paid_per_unit = np.round(price_mrp[p] * (1 - discount / 100), 2)
+        yield pd.DataFrame({
+            'user_id': user_ids[u],
+            'product_id': product_ids[p],
+            'purchase_date': purchase_date,
+            'quantity': quantity,
+            'price_paid_per_unit': price_paid_per_unit,
+            'total_price_paid': np.round(price_paid_per_unit * quantity, 2),
+            'discount_percent': discount,
+            'product_diet_type': product_diet[p],
+            'user_diet_type': user_diet[u],
+            'days_to_expiry_at_purchase': days_to_expiry,
+            'user_engaged_with_deal': engaged,
+        })
+
+
+def _postgres_array(values):
+    return '{' + ','.join(values) + '}'
+
+
+class ChunkWriter:
+    """Append DataFrame chunks to one CSV (Postgres array literals for list columns) or Parquet file"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df):
+        df = df.drop(columns=['allergy_bits', 'allergen_bits'], errors='ignore')
+        if self.fmt == 'csv':
+            list_columns = [c for c in ('allergies', 'allergens', 'preferred_categories') if c in df]
+            df = df.assign(**{c: df[c].map(_postgres_array) for c in list_columns})
+            df.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0,
+                      index=False, date_format='%Y-%m-%d')
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow (pip install pyarrow) - or use --format csv")
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def generate_dataset(out_dir, num_users, num_products, num_transactions, seed=None, fmt='csv',
+                     chunk_size=1_000_000, today=None):
+    """Write users, products and transactions files; returns {table: row count}"""
+    today = today or date.today()
+    os.makedirs(out_dir, exist_ok=True)
+    users_seed, products_seed, transactions_seed = np.random.SeedSequence(seed).spawn(3)
+
+    users = generate_users(num_users, np.random.default_rng(users_seed), today)
+    products = generate_products(num_products, np.random.default_rng(products_seed), today)
+    # Stock every product for what it will sell; the transactions pass below replays the same draws
+    sold = sold_quantities(users, products, num_transactions, np.random.default_rng(transactions_seed), today, chunk_size)
+    products = stock_for_sales(products, sold)
+    counts = {}
+    for table, df in (('users', users), ('products', products)):
+        writer = ChunkWriter(os.path.join(out_dir, f'{table}.{fmt}'), fmt)
+        writer.write(df)
+        writer.close()
+        counts[table] = writer.rows
+
+    writer = ChunkWriter(os.path.join(out_dir, f'transactions.{fmt}'), fmt)
+    started = time.perf_counter()
+    rng = np.random.default_rng(transactions_seed)
+    try:
+        for chunk in generate_transactions(users, products, num_transactions, rng, today, chunk_size):
+            writer.write(chunk)
+            elapsed = time.perf_counter() - started
+            logger.info(f"Wrote {writer.rows:,} transactions ({writer.rows / elapsed:,.0f} rows/s)")
+    finally:
+        writer.close()
+    counts['transactions'] = writer.rows
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate large synthetic users/products/transactions datasets")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--products', type=int, default=300)
+    parser.add_argument('--transactions', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None, help="Same seed and chunk size give identical files")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--today', type=date.fromisoformat, default=None, help="Reference date (YYYY-MM-DD)")
+    parser.add_argument('--out', default='synthetic_data')
+    args = parser.parse_args()
+
+    counts = generate_dataset(args.out, args.users, args.products, args.transactions, args.seed,
+                              args.format, args.chunk_size, args.today)
+    for table, rows in counts.items():
+        logger.info(f"{table}: {rows:,} rows -> {os.path.join(args.out, f'{table}.{args.format}')}")
+
+
+if __name__ == "__main__":
+    main()
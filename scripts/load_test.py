@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Load test for the FastAPI app against a local stand-in backend.
+
+The API module is started against LocalSupabase (local_backend.py) seeded with
+generate_synthetic_data.py at the requested scale, either in-process (ASGI
+transport, no network) or as a uvicorn server. A weighted mix of endpoints is
+then driven by a fixed number of concurrent clients, and throughput, latency
+percentiles/histograms and error rates are reported per endpoint.
+
+Usage:
+    python scripts/load_test.py --module main_supabase_optimized --users 5000 --products 2000 \
+        --concurrency 32 --duration 60 --mix recommendations=30,products=20,transactions=15
+    python scripts/load_test.py --mode uvicorn --port 8099 --out load_test.json
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+logging.getLogger('httpx').setLevel(logging.WARNING)  # one line per request otherwise
+
+DEFAULT_MIX = {
+    'recommendations': 30, 'products': 20, 'dead_stock_risk': 15,
+    'weekly_inventory': 10, 'weekly_expired': 10, 'transactions': 15,
+}
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def seed_backend(users, products, transactions, seed):
+    """LocalSupabase filled with a seeded synthetic dataset"""
+    from generate_synthetic_data import generate_products, generate_transactions, generate_users
+    from local_backend import LocalSupabase
+    import pandas as pd
+
+    today = date.today()
+    users_seed, products_seed, transactions_seed = np.random.SeedSequence(seed).spawn(3)
+    users_df = generate_users(users, np.random.default_rng(users_seed), today)
+    products_df = generate_products(products, np.random.default_rng(products_seed), today)
+    transactions_df = pd.concat(generate_transactions(
+        users_df, products_df, transactions, np.random.default_rng(transactions_seed), today
+    ), ignore_index=True)
+    return LocalSupabase(users_df, products_df, transactions_df)
+
+
+def load_app(module_name, backend):
+    """Import an API module wired to the stand-in backend (supabase.create_client is patched only for the import)"""
+    import supabase
+    create_client = supabase.create_client
+    supabase.create_client = lambda url, key: backend
+    try:
+        sys.modules.pop(module_name, None)
+        module = importlib.import_module(module_name)
+    finally:
+        supabase.create_client = create_client
+    if getattr(module, 'system', None) is None:
+        raise SystemExit(f"{module_name} failed to start against the local backend")
+    return module.app
+
+
+class RequestFactory:
+    """Builds (endpoint name, method, url, json body) for the weighted mix"""
+
+    def __init__(self, backend, mix, seed):
+        self.rng = random.Random(seed)
+        self.user_ids = backend.tables['users']['user_id'].tolist()
+        self.product_ids = backend.tables['products']['product_id'].tolist()
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+
+    def next(self):
+        name = self.rng.choices(self.names, self.weights)[0]
+        if name == 'recommendations':
+            return name, 'GET', f"/recommendations/{self.rng.choice(self.user_ids)}?n=10", None
+        if name == 'products':
+            return name, 'GET', f"/products?dynamic=true&page={self.rng.randint(1, 5)}&page_size=20", None
+        if name == 'dead_stock_risk':
+            return name, 'GET', "/dead_stock_risk?min_risk_level=MEDIUM", None
+        if name == 'weekly_inventory':
+            return name, 'GET', "/weekly_inventory?weeks_back=4", None
+        if name == 'weekly_expired':
+            return name, 'GET', "/weekly_expired?weeks_back=4", None
+        if name == 'transactions':
+            body = {'user_id': self.rng.choice(self.user_ids), 'product_id': self.rng.choice(self.product_ids),
+                    'quantity': 1}
+            return name, 'POST', "/transactions", body
+        raise ValueError(f"Unknown endpoint in mix: {name}")
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies_ms = []
+        self.status_counts = {}
+        self.errors = 0
+
+    def record(self, latency_ms, status):
+        self.latencies_ms.append(latency_ms)
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if not (isinstance(status, int) and status < 400):
+            self.errors += 1
+
+    def summary(self, elapsed):
+        latencies = np.array(self.latencies_ms)
+        counts = np.histogram(latencies, bins=[0] + HISTOGRAM_BUCKETS_MS + [np.inf])[0]
+        labels = [f"<={b}ms" for b in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        return {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'error_rate': round(self.errors / len(latencies), 4) if len(latencies) else 0.0,
+            'status_counts': {str(k): v for k, v in sorted(self.status_counts.items(), key=str)},
+            'latency_ms': {
+                'mean': round(float(latencies.mean()), 2),
+                'p50': round(float(np.percentile(latencies, 50)), 2),
+                'p90': round(float(np.percentile(latencies, 90)), 2),
+                'p99': round(float(np.percentile(latencies, 99)), 2),
+                'max': round(float(latencies.max()), 2),
+            } if len(latencies) else {},
+            'histogram': dict(zip(labels, counts.tolist())),
+        }
+
+
+async def drive(client, factory, concurrency, duration, max_requests):
+    stats = {name: EndpointStats() for name in factory.names}
+    deadline = time.perf_counter() + duration
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while time.perf_counter() < deadline and (max_requests is None or issued < max_requests):
+            issued += 1
+            name, method, url, body = factory.next()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            stats[name].record((time.perf_counter() - started) * 1000, status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stats, time.perf_counter() - started
+
+
+def serve(args):
+    """--serve: run the app under uvicorn against a seeded local backend (used by --mode uvicorn)"""
+    import uvicorn
+    backend = seed_backend(args.users, args.products, args.transactions, args.seed)
+    uvicorn.run(load_app(args.module, backend), host='127.0.0.1', port=args.port, log_level='warning',
+                workers=1)
+
+
+async def wait_for_server(base_url, timeout=600):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get('/health')).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise SystemExit(f"Server at {base_url} did not become healthy")
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    if text:
+        mix = {}
+        for part in text.split(','):
+            name, weight = part.split('=')
+            mix[name.strip()] = float(weight)
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints in --mix: {sorted(unknown)} (choose from {sorted(DEFAULT_MIX)})")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def print_report(report):
+    print(f"\n{'endpoint':<20}{'requests':>9}{'rps':>9}{'errors':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    for name, summary in report['endpoints'].items():
+        latency = summary['latency_ms']
+        if not latency:
+            continue
+        print(f"{name:<20}{summary['requests']:>9}{summary['throughput_rps']:>9.1f}{summary['error_rate']:>8.1%}"
+              f"{latency['p50']:>9.1f}{latency['p90']:>9.1f}{latency['p99']:>9.1f}{latency['max']:>9.1f}")
+    total = report['total']
+    print(f"{'total':<20}{total['requests']:>9}{total['throughput_rps']:>9.1f}{total['error_rate']:>8.1%}")
+
+
+async def run(args):
+    mix = parse_mix(args.mix)
+    backend = seed_backend(args.users, args.products, args.transactions, args.seed)
+    factory = RequestFactory(backend, mix, args.seed)
+    server = None
+    if args.mode == 'inprocess':
+        transport = httpx.ASGITransport(app=load_app(args.module, backend))
+        client = httpx.AsyncClient(transport=transport, base_url='http://loadtest', timeout=args.timeout)
+    else:
+        server = subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), '--serve', '--module', args.module, '--port', str(args.port),
+            '--users', str(args.users), '--products', str(args.products),
+            '--transactions', str(args.transactions), '--seed', str(args.seed),
+        ])
+        base_url = f"http://127.0.0.1:{args.port}"
+        await wait_for_server(base_url)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits)
+
+    try:
+        logger.info(f"Driving {args.module} ({args.mode}) with {args.concurrency} clients for {args.duration}s")
+        async with client:
+            stats, elapsed = await drive(client, factory, args.concurrency, args.duration, args.requests)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    endpoints = {name: s.summary(elapsed) for name, s in stats.items() if s.latencies_ms}
+    requests = sum(s['requests'] for s in endpoints.values())
+    errors = sum(stats[name].errors for name in endpoints)
+    return {
+        'config': {k: v for k, v in vars(args).items() if k != 'serve'},
+        'elapsed_seconds': round(elapsed, 2),
+        'total': {'requests': requests, 'throughput_rps': round(requests / elapsed, 2),
+                  'error_rate': round(errors / requests, 4) if requests else 0.0},
+        'endpoints': endpoints,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API against a seeded local backend")
+    parser.add_argument('--module', default='main_supabase_optimized',
+                        choices=['main_supabase_optimized', 'main_supabase_unified'])
+    parser.add_argument('--mode', choices=['inprocess', 'uvicorn'], default='inprocess')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--transactions', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mix', help="Weights, e.g. recommendations=30,products=20,transactions=15")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds to drive load")
+    parser.add_argument('--requests', type=int, default=None, help="Stop after this many requests")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--out', help="Write the JSON report here")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+In-memory stand-in for the Supabase client, for load tests and local runs.
+
+LocalSupabase answers the PostgREST calls the API modules make (projected
+select, eq/neq/gt/gte/lt/lte/in_ filters, order/limit/range, count, insert,
+upsert, update, rpc) from pandas DataFrames. Base tables are users, products
+and transactions; the views the API reads (products_enriched,
+dead_stock_risk_products, weekly_inventory_metrics, weekly_expired_metrics)
+are computed with the same rules as scripts/create_performance_views.sql and
+cached until the next write. Inserts into transactions apply the inventory and
+revenue triggers. Calls are serialized by one lock, like a single-connection
+database.
+"""
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BASE_TABLES = ('users', 'products', 'transactions')
+DATE_COLUMNS = {
+    'users': ('last_purchase_date',),
+    'products': ('packaging_date', 'expiry_date'),
+    'transactions': ('purchase_date',),
+}
+
+
+class LocalBackendError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LocalResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _records(df):
+    """DataFrame -> JSON-like rows (ISO date strings, None for missing)"""
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict('records')
+
+
+def _today():
+    return pd.Timestamp(datetime.now().date())
+
+
+def products_enriched(products, transactions):
+    sales = transactions.groupby('product_id').agg(
+        transaction_count=('quantity', 'size'),
+        total_quantity_sold=('quantity', 'sum'),
+        actual_revenue_generated=('total_price_paid', 'sum'),
+        avg_discount_taken=('discount_percent', 'mean'),
+        deal_engagement_rate=('user_engaged_with_deal', 'mean'),
+        first_sale_date=('purchase_date', 'min'),
+        last_sale_date=('purchase_date', 'max'),
+    ).reset_index()
+    df = products.merge(sales, on='product_id', how='left')
+    today = _today()
+    df['days_past_expiry'] = (today - df['expiry_date']).dt.days
+    df['days_until_expiry'] = (df['expiry_date'] - today).dt.days
+    for column in ['total_quantity_sold', 'actual_revenue_generated', 'avg_discount_taken', 'deal_engagement_rate']:
+        df[column] = df[column].fillna(0)
+    days_selling = (df['last_sale_date'] - df['first_sale_date']).dt.days + 1
+    df['sales_velocity'] = (df['total_quantity_sold'] / days_selling).fillna(0)
+    df['inventory_turnover_rate'] = np.where(
+        df['initial_inventory_quantity'] > 0, df['total_quantity_sold'] / df['initial_inventory_quantity'], 0
+    )
+    days = df['days_until_expiry']
+    df['calculated_dead_stock_risk'] = (
+        ((days <= 7) & (df['current_discount_percent'] < 30))
+        | ((days <= 14) & (df['sales_velocity'] < 0.5))
+        | ((df['inventory_quantity'] > 100) & df['transaction_count'].isna())
+    ).astype(int)
+    df['risk_score'] = np.select(
+        [days < 0, days <= 3, days <= 7, days <= 14, (df['sales_velocity'] < 0.1) & (days <= 30)],
+        [1.0, 0.9, 0.7, 0.5, 0.4],
+        np.clip((30 - days) / 30, 0, 1)
+    )
+    return df
+
+
+def dead_stock_risk_products(enriched):
+    df = enriched[enriched['days_until_expiry'] > 0].copy()
+    days = df['days_until_expiry']
+    df['is_dead_stock_risk'] = df['calculated_dead_stock_risk']
+    df['risk_level'] = np.select([days <= 3, days <= 7, days <= 14], ['CRITICAL', 'HIGH', 'MEDIUM'], 'LOW')
+    df['recommended_discount_percent'] = np.select(
+        [days <= 3, days <= 7, days <= 14],
+        [np.maximum(df['current_discount_percent'], 50), np.maximum(df['current_discount_percent'], 30),
+         np.maximum(df['current_discount_percent'], 20)],
+        df['current_discount_percent']
+    )
+    df['potential_loss'] = df['inventory_quantity'] * df['price_mrp']
+    return df.sort_values(['risk_score', 'days_until_expiry'], ascending=[False, True])
+
+
+def _weeks():
+    """The view's last 52 weeks, starting with the current Monday-based week"""
+    start = _today() - pd.Timedelta(days=_today().weekday())
+    return [(offset + 1, start - pd.Timedelta(weeks=offset), start - pd.Timedelta(weeks=offset) + pd.Timedelta(days=6))
+            for offset in range(52)]
+
+
+def weekly_inventory_metrics(products, transactions):
+    sold = transactions.merge(products[['product_id', 'cost_price']], on='product_id')
+    rows = []
+    for week_number, week_start, week_end in _weeks():
+        alive = products[(products['packaging_date'] <= week_end) & (products['expiry_date'] >= week_start)]
+        if alive.empty:
+            continue
+        week_sales = sold[sold['product_id'].isin(alive['product_id'])
+                          & sold['purchase_date'].between(week_start, week_end)]
+        qty = float(alive['inventory_quantity'].sum())
+        cost = float((alive['inventory_quantity'] * alive['cost_price']).sum())
+        sold_qty = float(week_sales['quantity'].sum())
+        sold_cost = float((week_sales['quantity'] * week_sales['cost_price']).sum())
+        rows.append({
+            'week_number': week_number, 'week_start': week_start, 'week_end': week_end,
+            'alive_products_count': len(alive), 'total_inventory_qty': qty, 'total_inventory_cost': cost,
+            'sold_inventory_qty': sold_qty, 'sold_inventory_cost': sold_cost,
+            'sold_inventory_revenue': float(week_sales['total_price_paid'].sum()),
+            'inventory_utilization_rate_pct': sold_qty / qty * 100 if qty > 0 else 0,
+            'cost_utilization_rate_pct': sold_cost / cost * 100 if cost > 0 else 0,
+        })
+    return pd.DataFrame(rows)
+
+
+def weekly_expired_metrics(products):
+    rows = []
+    for week_number, week_start, week_end in _weeks():
+        expired = products[products['expiry_date'].between(week_start, week_end)].assign(
+            value_mrp=lambda df: df['inventory_quantity'] * df['price_mrp'],
+            value_cost=lambda df: df['inventory_quantity'] * df['cost_price'],
+        )
+        if expired.empty:
+            continue
+        by_category = expired.groupby('category').agg(
+            count=('product_id', 'nunique'), quantity=('inventory_quantity', 'sum'),
+            value_mrp=('value_mrp', 'sum'), value_cost=('value_cost', 'sum'),
+        )
+        rows.append({
+            'week_number': week_number, 'week_start': week_start, 'week_end': week_end,
+            'expired_count': expired['product_id'].nunique(),
+            'expired_quantity': float(expired['inventory_quantity'].sum()),
+            'expired_value_mrp': float(expired['value_mrp'].sum()),
+            'expired_value_cost': float(expired['value_cost'].sum()),
+            'expired_by_category': {c: {k: float(v) for k, v in row.items()} for c, row in by_category.iterrows()},
+            # As in the view, every product expiring in the week counts as expired
+            'total_products_in_period': len(expired),
+            'waste_rate_pct': 100.0,
+        })
+    return pd.DataFrame(rows)
+
+
+class LocalSupabase:
+    """Supabase client stand-in over users/products/transactions DataFrames"""
+
+    def __init__(self, users, products, transactions):
+        self.lock = threading.RLock()
+        self.tables = {}
+        for name, df in (('users', users), ('products', products), ('transactions', transactions)):
+            df = df.drop(columns=['allergy_bits', 'allergen_bits'], errors='ignore').reset_index(drop=True)
+            for column in DATE_COLUMNS[name]:
+                if column in df:
+                    df[column] = pd.to_datetime(df[column])
+            self.tables[name] = df
+        if 'transaction_id' not in self.tables['transactions']:
+            self.tables['transactions'].insert(0, 'transaction_id', np.arange(1, len(transactions) + 1))
+        self.next_transaction_id = len(self.tables['transactions']) + 1
+        self.views = {}
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return LocalRpc(self, name, params or {})
+
+    # --- storage ---
+
+    def frame(self, name):
+        """A base table or (cached) view"""
+        if name in self.tables:
+            return self.tables[name]
+        if name not in self.views:
+            products, transactions = self.tables['products'], self.tables['transactions']
+            if name == 'products_enriched':
+                self.views[name] = products_enriched(products, transactions)
+            elif name == 'dead_stock_risk_products':
+                self.views[name] = dead_stock_risk_products(self.frame('products_enriched'))
+            elif name == 'weekly_inventory_metrics':
+                self.views[name] = weekly_inventory_metrics(products, transactions)
+            elif name == 'weekly_expired_metrics':
+                self.views[name] = weekly_expired_metrics(products)
+            else:
+                raise LocalBackendError(f"relation \"{name}\" is not available in the local backend", 404)
+        return self.views[name]
+
+    def insert(self, name, rows, conflict_column=None):
+        if name not in BASE_TABLES:
+            raise LocalBackendError(f"cannot insert into {name}")
+        table = self.tables[name]
+        if conflict_column and conflict_column in table:
+            existing = set(table[conflict_column].dropna())
+            rows = [row for row in rows if row.get(conflict_column) not in existing]
+        if not rows:
+            return []
+        new = pd.DataFrame(rows)
+        if name == 'transactions':
+            new.insert(0, 'transaction_id', np.arange(self.next_transaction_id, self.next_transaction_id + len(new)))
+            self.next_transaction_id += len(new)
+            new['created_at'] = pd.Timestamp.now()
+            self._apply_transaction_triggers(new)
+        for column in DATE_COLUMNS[name]:
+            if column in new:
+                new[column] = pd.to_datetime(new[column])
+        self.tables[name] = pd.concat([table, new], ignore_index=True)
+        self.views.clear()
+        return _records(new)
+
+    def _apply_transaction_triggers(self, new):
+        products = self.tables['products']
+        sold = new.groupby('product_id').agg(quantity=('quantity', 'sum'), revenue=('total_price_paid', 'sum'))
+        index = products['product_id'].map({pid: i for i, pid in enumerate(sold.index)})
+        hit = index.notna().to_numpy()
+        positions = index[hit].astype(int).to_numpy()
+        remaining = products.loc[hit, 'inventory_quantity'].to_numpy() - sold['quantity'].to_numpy()[positions]
+        if (remaining < 0).any():
+            raise LocalBackendError("Insufficient inventory", 400)
+        products.loc[hit, 'inventory_quantity'] = remaining
+        products.loc[hit, 'revenue_generated'] = (
+            products.loc[hit, 'revenue_generated'].to_numpy() + sold['revenue'].to_numpy()[positions]
+        )
+
+    def update(self, name, mask, values):
+        if name not in BASE_TABLES:
+            raise LocalBackendError(f"cannot update {name}")
+        table = self.tables[name]
+        for column, value in values.items():
+            table.loc[mask, column] = value
+        self.views.clear()
+        return _records(table[mask])
+
+
+class LocalRpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        with self.client.lock:
+            products = self.client.tables['products']
+            alive = products[products['expiry_date'] >= _today()]
+            if self.name == 'get_current_inventory_qty':
+                return LocalResponse(float(alive['inventory_quantity'].sum()))
+            if self.name == 'get_current_inventory_cost':
+                return LocalResponse(float((alive['inventory_quantity'] * alive['cost_price']).sum()))
+        raise LocalBackendError(f"function {self.name} is not available in the local backend", 404)
+
+
+class LocalQuery:
+    OPS = {
+        'eq': lambda s, v: s == v, 'neq': lambda s, v: s != v, 'gt': lambda s, v: s > v,
+        'gte': lambda s, v: s >= v, 'lt': lambda s, v: s < v, 'lte': lambda s, v: s <= v,
+        'in_': lambda s, v: s.isin(list(v)),
+    }
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.action = 'select'
+        self.columns = None
+        self.count = None
+        self.filters = []
+        self.ordering = []
+        self.bounds = None
+        self.payload = None
+        self.conflict_column = None
+
+    def select(self, columns='*', count=None):
+        self.columns = None if columns.strip() == '*' else [c.strip() for c in columns.split(',')]
+        self.count = count
+        return self
+
+    def insert(self, data):
+        self.action, self.payload = 'insert', data
+        return self
+
+    def upsert(self, data, on_conflict=None, ignore_duplicates=False):
+        self.action, self.payload = 'insert', data
+        self.conflict_column = on_conflict
+        return self
+
+    def update(self, data):
+        self.action, self.payload = 'update', data
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, not desc))
+        return self
+
+    def limit(self, n):
+        self.bounds = (0, n)
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end + 1)
+        return self
+
+    def __getattr__(self, name):
+        if name not in self.OPS:
+            raise AttributeError(name)
+
+        def apply(column, value):
+            self.filters.append((column, name, value))
+            return self
+        return apply
+
+    def _mask(self, df):
+        mask = pd.Series(True, index=df.index)
+        for column, op, value in self.filters:
+            if column not in df:
+                raise LocalBackendError(f"column {self.name}.{column} does not exist")
+            series = df[column]
+            if pd.api.types.is_datetime64_any_dtype(series) and isinstance(value, str):
+                value = pd.Timestamp(value)
+            mask &= self.OPS[op](series, value)
+        return mask
+
+    def execute(self):
+        with self.client.lock:
+            if self.action == 'insert':
+                rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                return LocalResponse(self.client.insert(self.name, rows, self.conflict_column))
+
+            df = self.client.frame(self.name)
+            mask = self._mask(df)
+            if self.action == 'update':
+                return LocalResponse(self.client.update(self.name, mask, self.payload))
+
+            df = df[mask]
+            if self.columns is not None:
+                missing = set(self.columns) - set(df.columns)
+                if missing:
+                    raise LocalBackendError(f"{self.name} has no columns {sorted(missing)}")
+            total = len(df)
+            if self.ordering:
+                df = df.sort_values([c for c, _ in self.ordering], ascending=[a for _, a in self.ordering])
+            if self.bounds:
+                df = df.iloc[self.bounds[0]:self.bounds[1]]
+            if self.columns is not None:
+                df = df[self.columns]
+            return LocalResponse(_records(df), total if self.count else None)
@@ -123,6 +123,56 @@ def update_revenue_inventory_method2():
     except Exception as e:
         logger.error(f"Error: {e}")
 
+RECONCILE_SQL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_reconciliation_function.sql')
+
+def fetch_reconciliation_diff(supabase, apply_changes=False):
+    """Products whose revenue/inventory disagree with their transactions (one RPC, one SQL statement)"""
+    response = supabase.rpc('reconcile_product_totals', {'apply_changes': apply_changes}).execute()
+    diff = pd.DataFrame(response.data, columns=[
+        'product_id', 'current_revenue', 'expected_revenue', 'current_inventory', 'expected_inventory'
+    ])
+    for column in ['current_revenue', 'expected_revenue']:
+        diff[column] = diff[column].astype(float)
+    return diff
+
+def format_diff_report(diff, limit=20):
+    """Human-readable summary of a reconciliation diff"""
+    if diff.empty:
+        return "All products match their transactions."
+    revenue_delta = diff['expected_revenue'] - diff['current_revenue']
+    inventory_delta = diff['expected_inventory'] - diff['current_inventory']
+    lines = [
+        f"{len(diff)} products out of sync "
+        f"(revenue {revenue_delta.sum():+,.2f}, inventory {int(inventory_delta.sum()):+,} units)",
+        f"{'product_id':<12}{'revenue':>26}{'inventory':>22}",
+    ]
+    for row, revenue, inventory in zip(diff.head(limit).itertuples(), revenue_delta, inventory_delta):
+        lines.append(
+            f"{row.product_id:<12}{row.current_revenue:>12,.2f} -> {row.expected_revenue:>10,.2f}"
+            f"{row.current_inventory:>10} -> {row.expected_inventory:>8}"
+        )
+    if len(diff) > limit:
+        lines.append(f"... and {len(diff) - limit} more")
+    return "\n".join(lines)
+
+def reconcile_revenue_inventory(dry_run=True):
+    """Set-based reconciliation: diff (and optionally fix) all products in one database statement"""
+    logger.info(f"Reconciling product revenue and inventory ({'dry run' if dry_run else 'applying changes'})...")
+    
+    try:
+        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        diff = fetch_reconciliation_diff(supabase, apply_changes=not dry_run)
+        print(format_diff_report(diff))
+        if dry_run and not diff.empty:
+            logger.info("Dry run only - rerun with --apply to write these values")
+        elif not diff.empty:
+            logger.info(f"✅ Reconciled {len(diff)} products")
+        return diff
+        
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        logger.error(f"If reconcile_product_totals is missing, run {RECONCILE_SQL_FILE} in the Supabase SQL Editor")
+
 def create_sql_based_update():
     """Generate SQL to update all products based on transactions"""
     sql_update = """
@@ -221,14 +271,17 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Update product revenue and inventory from transactions')
-    parser.add_argument('--method', choices=['1', '2', 'sql'], default='1',
-                       help='Method to use: 1=aggregated (fast), 2=iterate (slow), sql=show SQL')
+    parser.add_argument('--method', choices=['reconcile', '1', '2', 'sql'], default='reconcile',
+                       help='Method to use: reconcile=set-based RPC (fastest), 1=aggregated, 2=iterate (slow), sql=show SQL')
+    parser.add_argument('--apply', action='store_true', help='With --method reconcile, write the corrections (default is a dry run)')
     parser.add_argument('--stats', action='store_true', help='Show current statistics only')
     
     args = parser.parse_args()
     
     if args.stats:
         show_current_stats()
+    elif args.method == 'reconcile':
+        reconcile_revenue_inventory(dry_run=not args.apply)
     elif args.method == '1':
         update_revenue_inventory_method1()
     elif args.method == '2':
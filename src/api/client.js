@@ -25,7 +25,7 @@ class ApiClient {
 
   // API methods
   async getMetrics() {
-    return this.get('/metrics');
+    return this.get('/metrics?format=json');
   }
 
   async getRecommendations(userId, nRecommendations = 10) {
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from inventory_ledger import InventoryLedger
+from test_query_specs import load_api
+from transaction_batches import fetch_rows_by_id, price_batch
+
+LINES = [
+    {"user_id": "U1", "product_id": "P2", "quantity": 2},
+    {"user_id": "U0", "product_id": "P404", "quantity": 1},
+    {"user_id": "U9", "product_id": "P3", "quantity": 1},
+    {"user_id": "U2", "product_id": "P3", "quantity": 1000},
+    {"user_id": "U2", "product_id": "P2", "quantity": 3},
+    {"user_id": "U0", "product_id": "P4", "quantity": 1},
+]
+
+
+def post_batch(monkeypatch, module_name):
+    api = load_api(monkeypatch, module_name)
+    fake = api.supabase
+    client = TestClient(api.app)
+    response = client.post("/transactions/batch", json={"items": LINES})
+    assert response.status_code == 200, response.text
+    return api, fake, response.json()
+
+
+def check_results(fake, body):
+    statuses = [result["status"] for result in body["results"]]
+    assert statuses == ["created", "failed", "failed", "failed", "created", "created"]
+    assert body["created"] == 3 and body["failed"] == 3
+    assert "not found" in body["results"][1]["error"]
+    assert "User U9" in body["results"][2]["error"]
+    assert "Insufficient inventory" in body["results"][3]["error"]
+
+    # All valid lines go out in one multi-row insert
+    transaction_inserts = [payload for table, payload in fake.inserts if table == 'transactions']
+    assert len(transaction_inserts) == 1 and len(transaction_inserts[0]) == 3
+    ids = [result["transaction_id"] for result in body["results"] if result["status"] == "created"]
+    assert len(set(ids)) == 3
+
+
+def test_optimized_batch_partial_failure(monkeypatch):
+    api, fake, body = post_batch(monkeypatch, 'main_supabase_optimized')
+    check_results(fake, body)
+
+    # Two P2 lines are two transactions on the shared product table
+    transaction_count = next(p for p in fake.tables['products_enriched'] if p['product_id'] == 'P2')['transaction_count']
+    row = api.products_df.loc[api.product_positions['P2']]
+    assert row['transaction_count'] == (transaction_count or 0) + 2
+
+    # Same price as the single-transaction endpoint would charge
+    product = next(p for p in fake.tables['products_enriched'] if p['product_id'] == 'P2')
+    expected = api.system.pricing_engine.calculate_dynamic_discount(product)
+    assert body["results"][0]["discount_applied"] == float(expected['recommended_discount'])
+    assert body["results"][0]["total_price"] == round(product['price_mrp'] * (1 - expected['recommended_discount'] / 100) * 2, 2)
+
+
+def test_unified_batch_partial_failure(monkeypatch):
+    _, fake, body = post_batch(monkeypatch, 'main_supabase_unified')
+    check_results(fake, body)
+
+
+def test_fetch_rows_by_id_chunks_the_id_list():
+    requests = []
+
+    class Spec:
+        def select(self, client):
+            return self
+
+        def in_(self, column, ids):
+            requests.append(ids)
+            self.ids = ids
+            return self
+
+        def execute(self):
+            return type('Response', (), {'data': [{'user_id': i} for i in self.ids]})
+
+    ids = [f"U{i:03d}" for i in range(450)] * 2
+    rows = fetch_rows_by_id(Spec(), None, 'user_id', ids, chunk_size=200)
+    assert [len(chunk) for chunk in requests] == [200, 200, 50]
+    assert sorted(row['user_id'] for row in rows) == sorted(set(ids))
+
+
+def test_pricing_failure_releases_reservations():
+    products = pd.DataFrame([{"product_id": "P1", "price_mrp": 10.0, "diet_type": "veg", "inventory_quantity": 5,
+                              "days_until_expiry": np.nan, "current_discount_percent": 0.0}])
+    ledger = InventoryLedger(products)
+    item = type('Item', (), {"user_id": "U1", "product_id": "P1", "quantity": 2})
+
+    with pytest.raises(Exception):
+        price_batch([item], products, {"U1": "veg"}, ledger=ledger)
+    assert ledger.available["P1"] == 5 and ledger.pending["P1"] == 0
+
+
+def test_vectorized_discounts_match_scalar(monkeypatch):
+    api = load_api(monkeypatch, 'main_supabase_optimized')
+    engine = api.system.pricing_engine
+    rng = np.random.default_rng(7)
+    products = pd.concat([api.system.products_df] * 40, ignore_index=True)
+    n = len(products)
+    products['days_until_expiry'] = rng.integers(-3, 60, n)
+    products['sales_velocity'] = rng.choice([0, 0.05, 0.3, 0.7, 2], n)
+    products['current_discount_percent'] = rng.choice([0, 10, 35], n)
+    products['inventory_quantity'] = rng.integers(0, 500, n)
+    products['price_mrp'] = rng.choice([50.0, 150.0, 450.0], n)
+    products['is_dead_stock_risk'] = rng.integers(0, 2, n)
+
+    vectorized = engine.calculate_dynamic_discounts(products)
+    for i, row in products.iterrows():
+        expected = engine.calculate_dynamic_discount(row)
+        assert np.isclose(vectorized.at[i, 'urgency_score'], expected['urgency_score'])
+        assert vectorized.at[i, 'recommended_discount'] == expected['recommended_discount']
+        assert vectorized.at[i, 'reasoning'] == expected['reasoning']
+
+
+def test_concurrent_sales_update_the_product_table_atomically(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    api = load_api(monkeypatch, 'main_supabase_optimized')
+    table = api.products_df
+    position = api.product_positions['P2']
+    table.loc[position, ['inventory_quantity', 'transaction_count', 'days_until_expiry', 'sales_velocity']] = [
+        5000, np.nan, 30, 1.0
+    ]
+    table.loc[position, 'calculated_dead_stock_risk'] = 1  # unsold stock above 100 units
+    before = table.loc[position, ['total_quantity_sold', 'actual_revenue_generated']].to_numpy(dtype=float)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: api._apply_sale_to_product_table('P2', 1, 1.5), range(1600)))
+    row = api.products_df.loc[position]
+    assert row['inventory_quantity'] == 3400 and row['transaction_count'] == 1600
+    assert np.allclose(row[['total_quantity_sold', 'actual_revenue_generated']].to_numpy(dtype=float),
+                       before + [1600, 2400])
+    assert row['calculated_dead_stock_risk'] == 0  # it has sales now
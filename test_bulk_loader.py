@@ -0,0 +1,110 @@
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from bulk_loader import BulkLoader, copy_buffer, iter_file_chunks  # noqa: E402
+from generate_synthetic_data import generate_dataset  # noqa: E402
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FlakyClient:
+    """
+    Accepts inserts from many threads, failing every third request once with `status`.
+    With commit_before_failing the failed request has already written its rows (a timeout after commit).
+    """
+
+    def __init__(self, status=503, commit_before_failing=False):
+        self.status = status
+        self.commit_before_failing = commit_before_failing
+        self.rows = []
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.failed = set()
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        client = self
+
+        class Insert:
+            def insert(self, records):
+                self.records = records
+                self.on_conflict = None
+                return self
+
+            def upsert(self, records, on_conflict, ignore_duplicates=False):
+                assert ignore_duplicates
+                self.records = records
+                self.on_conflict = on_conflict
+                return self
+
+            def execute(self):
+                with client.lock:
+                    client.calls += 1
+                    # A given chunk fails at most once, however the threads interleave
+                    fail = client.calls % 3 == 0 and id(self.records) not in client.failed
+                    if fail:
+                        client.failed.add(id(self.records))
+                    client.active += 1
+                    client.peak = max(client.peak, client.active)
+                time.sleep(0.005)
+                with client.lock:
+                    client.active -= 1
+                    if not fail or client.commit_before_failing:
+                        seen = {row[self.on_conflict] for row in client.rows} if self.on_conflict else set()
+                        client.rows.extend(row for row in self.records
+                                           if not self.on_conflict or row[self.on_conflict] not in seen)
+                    if fail:
+                        raise HTTPError(client.status)
+        return Insert()
+
+
+def test_concurrent_insert_retries_transient_errors(tmp_path):
+    generate_dataset(tmp_path, 50, 30, 2000, seed=1, today=date(2025, 7, 15))
+    client = FlakyClient()
+    loader = BulkLoader(client, workers=3, backoff=0)
+    stats = loader.load('transactions', iter_file_chunks(str(tmp_path / 'transactions.csv'), 100))
+
+    assert stats['rows'] == 2000 and stats['chunks'] == 20 and stats['retries'] > 0
+    assert len(client.rows) == 2000
+    assert 1 < client.peak <= 3
+
+    # Array literals from the CSV are sent as JSON lists
+    users = BulkLoader(FlakyClient(), workers=1, backoff=0)
+    users.load('users', iter_file_chunks(str(tmp_path / 'users.csv'), 1000))
+    assert all(isinstance(row['allergies'], list) for row in users.client.rows)
+
+
+def test_retried_transactions_are_not_inserted_twice(tmp_path):
+    generate_dataset(tmp_path, 20, 10, 600, seed=2, today=date(2025, 7, 15))
+    client = FlakyClient(status=504, commit_before_failing=True)
+    loader = BulkLoader(client, workers=2, backoff=0)
+    stats = loader.load('transactions', iter_file_chunks(str(tmp_path / 'transactions.csv'), 50))
+
+    assert stats['retries'] > 0
+    assert len(client.rows) == 600
+    assert len({row['idempotency_key'] for row in client.rows}) == 600
+
+
+def test_client_errors_are_not_retried():
+    client = FlakyClient(status=409)
+    loader = BulkLoader(client, workers=1, backoff=0)
+    with pytest.raises(HTTPError):
+        loader.load('users', ([{'user_id': f'U{i}'}] for i in range(3)))
+    assert client.calls == 3
+
+
+def test_copy_buffer_formats_arrays_and_dates():
+    columns, buffer = copy_buffer([{'user_id': 'U1', 'allergies': ['nuts', 'soy'], 'last_purchase_date': '2025-07-01'}])
+    assert columns == ['user_id', 'allergies', 'last_purchase_date']
+    assert buffer.read() == 'U1,"{nuts,soy}",2025-07-01\n'
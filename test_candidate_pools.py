@@ -0,0 +1,102 @@
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import candidate_pools
+from unified_waste_reduction_system import (UnifiedRecommendationSystem, compatible_products_mask,
+                                            is_compatible_diet_allergy)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from benchmark_recommendations import make_data  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def system():
+    users, products, transactions = make_data(400, 300, 4, 11, date.today())
+    system = UnifiedRecommendationSystem(users, products, transactions)
+    system.build_content_similarity_matrix()
+    system.build_collaborative_filtering_model(n_factors=8)
+    return system
+
+
+def test_vectorized_urgency_and_compatibility_match_row_versions(system):
+    products = system.products_df
+    rows = [row for _, row in products.iterrows()]
+    np.testing.assert_allclose(system.pricing_engine.calculate_dynamic_urgency_scores(products),
+                               [system.pricing_engine.calculate_dynamic_urgency_score(row) for row in rows])
+    for user in system.users_df.head(20).to_dict('records'):
+        expected = [is_compatible_diet_allergy(user, row.to_dict()) for row in rows]
+        assert compatible_products_mask(user, products, system.allergen_vocabulary).tolist() == expected
+
+
+def test_pools_round_trip_and_rerank(system, tmp_path):
+    pools = candidate_pools.build_pools(system, pool_size=40)
+    path = str(tmp_path / 'pools.npy')
+    candidate_pools.save_pools(path, pools)
+    loaded = candidate_pools.load_pools(path)
+    assert isinstance(loaded.candidates, np.memmap) and len(loaded) == len(pools)
+    np.testing.assert_array_equal(loaded.candidates, pools.candidates)
+
+    user_id = loaded.user_ids[0]
+    user = system.user_record(user_id)
+    product_ids, base = loaded.pool(user_id)
+    assert len(product_ids) == len(set(product_ids)) > 0 and (np.diff(base) <= 1e-6).all()
+    bought = set(system.transactions_df.loc[system.transactions_df['user_id'] == user_id, 'product_id'])
+    assert not bought & set(product_ids)
+    pooled = system.products_df.iloc[system.product_positions(product_ids)]
+    assert compatible_products_mask(user, pooled, system.allergen_vocabulary).all()
+    assert (pooled['inventory_quantity'] > 0).all() and (pooled['days_until_expiry'] > 0).all()
+
+    system.candidate_pools = candidate_pools.PoolFile(path)
+    try:
+        recs = system.get_hybrid_recommendations(user_id, 10)
+        assert list(recs.columns)[:4] == ['product_id', 'product_name', 'hybrid_score', 'base_score']
+        assert set(recs['product_id']) <= set(product_ids) and recs['hybrid_score'].is_monotonic_decreasing
+        # A purchase since the pools were built is not recommended again
+        system.record_interaction(user_id, recs['product_id'].iloc[0])
+        assert recs['product_id'].iloc[0] not in set(system.get_hybrid_recommendations(user_id, 10)['product_id'])
+        # ... nor after a refresh, when the purchase is in the new snapshot's transactions
+        bought_since = recs['product_id'].iloc[1]
+        sale = system.transactions_df[system.transactions_df['user_id'] == user_id].iloc[[0]].assign(product_id=bought_since)
+        refreshed = UnifiedRecommendationSystem(system.users_df, system.all_products_df,
+                                                pd.concat([system.transactions_df, sale], ignore_index=True))
+        assert not refreshed.fresh_interactions
+        assert bought_since not in set(loaded.recommend(refreshed, user_id, 50)['product_id'])
+        refreshed.build_collaborative_filtering_model(n_factors=4)
+        assert bought_since not in set(loaded.recommend(refreshed, user_id, 50)['product_id'])
+        # Users without a pool take the live path
+        assert system.candidate_pools.recommend(system, 'no-such-user') is None
+    finally:
+        system.candidate_pools = None
+
+
+def test_hybrid_blend_matches_row_by_row_reference(system):
+    for user_id in system.transactions_df['user_id'].unique()[:10]:
+        user = system.user_record(user_id)
+        collab = system.get_collaborative_recommendations(user_id, 20)
+        bought = set(system.transactions_df.loc[system.transactions_df['user_id'] == user_id, 'product_id'])
+        assert not bought & set(collab['product_id']) and collab['final_score'].is_monotonic_decreasing
+        seeds = system.transactions_df.loc[system.transactions_df['user_id'] == user_id, 'product_id'].unique()[-3:]
+        content = system.get_multi_seed_content_recommendations(seeds, 10 * len(seeds))
+
+        expected = {}
+        for weight, recs in ((0.6, collab), (0.4, content)):
+            for product_id, score in zip(recs['product_id'], recs['final_score']):
+                expected[product_id] = expected.get(product_id, 0) + weight * score
+        rows = system.products_df.set_index('product_id')
+        for product_id in list(expected):
+            product = dict(rows.loc[product_id].to_dict(), product_id=product_id)
+            if not is_compatible_diet_allergy(user, product):
+                del expected[product_id]
+                continue
+            urgency = system.pricing_engine.calculate_dynamic_urgency_score(product)
+            expected[product_id] = expected[product_id] * (1 + urgency * 0.5) + (0.15 if product['is_dead_stock_risk'] == 1 else 0)
+
+        recs = system.get_hybrid_recommendations(user_id, 10)
+        top = sorted(expected.values(), reverse=True)[:10]
+        np.testing.assert_allclose(recs['hybrid_score'], top)
+        np.testing.assert_allclose(recs['hybrid_score'], [expected[p] for p in recs['product_id']])
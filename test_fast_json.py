@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+
+from test_query_specs import load_api
+
+PRODUCT_URLS = {
+    'main_supabase_optimized': ["/products", "/products?include_expired=true&dynamic=true&page_size=4&page=2"],
+    'main_supabase_unified': ["/products", "/products?page_size=4&page=2", "/products?category=Dairy"],
+}
+
+
+def check_fast_path_matches(monkeypatch, module_name):
+    api = load_api(monkeypatch, module_name)
+    client = TestClient(api.app)
+    openapi = client.get("/openapi.json").json()
+
+    for url in PRODUCT_URLS[module_name]:
+        monkeypatch.setattr(api, 'FAST_JSON_RESPONSES', False)
+        expected = client.get(url)
+        monkeypatch.setattr(api, 'FAST_JSON_RESPONSES', True)
+        fast = client.get(url)
+        assert expected.status_code == fast.status_code == 200, (url, fast.text)
+        assert fast.json() == expected.json(), url
+
+    assert client.get("/openapi.json").json() == openapi
+
+
+def test_optimized_products_fast_path_matches_models(monkeypatch):
+    check_fast_path_matches(monkeypatch, 'main_supabase_optimized')
+
+
+def test_unified_products_fast_path_matches_models(monkeypatch):
+    check_fast_path_matches(monkeypatch, 'main_supabase_unified')
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from feedback_log import FeedbackLog, merge_engagement
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+from dynamic_recommendation_system import DynamicRecommendationSystem  # noqa: E402
+
+
+def test_compaction_on_size_and_age():
+    now = [0.0]
+    batches = []
+    log = FeedbackLog(on_compact=batches.append, max_events=3, max_age_seconds=10, clock=lambda: now[0])
+    assert not log.append('U1', 'P1', 'view') and not log.append('U1', 'P1', 'click')
+    assert log.compact_if_due() is None
+    assert log.append('U1', 'P2', 'purchase', quantity=2, rating=5)
+    batch = log.compact_if_due()
+    assert batches == [batch] and len(log) == 0
+
+    assert batch.purchases[['user_id', 'product_id', 'quantity', 'rating']].values.tolist() == [['U1', 'P2', 2, 5]]
+    assert (batch.purchases['user_engaged_with_deal'] == 0).all()
+    assert batch.engagement.values.tolist() == [['U1', 'P1', 1, 1]]
+
+    log.append('U2', 'P1', 'view')
+    now[0] = 9.0
+    assert log.compact_if_due() is None
+    now[0] = 10.0
+    assert log.compact_if_due().purchases.empty and log.compactions == 2
+
+    with pytest.raises(ValueError):
+        log.append('U2', 'P1', 'like')
+
+
+def test_background_compactor_runs_off_the_appending_thread():
+    threads = []
+    log = FeedbackLog(on_compact=lambda batch: threads.append(threading.current_thread()),
+                      max_events=100, max_age_seconds=0.05).start()
+    log.append('U1', 'P1', 'view')  # then nothing else arrives
+    deadline = time.monotonic() + 5
+    while not threads and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert log.compactions == 1 and threads[0] is not threading.current_thread()
+
+    log.append('U1', 'P2', 'purchase')
+    log.close()  # drains what is still buffered
+    assert log.compactions == 2 and len(log) == 0 and not log.running
+
+
+def test_merge_engagement_adds_counts():
+    running = pd.DataFrame({'user_id': ['U1'], 'product_id': ['P1'], 'clicks': [1], 'views': [2]})
+    new = pd.DataFrame({'user_id': ['U1', 'U2'], 'product_id': ['P1', 'P1'], 'clicks': [0, 1], 'views': [3, 0]})
+    merged = merge_engagement(running, new)
+    assert merged.values.tolist() == [['U1', 'P1', 1, 5], ['U2', 'P1', 1, 0]]
+
+
+def test_feedback_matches_appending_transaction_rows():
+    transactions = pd.DataFrame({
+        'user_id': ['U1', 'U1', 'U2', 'U3'],
+        'product_id': ['P1', 'P2', 'P1', 'P3'],
+        'purchase_date': pd.Timestamp('2024-01-01'),
+        'quantity': [2, 1, 1, 3],
+        'user_engaged_with_deal': [1, 0, 0, 1],
+    })
+    system = DynamicRecommendationSystem(pd.DataFrame(), pd.DataFrame(), transactions, feedback_max_events=4)
+    system.build_collaborative_filtering_model(n_factors=2)
+    previous = system.collaborative_model
+    feedback = [('U1', 'P2', 'view'), ('U2', 'P3', 'click'), ('U3', 'P3', 'purchase'), ('U4', 'P1', 'view')]
+    for user_id, product_id, feedback_type in feedback:
+        system.update_model_with_feedback(user_id, product_id, feedback_type)
+    system.feedback_log.close()  # wait for the background compactor
+    assert system.feedback_log.compactions == 1 and len(system.transactions_df) == 5
+    assert 'U4' in system.user_item_matrix.index  # model refreshed on compaction
+    # The refit is published as a new (matrix, user_factors, item_factors) tuple; a reader's snapshot stays consistent
+    assert previous[0].shape[0] == previous[1].shape[0] == 3
+    assert system.user_item_matrix.shape[0] == system.user_factors.shape[0] == 4
+
+    # Same interaction values as the old one-transaction-row-per-event scheme
+    rows = pd.DataFrame([{
+        'user_id': u, 'product_id': p, 'quantity': 1 if t == 'purchase' else 0,
+        'user_engaged_with_deal': 0 if t == 'purchase' else 1,
+    } for u, p, t in feedback])
+    appended = pd.concat([transactions, rows], ignore_index=True)
+    expected = (appended.pivot_table(index='user_id', columns='product_id', values='quantity', aggfunc='sum', fill_value=0)
+                + 0.5 * appended.pivot_table(index='user_id', columns='product_id', values='user_engaged_with_deal',
+                                             aggfunc='mean', fill_value=0))
+    pd.testing.assert_frame_equal(system.user_item_matrix, expected, check_dtype=False, check_names=False)
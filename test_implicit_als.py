@@ -0,0 +1,90 @@
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from implicit_als import ImplicitALS, interaction_matrix
+from unified_waste_reduction_system import UnifiedRecommendationSystem
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from benchmark_recommendations import make_data  # noqa: E402
+
+
+def random_interactions(n_users=300, n_items=80, seed=0):
+    rng = np.random.default_rng(seed)
+    return sp.random(n_users, n_items, density=0.05, random_state=seed, dtype=np.float32,
+                     data_rvs=lambda n: rng.integers(1, 5, n)).tocsr()
+
+
+def test_interaction_matrix_matches_dense_pivot():
+    transactions = pd.DataFrame({
+        'user_id': ['U2', 'U1', 'U2', 'U2', 'U3'],
+        'product_id': ['P9', 'P1', 'P9', 'P1', 'P9'],
+        'quantity': [1, 2, 3, 1, 4],
+        'user_engaged_with_deal': [1, 0, 0, 1, 1],
+    })
+    matrix, user_ids, product_ids = interaction_matrix(transactions)
+    pivot = transactions.pivot_table(index='user_id', columns='product_id', values='quantity',
+                                     aggfunc='sum', fill_value=0)
+    engagement = transactions.pivot_table(index='user_id', columns='product_id', values='user_engaged_with_deal',
+                                          aggfunc='mean', fill_value=0)
+    expected = pivot + 0.5 * engagement
+    assert list(user_ids) == list(expected.index) and list(product_ids) == list(expected.columns)
+    assert matrix.dtype == np.float32
+    np.testing.assert_allclose(matrix.toarray(), expected.to_numpy(), rtol=1e-6)
+
+
+def test_conjugate_gradient_fold_in_matches_exact_least_squares():
+    interactions = random_interactions()
+    model = ImplicitALS(factors=8, iterations=2, threads=2).fit(interactions)
+    assert model.user_factors.dtype == np.float32 and model.item_factors.dtype == np.float32
+
+    row = interactions[5]
+    y = model.item_factors.astype(np.float64)
+    confidence = 1 + model.alpha * row.data
+    a = y.T @ y + model.regularization * np.eye(8) + (y[row.indices].T * (confidence - 1)) @ y[row.indices]
+    b = (y[row.indices].T * confidence).sum(axis=1)
+    # CG is exact after as many steps as there are factors
+    np.testing.assert_allclose(model.fold_in(row.indices, row.data, steps=8), np.linalg.solve(a, b), atol=1e-4)
+
+
+def test_observed_items_score_higher():
+    interactions = random_interactions()
+    model = ImplicitALS(factors=16, iterations=10, threads=4).fit(interactions)
+    scores = model.user_factors @ model.item_factors.T
+    observed = interactions.toarray() > 0
+    assert scores[observed].mean() > 5 * scores[~observed].mean()
+
+
+def test_recorded_purchases_fold_in_without_refit():
+    users, products, transactions = make_data(300, 200, 5, 3, date.today())
+    newcomer = users['user_id'].iloc[0]
+    transactions = transactions[transactions['user_id'] != newcomer]
+    system = UnifiedRecommendationSystem(users, products, transactions)
+    system.build_collaborative_filtering_model(n_factors=8)
+    model = system.collaborative_model
+    assert 'predicted_rating' not in system.get_collaborative_recommendations(newcomer, 5).columns  # popular fallback
+
+    bought = [p for p in system.product_index if p in set(system.products_df['product_id'])][:3]
+    for product_id in bought:
+        system.record_interaction(newcomer, product_id, quantity=2)
+    recs = system.get_collaborative_recommendations(newcomer, 20)
+    assert 'predicted_rating' in recs.columns and not set(bought) & set(recs['product_id'])
+    vector, positions = system._user_vector(newcomer)
+    np.testing.assert_allclose(vector, model.fold_in(positions, np.full(3, 2.0)))
+
+    # A known user's new purchase moves their vector and is filtered as purchased
+    regular = system.user_index[0]
+    before = system._user_vector(regular)[0].copy()
+    system.record_interaction(regular, recs['product_id'].iloc[0])
+    assert not np.allclose(before, system._user_vector(regular)[0])
+    assert recs['product_id'].iloc[0] not in set(system.get_collaborative_recommendations(regular, 50)['product_id'])
+
+    # A refreshed system keeps the fitted model and what was folded into it
+    refreshed = UnifiedRecommendationSystem(users, products, transactions)
+    assert refreshed.reuse_collaborative_model(system) and refreshed.collaborative_model is model
+    np.testing.assert_allclose(refreshed._user_vector(newcomer)[0], vector)
+    assert 'base_score' in refreshed.get_hybrid_recommendations(newcomer, 5).columns  # not the cold-start list
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import instrumentation
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from load_test import load_app, seed_backend  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def restore_instrumentation():
+    enabled, log_traces = instrumentation._enabled, instrumentation._log_traces
+    instrumentation.reset()
+    yield
+    instrumentation.enable(enabled, log_traces)
+    instrumentation.reset()
+
+
+def test_disabled_hooks_record_nothing():
+    instrumentation.enable(False)
+    with instrumentation.stage('a'):
+        pass
+    instrumentation.count('b', 3)
+    assert instrumentation.timed('c')(lambda x: x + 1)(1) == 2
+    snapshot = instrumentation.snapshot()
+    assert snapshot['stages'] == {} and snapshot['counters'] == {}
+
+
+def test_trace_logs_stage_breakdown(caplog):
+    instrumentation.enable(True, log_traces=True)
+    with caplog.at_level(logging.INFO, logger='instrumentation'):
+        with instrumentation.trace('call', user_id='U1'):
+            for _ in range(2):
+                with instrumentation.stage('inner'):
+                    pass
+            instrumentation.count('items', 5)
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line['trace'] == 'call' and line['user_id'] == 'U1'
+    assert set(line['stages_ms']) == {'inner'} and line['counters'] == {'items': 5}
+    snapshot = instrumentation.snapshot()
+    assert snapshot['stages']['inner']['count'] == 2
+    assert snapshot['stages']['call']['count'] == 1
+
+
+def test_stage_endpoints_toggle_and_report():
+    backend = seed_backend(100, 80, 800, seed=5)
+    client = TestClient(load_app('main_supabase_unified', backend))
+    user_id = backend.tables['transactions']['user_id'].iloc[0]
+
+    assert client.put('/metrics/stages', params={'enabled': True, 'reset': True}).json()['enabled']
+    assert client.get(f'/recommendations/{user_id}').status_code == 200
+    snapshot = client.get('/metrics/stages').json()
+    for name in ('hybrid.total', 'hybrid.collaborative', 'hybrid.content', 'hybrid.blend',
+                 'pricing.urgency_scores_vectorized'):
+        assert snapshot['stages'][name]['count'] >= 1, name
+    assert snapshot['counters']['hybrid.candidates'] >= 1
+
+    client.put('/metrics/stages', params={'enabled': False, 'reset': True})
+    client.get(f'/recommendations/{user_id}')
+    assert client.get('/metrics/stages').json()['stages'] == {}
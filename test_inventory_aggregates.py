@@ -0,0 +1,97 @@
+import pandas as pd
+from datetime import date, timedelta
+
+from inventory_aggregates import (InventorySummaryStore, WeeklyExpiredCube, category_performance_stats,
+                                  expired_category_stats)
+
+TODAY = date(2025, 7, 16)  # a Wednesday, current week starts Monday 2025-07-14
+
+
+def make_products():
+    return pd.DataFrame([
+        # Week 1 window is 2025-07-08 .. 2025-07-14
+        {"product_id": "P1", "category": "Dairy", "expiry_date": "2025-07-14", "inventory_quantity": 10, "price_mrp": 100.0, "cost_price": 40.0},
+        {"product_id": "P2", "category": "Dairy", "expiry_date": "2025-07-08", "inventory_quantity": 5, "price_mrp": 50.0, "cost_price": None},
+        # Week 2 window is 2025-07-01 .. 2025-07-07
+        {"product_id": "P3", "category": "Snacks", "expiry_date": "2025-07-07", "inventory_quantity": 2, "price_mrp": 20.0, "cost_price": 9.0},
+        # Expires in the future, outside any look-back window
+        {"product_id": "P4", "category": "Snacks", "expiry_date": "2025-08-30", "inventory_quantity": 1, "price_mrp": 10.0, "cost_price": 4.0},
+    ]).assign(expiry_date=lambda df: pd.to_datetime(df["expiry_date"]))
+
+
+def test_weekly_expired_cube_window():
+    """Cube windows match the per-week filters used by /weekly_expired"""
+    cube = WeeklyExpiredCube(make_products())
+    _, counts, mrp_values, cost_values = cube.window(3, TODAY)
+
+    assert counts.sum(axis=1).tolist() == [2, 1, 0]
+    assert mrp_values.sum(axis=1).tolist() == [1250.0, 40.0, 0.0]
+    assert cube.category_breakdown(counts[0], cost_values[0], "qty") == {"Dairy": 2}
+    # Missing cost_price falls back to 45% of MRP
+    assert cube.category_breakdown(counts[0], cost_values[0], "cost") == {"Dairy": 512.5}
+    assert cube.category_breakdown(counts.sum(axis=0), cost_values.sum(axis=0), "qty") == {"Dairy": 2, "Snacks": 1}
+
+
+def test_weekly_expired_cube_rollover():
+    """Day rollover shifts the window without a rebuild"""
+    products = make_products()
+    products.loc[products["product_id"] == "P1", "inventory_quantity"] = 6
+    cube = WeeklyExpiredCube(products)
+
+    _, counts, mrp_values, _ = cube.window(1, TODAY + timedelta(days=7))
+    assert counts.sum() == 0
+
+    _, counts, mrp_values, _ = cube.window(2, TODAY + timedelta(days=7))
+    assert counts[1].sum() == 2
+    assert mrp_values[1].sum() == 850.0
+
+
+def test_weekly_expired_cube_missing_keys():
+    """Products without an expiry date are dropped; products without a category are bucketed"""
+    products = pd.concat([make_products(), pd.DataFrame([
+        {"product_id": "P5", "category": None, "expiry_date": pd.Timestamp("2025-07-10"), "inventory_quantity": 3, "price_mrp": 10.0, "cost_price": 5.0},
+        {"product_id": "P6", "category": "Dairy", "expiry_date": pd.NaT, "inventory_quantity": 7, "price_mrp": 10.0, "cost_price": 5.0},
+    ])], ignore_index=True)
+    cube = WeeklyExpiredCube(products)
+    _, counts, mrp_values, cost_values = cube.window(1, TODAY)
+
+    assert cube.category_breakdown(counts[0], cost_values[0], "qty") == {"Dairy": 2, "Unknown": 1}
+    assert mrp_values[0].sum() == 1280.0
+
+
+def test_inventory_summary_store_counters():
+    """Sales adjust one product; day rollover moves products between buckets"""
+    products = pd.DataFrame([
+        {"product_id": "A", "category": "Dairy", "expiry_date": "2025-07-20", "cost_price": 10.0, "inventory_quantity": 50,
+         "current_discount_percent": 40, "sales_velocity": 1.0, "transaction_count": 3},
+        {"product_id": "B", "category": "Snacks", "expiry_date": "2025-09-30", "cost_price": 2.0, "inventory_quantity": 20,
+         "current_discount_percent": 0, "sales_velocity": 1.0, "transaction_count": 1},
+        {"product_id": "C", "category": "Snacks", "expiry_date": "2025-07-01", "cost_price": 5.0, "inventory_quantity": 4,
+         "current_discount_percent": 0, "sales_velocity": 0.0, "transaction_count": None},
+    ])
+    store = InventorySummaryStore(products, TODAY)
+
+    assert store.counts.sum(axis=1).tolist() == [2, 0, 1]  # alive, at_risk, expired
+    assert store.week_counts.sum() == 1
+
+    store.record_sale("A", 10)
+    assert store.costs.sum() == 400.0 + 40.0 + 20.0
+
+    # Ten days later A has expired; only A changes bucket
+    assert store.roll_day(TODAY + timedelta(days=10)) == 1
+    assert store.counts.sum(axis=1).tolist() == [1, 0, 2]
+
+
+def test_category_stats_skip_unused_categories():
+    """A categorical category column only yields rows for categories present, on any pandas version"""
+    products = make_products().assign(
+        category=lambda df: pd.Categorical(df["category"], categories=["Bakery", "Dairy", "Snacks"]),
+        total_cost=1.0, actual_revenue_generated=2.0, inventory_turnover_rate=0.5, calculated_dead_stock_risk=0,
+    )
+    expired = products[products["product_id"] != "P4"]
+    stats, _ = expired_category_stats(expired, "price_mrp")
+    assert sorted(stats["category"]) == ["Dairy", "Snacks"]
+
+    performance = category_performance_stats(products, pd.Series([-1, -7, -8, 45], index=products.index))
+    assert performance["product_count"].tolist() == [2, 2]
+    assert not performance.isna().any().any()
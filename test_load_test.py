@@ -0,0 +1,45 @@
+import asyncio
+import os
+import sys
+from argparse import Namespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from load_test import run  # noqa: E402
+from local_backend import LocalSupabase  # noqa: E402
+
+
+def test_inprocess_load_run_against_local_backend():
+    args = Namespace(module='main_supabase_optimized', mode='inprocess', port=0, users=200, products=120,
+                     transactions=1500, seed=3, mix=None, concurrency=4, duration=120.0, requests=40,
+                     timeout=60.0, out=None)
+    report = asyncio.run(run(args))
+
+    assert report['total']['requests'] >= 40
+    assert report['total']['error_rate'] == 0.0, report['endpoints']
+    for summary in report['endpoints'].values():
+        assert sum(summary['histogram'].values()) == summary['requests']
+        assert summary['latency_ms']['p50'] <= summary['latency_ms']['p99']
+
+
+def test_transaction_insert_applies_triggers():
+    import pandas as pd
+    backend = LocalSupabase(
+        pd.DataFrame([{'user_id': 'U1', 'diet_type': 'vegan'}]),
+        pd.DataFrame([{'product_id': 'P1', 'inventory_quantity': 5, 'revenue_generated': 0.0,
+                       'packaging_date': '2025-01-01', 'expiry_date': '2025-02-01'}]),
+        pd.DataFrame(columns=['user_id', 'product_id', 'purchase_date', 'quantity', 'total_price_paid']),
+    )
+    inserted = backend.table('transactions').insert(
+        {'user_id': 'U1', 'product_id': 'P1', 'purchase_date': '2025-01-10', 'quantity': 2, 'total_price_paid': 30.0}
+    ).execute().data
+    assert inserted[0]['transaction_id'] == 1
+    product = backend.table('products').select('inventory_quantity,revenue_generated').eq('product_id', 'P1').execute()
+    assert product.data == [{'inventory_quantity': 3, 'revenue_generated': 30.0}]
+
+
+def test_load_app_restores_create_client():
+    import supabase
+    from load_test import load_app, seed_backend
+    create_client = supabase.create_client
+    load_app('main_supabase_unified', seed_backend(30, 40, 200, seed=1))
+    assert supabase.create_client is create_client
@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import metrics
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from load_test import load_app, seed_backend  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def sample(text, line_prefix):
+    return [line for line in text.splitlines() if line.startswith(line_prefix)]
+
+
+def test_histograms_merge_across_threads():
+    def work():
+        for value in (0.002, 0.02, 20.0):
+            metrics.observe('supabase_request_duration_seconds', value, table='products', operation='select')
+            metrics.inc('supabase_requests_total', table='products', operation='select', status='ok')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    text = metrics.render()
+    assert '# TYPE supabase_request_duration_seconds histogram' in text
+    labels = 'operation="select",table="products"'
+    assert f'supabase_request_duration_seconds_bucket{{{labels},le="0.0025"}} 4' in text
+    assert f'supabase_request_duration_seconds_bucket{{{labels},le="10.0"}} 8' in text
+    assert f'supabase_request_duration_seconds_bucket{{{labels},le="+Inf"}} 12' in text
+    assert f'supabase_request_duration_seconds_count{{{labels}}} 12' in text
+    assert 'supabase_requests_total{operation="select",status="ok",table="products"} 12' in text
+
+
+def test_metrics_endpoint_reports_routes_tables_and_caches():
+    backend = seed_backend(60, 50, 400, seed=9)
+    client = TestClient(load_app('main_supabase_optimized', backend))
+    user_id = backend.tables['users']['user_id'].iloc[0]
+
+    assert client.get(f'/recommendations/{user_id}').status_code == 200
+    assert client.get('/inventory_summary').status_code == 200
+    assert client.get('/no_such_route').status_code == 404
+
+    response = client.get('/metrics')
+    assert response.headers['content-type'].startswith('text/plain')
+    text = response.text
+    assert sample(text, 'http_request_duration_seconds_count{method="GET",route="/recommendations/{user_id}",status="200"}')
+    assert sample(text, 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}')
+    assert sample(text, 'supabase_requests_total{operation="select",status="ok",table="products_enriched"}')
+    assert 'cache_hit_ratio{cache="inventory_summary"} 1.0' in text
+    assert sample(text, 'data_snapshot_age_seconds ')
+    assert 'data_snapshot_rows{table="products"} 50' in text
+    assert sample(text, 'model_build_duration_seconds{stage="preprocess"}')
+    assert sample(text, 'process_resident_memory_bytes ')
+
+    as_json = client.get('/metrics', params={'format': 'json'}).json()
+    assert as_json['data_snapshot_generation'][0]['value'] == 1
@@ -0,0 +1,93 @@
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import product_store
+from unified_waste_reduction_system import UnifiedRecommendationSystem, is_compatible_diet_allergy
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from benchmark_recommendations import make_data  # noqa: E402
+
+
+def test_parse_allergens_formats():
+    assert product_store.parse_allergens(['nuts', 'soy']) == ['nuts', 'soy']
+    assert product_store.parse_allergens("['nuts', 'soy']") == ['nuts', 'soy']
+    assert product_store.parse_allergens('{nuts,soy}') == ['nuts', 'soy']
+    assert product_store.parse_allergens('nuts, soy') == ['nuts', 'soy']
+    assert product_store.parse_allergens('[]') == [] and product_store.parse_allergens(None) == []
+
+
+def test_compact_products_dtypes_and_allergen_bits():
+    df = pd.DataFrame({
+        'product_id': ['P1', 'P2', 'P3', 'P4'],
+        'category': ['Dairy', 'Dairy', 'Snacks', 'Dairy'],
+        'allergens': [['dairy'], [], ['nuts', 'dairy'], ['dairy']],
+        'shelf_life_days': [10, 20, 30, 40],
+        'inventory_quantity': [100, 0, 5, 7],
+        'sales_velocity': [0.5, 0.0, 1.25, 2.0],
+        'price_mrp': [19.99, 5.0, 7.5, 1.0],
+    })
+    compact, vocabulary = product_store.compact_products(df)
+    assert vocabulary == ['dairy', 'nuts']
+    assert isinstance(compact['category'].dtype, pd.CategoricalDtype)
+    assert compact['shelf_life_days'].dtype == np.int16
+    assert compact['inventory_quantity'].dtype == np.int32
+    assert compact['sales_velocity'].dtype == np.float32
+    assert compact['price_mrp'].dtype == np.float64  # prices are served as-is
+    assert compact['allergen_bits'].tolist() == [1, 0, 3, 1]
+    assert compact['allergens'].astype(str).tolist() == ['dairy', '', 'nuts,dairy', 'dairy']
+    assert df['allergens'].iloc[0] == ['dairy']  # input untouched
+
+
+def test_system_keeps_one_compact_base_table():
+    users, products, transactions = make_data(3000, 200, 3, 7, date.today())
+    system = UnifiedRecommendationSystem(users, products, transactions)
+
+    base = system.all_products_df
+    alive = (products['expiry_date'] - pd.Timestamp.now()).dt.days > 0
+    assert len(base) == len(products) and len(system.products_df) == alive.sum()
+    # Alive products come first, in their original order, and products_df is that prefix
+    assert system.products_df['product_id'].tolist() == products.loc[alive, 'product_id'].tolist()
+    assert (base['days_until_expiry'].iloc[len(system.products_df):] <= 0).all()
+    assert 'days_until_expiry' not in products.columns  # caller's frame is not modified
+
+    system.build_content_similarity_matrix()
+    assert list(system.product_features.columns) == ['product_id', 'diet_encoded', 'category_encoded']
+    uncompacted = system.products_df.astype({
+        c: object for c in system.products_df.columns if isinstance(system.products_df[c].dtype, pd.CategoricalDtype)
+    }).memory_usage(deep=True).sum()
+    assert system.products_df.memory_usage(deep=True).sum() * 2 < uncompacted
+
+    # Canonical allergen text still drives the compatibility filter
+    product = system.products_df[system.products_df['allergen_bits'] > 0].iloc[0].to_dict()
+    allergen = product_store.parse_allergens(product['allergens'])[0]
+    assert not is_compatible_diet_allergy({'diet_type': 'non-vegetarian', 'allergies': [allergen]}, product)
+    assert 'allergen_bits' in system.memory_usage().index
+
+
+def test_discount_updates_write_through_the_base_table():
+    users, products, transactions = make_data(600, 100, 3, 8, date.today())
+    system = UnifiedRecommendationSystem(users, products, transactions)
+    urgency = system.product_urgency_scores().copy()
+    system.product_positions(['P0000'])
+
+    at_risk = system.products_df['is_dead_stock_risk'].to_numpy() == 1
+    system.threshold_calculator.get_threshold = lambda product_id: 1000  # every at-risk product is inside its window
+    system.update_discounts_for_at_risk_products()
+
+    n_alive = len(system.products_df)
+    discounts = system.products_df['current_discount_percent'].to_numpy()
+    before = products.set_index('product_id').loc[system.products_df['product_id'], 'current_discount_percent'].to_numpy()
+    raised = discounts > before
+    assert raised.any() and not raised[~at_risk].any()
+    # products_df is still the alive prefix of the base table, with the new discounts in both
+    np.testing.assert_array_equal(system.all_products_df['current_discount_percent'].to_numpy()[:n_alive], discounts)
+    assert np.shares_memory(system.products_df['current_discount_percent'].to_numpy(),
+                            system.all_products_df['current_discount_percent'].to_numpy())
+    # Derived caches were dropped and recompute from the new discounts
+    assert system._urgency_scores is None and system._product_positions is None
+    assert system.pricing_engine.products_df is system.products_df
+    assert not np.array_equal(system.product_urgency_scores(), urgency)
@@ -0,0 +1,42 @@
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+import profiling
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from load_test import load_app, seed_backend  # noqa: E402
+
+
+def test_profiled_requests():
+    assert profiling.is_profiled_request('/recommendations/U1', b'n=10')
+    assert profiling.is_profiled_request('/products', b'page=2&dynamic=true')
+    assert not profiling.is_profiled_request('/products', b'page=2')
+    assert not profiling.is_profiled_request('/health', b'')
+
+
+def test_slow_request_profile_is_kept_and_downloadable(monkeypatch):
+    monkeypatch.setattr(profiling, 'LATENCY_BUDGET_MS', 0.0)  # every profiled request counts as slow
+    monkeypatch.setattr(profiling.sampler, 'interval', 0.0005)
+    backend = seed_backend(100, 120, 1000, seed=11)
+    client = TestClient(load_app('main_supabase_unified', backend))
+    user_id = backend.tables['transactions']['user_id'].iloc[0]
+
+    assert client.get('/health').status_code == 200
+    assert client.get(f'/recommendations/{user_id}').status_code == 200
+
+    profiles = client.get('/admin/profiles').json()['profiles']
+    newest = profiles[0]
+    assert newest['path'] == f'/recommendations/{user_id}' and newest['status'] == 200
+    assert all(p['path'] != '/health' for p in profiles)
+    assert newest['samples'] > 0
+
+    folded = client.get(f"/admin/profiles/{newest['id']}")
+    assert folded.status_code == 200
+    lines = folded.text.splitlines()
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) >= 1
+    # Stacks are rooted at the endpoint function
+    assert all(line.startswith('get_recommendations (main_supabase_unified.py') for line in lines)
+    assert client.get('/admin/profiles/999999').status_code == 404
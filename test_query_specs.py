@@ -0,0 +1,303 @@
+import importlib
+import sys
+from datetime import date, timedelta
+
+import supabase
+from fastapi.testclient import TestClient
+
+TODAY = date.today()
+
+
+class StrictRow(dict):
+    """A row that refuses reads of schema columns the query did not select"""
+
+    def __init__(self, table, schema, data):
+        super().__init__(data)
+        self.table = table
+        self.schema = schema
+
+    def _check(self, key):
+        if key in self.schema and not dict.__contains__(self, key):
+            raise AssertionError(f"column '{key}' of {self.table} read but not projected")
+
+    def __getitem__(self, key):
+        self._check(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        self._check(key)
+        return dict.get(self, key, default)
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    OPS = {
+        'eq': lambda a, b: a == b, 'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b,
+        'lt': lambda a, b: a < b, 'lte': lambda a, b: a <= b, 'in_': lambda a, b: a in b,
+    }
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = None
+        self.count = None
+        self.filters = []
+        self.bounds = None
+        self.payload = None
+        self.action = 'select'
+        self.conflict_column = None
+
+    def select(self, columns, count=None):
+        self.columns = [c.strip() for c in columns.split(',')]
+        self.count = count
+        return self
+
+    def insert(self, data):
+        self.action, self.payload = 'insert', data
+        return self
+
+    def upsert(self, data, on_conflict=None, ignore_duplicates=False):
+        self.action, self.payload = 'insert', data
+        self.conflict_column = on_conflict if ignore_duplicates else None
+        return self
+
+    def update(self, data):
+        self.action, self.payload = 'update', data
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end + 1)
+        return self
+
+    def __getattr__(self, name):
+        if name not in self.OPS:
+            raise AttributeError(name)
+
+        def apply(column, value):
+            self.filters.append((column, self.OPS[name], value))
+            return self
+        return apply
+
+    def execute(self):
+        rows = self.client.tables[self.table]
+        schema = set(rows[0]) if rows else set()
+        if self.action == 'insert':
+            self.client.inserts.append((self.table, self.payload))
+            inserted = []
+            for data in (self.payload if isinstance(self.payload, list) else [self.payload]):
+                if self.conflict_column and any(r.get(self.conflict_column) == data[self.conflict_column] for r in rows):
+                    continue
+                row = {'transaction_id': len(rows) + 1, 'created_at': TODAY.isoformat(), **data}
+                rows.append(row)
+                inserted.append(StrictRow(self.table, schema, row))
+            return FakeResponse(inserted)
+        matched = [r for r in rows if all(op(r[c], v) for c, op, v in self.filters)]
+        if self.action == 'update':
+            for row in matched:
+                row.update(self.payload)
+            return FakeResponse(matched)
+
+        assert self.columns != ['*'], f"select('*') on {self.table}"
+        unknown = set(self.columns) - schema
+        assert not unknown, f"{self.table} has no columns {sorted(unknown)}"
+        total = len(matched)
+        if self.bounds:
+            matched = matched[self.bounds[0]:self.bounds[1]]
+        data = [StrictRow(self.table, schema, {c: r[c] for c in self.columns}) for r in matched]
+        return FakeResponse(data, total if self.count else None)
+
+
+class FakeSupabase:
+    def __init__(self, tables):
+        self.tables = tables
+        self.inserts = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name):
+        return type('FakeRpc', (), {'execute': lambda _: FakeResponse(480)})()
+
+
+def iso(days):
+    return (TODAY + timedelta(days=days)).isoformat()
+
+
+def make_tables():
+    users = [
+        {'user_id': f'U{i}', 'age': 30 + i, 'gender': 'other', 'diet_type': diet, 'allergies': [],
+         'prefers_discount': i % 2 == 0, 'location_lat': 12.9, 'location_lon': 77.6,
+         'preferred_categories': ['Dairy'], 'last_purchase_date': iso(-1),
+         'created_at': iso(-90), 'updated_at': iso(-1)}
+        for i, diet in enumerate(['vegetarian', 'vegan', 'non-vegetarian'])
+    ]
+    products = []
+    for i, (category, diet, expiry) in enumerate([
+        ('Dairy', 'vegetarian', -5), ('Dairy', 'vegan', 3), ('Snacks', 'vegan', 10),
+        ('Snacks', 'non-vegetarian', 40), ('Fruits', 'vegan', 90), ('Fruits', 'vegetarian', -20),
+    ]):
+        products.append({
+            'product_id': f'P{i}', 'name': f'Product {i}', 'category': category, 'brand': 'Brand',
+            'diet_type': diet, 'allergens': [], 'shelf_life_days': 120, 'packaging_date': iso(expiry - 120),
+            'expiry_date': iso(expiry), 'weight_grams': 250, 'price_mrp': 100.0 + i, 'cost_price': 40.0 + i,
+            'current_discount_percent': 5.0 * i, 'inventory_quantity': 50 + 30 * i,
+            'initial_inventory_quantity': 200, 'total_cost': 8000.0, 'revenue_generated': 0.0,
+            'store_location_lat': 12.9, 'store_location_lon': 77.6,
+            'created_at': iso(-90), 'updated_at': iso(-1),
+        })
+    transactions = [
+        {'transaction_id': n + 1, 'user_id': f'U{n % 3}', 'product_id': f'P{n % 5}', 'purchase_date': iso(-n - 1),
+         'quantity': 1 + n % 3, 'price_paid_per_unit': 95.0, 'total_price_paid': 95.0, 'discount_percent': 5.0,
+         'product_diet_type': 'vegan', 'user_diet_type': 'vegan', 'days_to_expiry_at_purchase': 20,
+         'user_engaged_with_deal': n % 2, 'created_at': iso(-n - 1)}
+        for n in range(12)
+    ]
+    enriched = []
+    for p in products:
+        days = (date.fromisoformat(p['expiry_date']) - TODAY).days
+        enriched.append({
+            **p, 'days_past_expiry': max(-days, 0), 'days_until_expiry': days, 'transaction_count': 2,
+            'total_quantity_sold': 4, 'actual_revenue_generated': 380.0, 'avg_discount_taken': 5.0,
+            'deal_engagement_rate': 0.5, 'first_sale_date': iso(-12), 'last_sale_date': iso(-1),
+            'sales_velocity': 0.3, 'inventory_turnover_rate': 0.02, 'calculated_dead_stock_risk': int(0 <= days <= 14),
+            'risk_score': 0.9 if 0 <= days <= 14 else 0.1,
+        })
+    dead_stock = [
+        {k: p[k] for k in ('product_id', 'name', 'category', 'brand', 'days_until_expiry', 'current_discount_percent',
+                           'price_mrp', 'inventory_quantity', 'expiry_date', 'risk_score')}
+        | {'is_dead_stock_risk': 1, 'risk_level': 'HIGH', 'recommended_discount_percent': 30.0, 'potential_loss': 900.0}
+        for p in enriched if p['calculated_dead_stock_risk']
+    ]
+    weekly_inventory = [
+        {'week_number': w, 'week_start': iso(-7 * w - 6), 'week_end': iso(-7 * w), 'alive_products_count': 4,
+         'total_inventory_qty': 400, 'total_inventory_cost': 16000.0, 'sold_inventory_qty': 12,
+         'sold_inventory_cost': 480.0, 'sold_inventory_revenue': 1100.0, 'inventory_utilization_rate_pct': 3.0,
+         'cost_utilization_rate_pct': 3.0}
+        for w in range(1, 7)
+    ]
+    weekly_expired = [
+        {'week_number': w, 'week_start': iso(-7 * w - 6), 'week_end': iso(-7 * w), 'expired_count': 1,
+         'expired_quantity': 50, 'expired_value_mrp': 5000.0, 'expired_value_cost': 2000.0,
+         'expired_by_category': {'Dairy': {'count': 1, 'value_cost': 2000.0}}, 'total_products_in_period': 6,
+         'waste_rate_pct': 16.7}
+        for w in range(1, 7)
+    ]
+    performance = [
+        {'category': c, 'product_count': 2, 'total_inventory': 200, 'total_inventory_value': 8000.0,
+         'total_revenue': 760.0, 'avg_turnover_rate': 0.02, 'avg_days_until_expiry': 20.0, 'at_risk_products': 1,
+         'expired_products': 1, 'avg_discount': 5.0, 'avg_deal_engagement': 0.5}
+        for c in ('Dairy', 'Snacks', 'Fruits')
+    ]
+    patterns = [
+        {'user_id': u['user_id'], 'diet_type': u['diet_type'], 'allergies': [], 'preferred_categories': ['Dairy'],
+         'total_purchases': 4, 'unique_products_purchased': 3, 'categories_purchased': 2, 'total_spent': 380.0,
+         'avg_order_value': 95.0, 'last_purchase_date': iso(-1), 'avg_discount_taken': 5.0,
+         'deal_engagement_rate': 0.5, 'top_category': 'Dairy', 'category_distribution': {'Dairy': 4},
+         'days_since_last_purchase': 1, 'purchase_frequency_per_month': 4.0}
+        for u in users
+    ]
+    summary = [{
+        'alive_products_count': 4, 'alive_inventory_cost': 9000.0, 'alive_inventory_qty': 300,
+        'at_risk_products_count': 2, 'at_risk_inventory_cost': 4000.0, 'at_risk_inventory_qty': 100,
+        'expired_products_count': 2, 'expired_inventory_cost': 3000.0, 'expired_inventory_qty': 80,
+        'total_products_count': 6, 'total_inventory_cost': 16000.0, 'total_inventory_qty': 480,
+        'expiring_within_week_count': 1, 'expiring_within_week_cost': 1000.0,
+        'at_risk_cost_percentage': 25.0, 'expired_cost_percentage': 18.75, 'calculated_at': iso(0),
+    }]
+    summary_by_category = [
+        {'category': c, 'alive_products_count': 1, 'alive_inventory_cost': 3000.0, 'alive_inventory_qty': 100,
+         'at_risk_products_count': 1, 'at_risk_inventory_cost': 1000.0, 'at_risk_inventory_qty': 30,
+         'expired_products_count': 1, 'expired_inventory_cost': 1000.0, 'expired_inventory_qty': 30,
+         'total_products_count': 2, 'total_inventory_cost': 5000.0}
+        for c in ('Dairy', 'Snacks', 'Fruits')
+    ]
+    analytics = [
+        {'product_id': p['product_id'], 'name': p['name'], 'category': p['category'], 'brand': p['brand'],
+         'initial_inventory_quantity': 200, 'current_inventory': p['inventory_quantity'], 'units_sold': 4,
+         'cost_price': p['cost_price'], 'price_mrp': p['price_mrp'], 'initial_investment': 8000.0,
+         'revenue_generated': 380.0, 'gross_profit': 220.0, 'profit_margin': 57.9, 'days_until_expiry': 10,
+         'current_discount_percent': 5.0, 'expiry_date': p['expiry_date'], 'created_at': p['created_at'],
+         'updated_at': p['updated_at']}
+        for p in products
+    ]
+    return {
+        'users': users, 'products': products, 'transactions': transactions, 'products_enriched': enriched,
+        'dead_stock_risk_products': dead_stock, 'weekly_inventory_metrics': weekly_inventory,
+        'weekly_expired_metrics': weekly_expired, 'product_performance_summary': performance,
+        'user_purchase_patterns': patterns, 'inventory_summary': summary,
+        'inventory_summary_by_category': summary_by_category, 'inventory_analytics': analytics,
+    }
+
+
+def load_api(monkeypatch, module_name):
+    """Import an API module against the strict fake client"""
+    fake = FakeSupabase(make_tables())
+    monkeypatch.setattr(supabase, 'create_client', lambda url, key: fake)
+    sys.modules.pop(module_name, None)
+    module = importlib.import_module(module_name)
+    assert module.system is not None, "startup load failed against projected columns"
+    return module
+
+
+OPTIMIZED_ENDPOINTS = [
+    "/dead_stock_risk?min_risk_level=LOW", "/dead_stock_risk?min_risk_level=LOW&dynamic=true",
+    "/products", "/products?include_expired=true&dynamic=true&category=Dairy",
+    "/weekly_inventory?weeks_back=4", "/weekly_inventory?weeks_back=4&metric_type=cost",
+    "/weekly_expired?weeks_back=4", "/weekly_expired?weeks_back=4&metric_type=cost",
+    "/dynamic_pricing/P2", "/categories", "/users", "/expired_products", "/inventory_analytics",
+    "/inventory_summary?include_category_breakdown=true",
+]
+
+
+def test_optimized_endpoints_read_only_projected_columns(monkeypatch):
+    api = load_api(monkeypatch, 'main_supabase_optimized')
+    client = TestClient(api.app)
+
+    for url in OPTIMIZED_ENDPOINTS:
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.text)
+
+    response = client.post("/transactions", json={"user_id": "U1", "product_id": "P2", "quantity": 1})
+    assert response.status_code == 200, response.text
+
+    # View-backed fallbacks used when the in-memory tables are not loaded
+    monkeypatch.setattr(api, 'inventory_store', None)
+    monkeypatch.setattr(api, 'products_df', api.pd.DataFrame())
+    for url in ["/expired_products", "/inventory_analytics", "/inventory_summary?include_category_breakdown=true"]:
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.text)
+
+
+def test_products_pricing_index_built_once_per_snapshot(monkeypatch):
+    """Dynamic /products lookups reuse the snapshot's pricing index instead of rebuilding it per request"""
+    api = load_api(monkeypatch, 'main_supabase_optimized')
+    client = TestClient(api.app)
+    model_products, rows = api.pricing_index
+    assert model_products is api.system.products_df
+
+    for _ in range(2):
+        response = client.get("/products?dynamic=true")
+        assert response.status_code == 200, response.text
+    assert api.pricing_index[1] is rows
+    assert any(product['dynamic_pricing'] for product in response.json()['products'])
+
+    assert client.post("/refresh_data").status_code == 200
+    assert api.pricing_index[0] is api.system.products_df
+    assert api.pricing_index[1] is not rows
+
+
+def test_unified_endpoints_read_only_projected_columns(monkeypatch):
+    api = load_api(monkeypatch, 'main_supabase_unified')
+    client = TestClient(api.app)
+
+    for url in ["/products", "/users", "/inventory_analytics", "/dynamic_pricing/P2"]:
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.text)
+
+    response = client.post("/transactions", json={"user_id": "U1", "product_id": "P2", "quantity": 1})
+    assert response.status_code == 200, response.text
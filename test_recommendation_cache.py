@@ -0,0 +1,106 @@
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import metrics
+from recommendation_cache import RecommendationCache
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from load_test import load_app, seed_backend  # noqa: E402
+
+
+def rows(*product_ids):
+    return [{'product_id': product_id} for product_id in product_ids]
+
+
+def test_invalidation_and_lru():
+    today = [date(2024, 1, 1)]
+    cache = RecommendationCache(max_users=2, low_stock_threshold=2, today=lambda: today[0])
+    cache.put('U1', 1, rows('P1', 'P2'))
+    cache.put('U2', 1, rows('P2', 'P3'))
+    assert cache.get('U1', 1) == rows('P1', 'P2')
+    assert cache.get('U1', 2) is None  # model rebuilt
+    cache.put('U1', 1, rows('P1'))
+    cache.put('U3', 1, rows('P4'))  # evicts U2, the least recently used
+    assert cache.get('U2', 1) is None and len(cache) == 2
+
+    cache.on_purchase('U3', 'P1', available=5)  # buyer only
+    assert cache.get('U3', 1) is None and cache.get('U1', 1) is not None
+    cache.put('U3', 1, rows('P4'))
+    cache.on_purchase('U9', 'P1', available=2)  # P1 ran low: every pool holding it
+    assert cache.get('U1', 1) is None and cache.get('U3', 1) is not None
+
+    today[0] = date(2024, 1, 2)  # urgency moves with the day
+    assert cache.get('U3', 1) is None and len(cache) == 0
+
+
+def test_replaced_candidate_pools_invalidate_entries():
+    class Pools:
+        generated_at = 1.0
+
+        def current(self):
+            return self
+
+    class System:
+        model_generation = 3
+        candidate_pools = Pools()
+
+        def get_hybrid_recommendations(self, user_id, n_recommendations):
+            self.calls = getattr(self, 'calls', 0) + 1
+            return pd.DataFrame({'product_id': [f'P{self.calls}']})
+
+    cache, system = RecommendationCache(), System()
+    assert cache.recommendations(system, 'U1', 1) == cache.recommendations(system, 'U1', 1) == rows('P1')
+    system.candidate_pools.generated_at = 2.0  # the offline job wrote a new file
+    assert cache.recommendations(system, 'U1', 1) == rows('P2')
+
+
+def test_invalidation_during_compute_is_not_lost():
+    cache = RecommendationCache()
+
+    class System:
+        model_generation = 1
+        candidate_pools = None
+
+        def get_hybrid_recommendations(self, user_id, n_recommendations):
+            # A purchase (or a low-stock product elsewhere) lands while the list is computed
+            self.during(user_id)
+            return pd.DataFrame({'product_id': ['P1', 'P2']})
+
+    system = System()
+    for during in (lambda user_id: cache.on_purchase(user_id, 'P1'),
+                   lambda user_id: cache.invalidate_products(['P2'])):
+        system.during = during
+        assert cache.recommendations(system, 'U1', 2) == rows('P1', 'P2')
+        assert cache.get('U1', RecommendationCache.generation(system)) is None
+
+    system.during = lambda user_id: None
+    cache.recommendations(system, 'U1', 2)
+    assert cache.get('U1', RecommendationCache.generation(system)) == rows('P1', 'P2')
+
+
+def test_recommendations_endpoint_serves_pool_slices(monkeypatch):
+    backend = seed_backend(60, 80, 600, seed=4)
+    client = TestClient(load_app('main_supabase_unified', backend))
+    module = sys.modules['main_supabase_unified']
+    calls = []
+    hybrid = module.system.get_hybrid_recommendations
+    monkeypatch.setattr(module.system, 'get_hybrid_recommendations',
+                        lambda *args, **kwargs: calls.append(kwargs) or hybrid(*args, **kwargs))
+    user_id = backend.tables['transactions']['user_id'].iloc[0]
+    metrics.reset()
+
+    first = client.get(f'/recommendations/{user_id}', params={'n': 10}).json()['recommendations']
+    top = client.get(f'/recommendations/{user_id}', params={'n': 3}).json()['recommendations']
+    assert len(calls) == 1 and calls[0]['n_recommendations'] == module.recommendation_cache.pool_size
+    assert top == first[:3]
+    assert 'cache_requests_total{cache="recommendations",result="hit"} 1' in metrics.render()
+
+    # The user's purchase invalidates their list
+    product_id = first[0]['product_id']
+    response = client.post('/transactions', json={'user_id': user_id, 'product_id': product_id, 'quantity': 1})
+    assert response.status_code == 200
+    assert module.recommendation_cache.get(user_id, RecommendationCache.generation(module.system)) is None
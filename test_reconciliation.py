@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from update_revenue_inventory import fetch_reconciliation_diff, format_diff_report  # noqa: E402
+from test_query_specs import FakeResponse  # noqa: E402
+
+
+class RpcClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return type('Rpc', (), {'execute': lambda _: FakeResponse(self.rows)})()
+
+
+def test_dry_run_reports_drift_without_applying():
+    client = RpcClient([
+        {'product_id': 'P1', 'current_revenue': '100.00', 'expected_revenue': '250.50',
+         'current_inventory': 40, 'expected_inventory': 37},
+        {'product_id': 'P2', 'current_revenue': '80.00', 'expected_revenue': '0',
+         'current_inventory': 10, 'expected_inventory': 10},
+    ])
+    diff = fetch_reconciliation_diff(client)
+    assert client.calls == [('reconcile_product_totals', {'apply_changes': False})]
+
+    report = format_diff_report(diff).splitlines()
+    assert report[0] == "2 products out of sync (revenue +70.50, inventory -3 units)"
+    assert report[2].split() == ['P1', '100.00', '->', '250.50', '40', '->', '37']
+    assert format_diff_report(fetch_reconciliation_diff(RpcClient([]))) == "All products match their transactions."
@@ -0,0 +1,72 @@
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from generate_synthetic_data import DIET_RANK, generate_dataset, generate_products, generate_transactions, generate_users  # noqa: E402
+
+TODAY = date(2025, 7, 15)
+
+
+def make_dataset(seed):
+    users = generate_users(2000, np.random.default_rng(seed), TODAY)
+    products = generate_products(600, np.random.default_rng(seed + 1), TODAY)
+    chunks = list(generate_transactions(users, products, 50_000, np.random.default_rng(seed + 2), TODAY, chunk_size=20_000))
+    return users, products, pd.concat(chunks, ignore_index=True)
+
+
+def test_transactions_respect_generator_constraints():
+    users, products, transactions = make_dataset(3)
+    assert len(transactions) == 50_000
+    sales = (transactions
+             .merge(users[['user_id', 'allergies', 'prefers_discount']], on='user_id')
+             .merge(products[['product_id', 'allergens', 'packaging_date', 'expiry_date',
+                              'current_discount_percent', 'price_mrp']], on='product_id'))
+
+    # Diet and allergen compatibility
+    assert (sales['product_diet_type'].map(DIET_RANK) <= sales['user_diet_type'].map(DIET_RANK)).all()
+    assert not any(set(a) & set(b) for a, b in zip(sales['allergies'], sales['allergens']))
+
+    # Purchase inside packaging .. min(expiry, today)
+    purchase = sales['purchase_date']
+    assert (purchase >= sales['packaging_date']).all()
+    assert (purchase <= sales['expiry_date']).all() and (purchase <= pd.Timestamp(TODAY)).all()
+    assert ((sales['expiry_date'] - purchase).dt.days == sales['days_to_expiry_at_purchase']).all()
+
+    # Near-expiry purchases always take the product's discount; prices follow the discount
+    near = sales['days_to_expiry_at_purchase'] <= 7
+    assert (sales.loc[near, 'discount_percent'] == sales.loc[near, 'current_discount_percent']).all()
+    assert (sales.loc[near, 'user_engaged_with_deal'] == 1).all()
+    assert (sales.loc[~sales['prefers_discount'] & ~near, 'user_engaged_with_deal'] == 0).all()
+    expected = (sales['price_mrp'] * (1 - sales['discount_percent'] / 100)).round(2)
+    assert np.allclose(sales['price_paid_per_unit'], expected)
+
+    # Users keep diet-appropriate preferred categories
+    vegan = users[users['diet_type'] == 'vegan']
+    assert not any({'Meat', 'Dairy', 'Cheese'} & set(c) for c in vegan['preferred_categories'])
+    assert users['preferred_categories'].map(len).between(2, 5).all()
+
+
+def test_seeded_output_is_reproducible(tmp_path):
+    first = generate_dataset(tmp_path / 'a', 300, 100, 5000, seed=9, chunk_size=2000, today=TODAY)
+    generate_dataset(tmp_path / 'b', 300, 100, 5000, seed=9, chunk_size=2000, today=TODAY)
+    assert first == {'users': 300, 'products': 100, 'transactions': 5000}
+    for table in first:
+        assert (tmp_path / 'a' / f'{table}.csv').read_text() == (tmp_path / 'b' / f'{table}.csv').read_text()
+
+
+def test_no_product_sells_more_than_its_initial_inventory(tmp_path):
+    # Far more demand than the generated stock: 40k sales over 30 products
+    generate_dataset(tmp_path, 200, 30, 40_000, seed=5, chunk_size=7000, today=TODAY)
+    products = pd.read_csv(tmp_path / 'products.csv')
+    sold = pd.read_csv(tmp_path / 'transactions.csv').groupby('product_id')['quantity'].sum()
+    stock = products.set_index('product_id')
+    sold = sold.reindex(stock.index, fill_value=0)
+    assert (sold <= stock['initial_inventory_quantity']).all()
+    assert (stock['inventory_quantity'] == stock['initial_inventory_quantity']).all()
+    # What is left after the load is the generated stock
+    assert (stock['initial_inventory_quantity'] - sold).between(5, 500).all()
+    assert np.allclose(stock['total_cost'], (stock['initial_inventory_quantity'] * stock['cost_price']).round(2))
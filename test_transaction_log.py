@@ -0,0 +1,188 @@
+from fastapi.testclient import TestClient
+
+from test_query_specs import load_api
+import pytest
+
+from transaction_log import WriteBehindLog, is_retryable
+
+
+class CheckViolation(Exception):
+    code = "23514"
+
+
+class FlakyTable:
+    """Idempotent insert target that fails the first `failures` calls"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.down = False
+        self.calls = []
+        self.rows = {}
+
+    def insert_rows(self, rows):
+        self.calls.append(len(rows))
+        if self.down:
+            raise ConnectionError("supabase unavailable")
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("supabase unavailable")
+        if any(row["quantity"] < 1 for row in rows):
+            raise CheckViolation("violates check constraint")
+        for row in rows:
+            self.rows.setdefault(row["idempotency_key"], row)
+
+
+def open_log(path, table, **kwargs):
+    return WriteBehindLog(str(path), table.insert_rows, retry_backoff=0, **kwargs)
+
+
+def test_group_commit_retries_and_replay(tmp_path):
+    path = tmp_path / "transactions.log"
+    table = FlakyTable(failures=1)
+    log = open_log(path, table, batch_size=3)
+    keys = [log.append({"product_id": "P1", "quantity": 1}) for _ in range(7)]
+
+    # Crash before anything is flushed: a new process replays every queued sale
+    assert [row["idempotency_key"] for row in open_log(path, table).replay()] == keys
+
+    assert log.flush_once() == 3
+    assert log.flush_once() == 3
+    assert log.flush_once() == 1
+    assert log.flush_once() == 0
+    assert table.calls == [3, 3, 3, 1]  # first group retried once
+    assert list(table.rows) == keys
+
+    # Acknowledged rows are not replayed, and replaying twice cannot duplicate
+    assert open_log(path, table).replay() == []
+    log.close()
+
+
+def test_rejected_row_does_not_block_the_group(tmp_path):
+    table = FlakyTable()
+    committed, rejected = [], []
+    log = open_log(tmp_path / "transactions.log", table, max_retries=1,
+                   on_commit=committed.extend, on_reject=lambda rows, error: rejected.extend(rows))
+    good = log.append({"product_id": "P1", "quantity": 2})
+    bad = log.append({"product_id": "P2", "quantity": 0})
+    assert log.flush_once() == 2
+    assert [row["idempotency_key"] for row in committed] == [good]
+    assert [row["idempotency_key"] for row in rejected] == [bad]
+    assert open_log(tmp_path / "transactions.log", table).replay() == []
+    log.close()
+
+
+def test_compaction_keeps_the_unacknowledged_tail(tmp_path):
+    path = tmp_path / "transactions.log"
+    table = FlakyTable()
+    log = open_log(path, table, batch_size=2, compact_bytes=1)
+    keys = [log.append({"product_id": "P1", "quantity": 1}) for _ in range(5)]
+    assert log.flush_once() == 2
+    # Rows still queued are all that is left in the file
+    assert path.read_text().count("\n") == 3
+    assert [row["idempotency_key"] for row in open_log(path, table).replay()] == keys[2:]
+    log.append({"product_id": "P1", "quantity": 1})
+    assert len(open_log(path, table).replay()) == 4
+    log.close()
+
+
+def test_outage_keeps_rows_queued_until_the_database_is_back(tmp_path):
+    path = tmp_path / "transactions.log"
+    table = FlakyTable()
+    table.down = True
+    rejected = []
+    log = open_log(path, table, max_retries=2, on_reject=lambda rows, error: rejected.extend(rows))
+    keys = [log.append({"product_id": "P1", "quantity": 1}) for _ in range(3)]
+    bad = log.append({"product_id": "P2", "quantity": 0})
+
+    with pytest.raises(ConnectionError):
+        log.flush_once()
+    assert rejected == [] and len(log.queue) == 4
+    assert [row["idempotency_key"] for row in open_log(path, table).replay()] == keys + [bad]
+
+    table.down = False
+    assert log.flush_once() == 4
+    assert list(table.rows) == keys and [row["idempotency_key"] for row in rejected] == [bad]
+    assert open_log(path, table).replay() == []
+    log.close()
+
+
+def test_retryable_errors():
+    assert is_retryable(ConnectionError()) and is_retryable(TimeoutError())
+    assert not is_retryable(CheckViolation())
+    status = type("HTTPError", (Exception,), {})
+    for code, retry in ((429, True), (503, True), (500, True), (409, False), (400, False)):
+        error = status()
+        error.status_code = code
+        assert is_retryable(error) == retry
+
+
+def test_write_behind_transactions_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRANSACTION_LOG_PATH", str(tmp_path / "transactions.log"))
+    monkeypatch.setenv("TRANSACTION_LOG_FLUSH_INTERVAL", "3600")
+    api = load_api(monkeypatch, 'main_supabase_optimized')
+    client = TestClient(api.app)
+    tables = []
+    monkeypatch.setattr(api.supabase, 'table', lambda name, table=api.supabase.table: tables.append(name) or table(name))
+
+    response = client.post("/transactions", json={"user_id": "U1", "product_id": "P2", "quantity": 2})
+    assert response.status_code == 200, response.text
+    assert tables == []  # product, user and stock all served from memory
+    body = response.json()
+    assert body["transaction_id"] is None and body["idempotency_key"]
+    assert not [payload for table, payload in api.supabase.inserts if table == 'transactions']
+    assert api.inventory_ledger.pending["P2"] == 2
+
+    assert api.transaction_log.flush_once() == 1
+    [(table, rows)] = api.supabase.inserts
+    assert table == 'transactions' and rows[0]["idempotency_key"] == body["idempotency_key"]
+    assert api.inventory_ledger.pending["P2"] == 0
+    api.transaction_log.close()
+
+
+def test_refused_sale_is_undone_everywhere(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRANSACTION_LOG_PATH", str(tmp_path / "transactions.log"))
+    monkeypatch.setenv("TRANSACTION_LOG_FLUSH_INTERVAL", "3600")
+    api = load_api(monkeypatch, 'main_supabase_optimized')
+    client = TestClient(api.app)
+    row = lambda: api.products_df.loc[api.products_df['product_id'] == 'P2'].iloc[0]
+    before = (api.inventory_store.summary(), row()['inventory_quantity'], api.inventory_ledger.available['P2'])
+
+    response = client.post("/transactions", json={"user_id": "U1", "product_id": "P2", "quantity": 2})
+    assert response.status_code == 200, response.text
+    assert row()['inventory_quantity'] == before[1] - 2 and 'P2' in api.system.fresh_interactions['U1']
+
+    def refuse(rows):
+        raise CheckViolation("inventory_quantity_check")
+    monkeypatch.setattr(api.transaction_log, 'insert_rows', refuse)
+    assert api.transaction_log.flush_once() == 1
+    assert (api.inventory_store.summary(), row()['inventory_quantity'], api.inventory_ledger.available['P2']) == before
+    assert 'U1' not in api.system.fresh_interactions
+    api.transaction_log.close()
+
+
+def test_refused_replayed_sale_restores_the_database_state(monkeypatch, tmp_path):
+    api = load_api(monkeypatch, 'main_supabase_optimized')
+    row = lambda: api.products_df.loc[api.products_df['product_id'] == 'P2'].iloc[0]
+    database = (api.inventory_store.summary(), row()['inventory_quantity'], api.inventory_ledger.available['P2'])
+
+    # An unflushed sale from a previous process
+    path = tmp_path / "transactions.log"
+    previous = WriteBehindLog(str(path), lambda rows: None)
+    previous.append({"user_id": "U1", "product_id": "P2", "quantity": 2, "total_price_paid": 40.0,
+                     "user_engaged_with_deal": 1})
+    previous.close()
+
+    monkeypatch.setenv("TRANSACTION_LOG_PATH", str(path))
+    monkeypatch.setenv("TRANSACTION_LOG_FLUSH_INTERVAL", "3600")
+    api = load_api(monkeypatch, 'main_supabase_optimized')
+    assert row()['inventory_quantity'] == database[1] - 2
+    assert api.inventory_store.summary()['total_inventory_qty'] == database[0]['total_inventory_qty'] - 2
+    assert 'P2' in api.system.fresh_interactions['U1']
+
+    def refuse(rows):
+        raise CheckViolation("inventory_quantity_check")
+    monkeypatch.setattr(api.transaction_log, 'insert_rows', refuse)
+    assert api.transaction_log.flush_once() == 1
+    assert (api.inventory_store.summary(), row()['inventory_quantity'], api.inventory_ledger.available['P2']) == database
+    assert 'U1' not in api.system.fresh_interactions
+    api.transaction_log.close()
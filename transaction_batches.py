@@ -0,0 +1,152 @@
+"""
+Batch transaction ingestion shared by the API modules.
+
+A batch of POS line items is validated against bulk product and user fetches
+(chunked by id), priced with a single vectorized pricing call and written with
+one multi-row insert. Lines that fail validation are reported individually
+without blocking the rest of the batch.
+"""
+from datetime import datetime
+
+import numpy as np
+
+# Ids per .in_() request: keeps the GET query string well under common gateway URL limits
+ID_CHUNK_SIZE = 200
+
+
+def fetch_rows_by_id(spec, client, id_column, ids, chunk_size=ID_CHUNK_SIZE):
+    """Rows of a QuerySpec for all distinct ids, one request per chunk of ids"""
+    ids = sorted(set(ids))
+    rows = []
+    for start in range(0, len(ids), chunk_size):
+        rows.extend(spec.select(client).in_(id_column, ids[start:start + chunk_size]).execute().data)
+    return rows
+
+
+def price_batch(items, products, users, pricing_engine=None, ledger=None):
+    """
+    Validate and price line items.
+
+    products: DataFrame with one row per product (pricing inputs, price_mrp, diet_type,
+    inventory_quantity, days_until_expiry, current_discount_percent).
+    users: user_id -> diet_type.
+    ledger: optional InventoryLedger; accepted lines reserve their stock in it.
+    Returns (results, pending) where results has one dict per line and pending is a
+    list of (line, transaction row) ready for insert.
+    """
+    results = [{
+        "line": line,
+        "user_id": item.user_id,
+        "product_id": item.product_id,
+        "quantity": item.quantity,
+        "status": "failed",
+        "transaction_id": None,
+        "total_price": None,
+        "discount_applied": None,
+        "error": None
+    } for line, item in enumerate(items)]
+
+    if products.empty:
+        for result in results:
+            result["error"] = f"Product {result['product_id']} not found"
+        return results, []
+
+    products = products.drop_duplicates('product_id').set_index('product_id', drop=False)
+    if pricing_engine is not None:
+        discounts = pricing_engine.calculate_dynamic_discounts(products)['recommended_discount']
+    else:
+        discounts = products['current_discount_percent']
+    discounts = discounts.astype(float)
+    unit_prices = products['price_mrp'].astype(float) * (1 - discounts / 100)
+
+    # Inventory is consumed in line order so repeated products in one batch cannot oversell
+    remaining = products['inventory_quantity'].astype(int).to_dict()
+    accepted = []
+    for result in results:
+        product_id = result["product_id"]
+        if product_id not in remaining:
+            result["error"] = f"Product {product_id} not found"
+        elif result["user_id"] not in users:
+            result["error"] = f"User {result['user_id']} not found"
+        elif ledger is not None:
+            reserved, available = ledger.reserve(product_id, result["quantity"], remaining[product_id])
+            if reserved:
+                accepted.append(result)
+            else:
+                result["error"] = f"Insufficient inventory. Available: {available}"
+        elif remaining[product_id] < result["quantity"]:
+            result["error"] = f"Insufficient inventory. Available: {remaining[product_id]}"
+        else:
+            remaining[product_id] -= result["quantity"]
+            accepted.append(result)
+
+    if not accepted:
+        return results, []
+    try:
+        return results, _price_accepted(accepted, products, users, discounts, unit_prices)
+    except Exception:
+        # Give back the stock reserved above; the caller reports the batch as failed
+        if ledger is not None:
+            for result in accepted:
+                ledger.release(result["product_id"], result["quantity"])
+        raise
+
+
+def _price_accepted(accepted, products, users, discounts, unit_prices):
+    """Price all accepted lines at once; returns the pending (line, transaction row) list"""
+    product_ids = [result["product_id"] for result in accepted]
+    quantities = np.array([result["quantity"] for result in accepted])
+    line_discounts = discounts.loc[product_ids].to_numpy()
+    line_unit_prices = unit_prices.loc[product_ids].to_numpy()
+    line_totals = line_unit_prices * quantities
+    product_diets = products['diet_type'].loc[product_ids].tolist()
+    days_to_expiry = products['days_until_expiry'].loc[product_ids].astype(int).tolist()
+    purchase_date = datetime.now().strftime('%Y-%m-%d')
+
+    pending = []
+    for i, result in enumerate(accepted):
+        discount_percent = float(line_discounts[i])
+        result["total_price"] = round(float(line_totals[i]), 2)
+        result["discount_applied"] = discount_percent
+        pending.append((result["line"], {
+            'user_id': result["user_id"],
+            'product_id': result["product_id"],
+            'purchase_date': purchase_date,
+            'quantity': result["quantity"],
+            'price_paid_per_unit': round(float(line_unit_prices[i]), 2),
+            'total_price_paid': result["total_price"],
+            'discount_percent': discount_percent,
+            'product_diet_type': product_diets[i],
+            'user_diet_type': users[result["user_id"]],
+            'days_to_expiry_at_purchase': days_to_expiry[i],
+            'user_engaged_with_deal': 1 if discount_percent > 0 else 0
+        }))
+    return pending
+
+
+def apply_insert_results(results, pending, inserted_rows=None, error=None, ledger=None):
+    """
+    Mark pending lines as created (rows returned in insert order) or failed with `error`,
+    committing or releasing their ledger reservations
+    """
+    if error is None and (inserted_rows is None or len(inserted_rows) != len(pending)):
+        error = "Failed to create transactions"
+    for i, (line, _) in enumerate(pending):
+        result = results[line]
+        if error is None:
+            result["status"] = "created"
+            result["transaction_id"] = inserted_rows[i]['transaction_id']
+            if ledger is not None:
+                ledger.commit(result["product_id"], result["quantity"])
+        else:
+            if ledger is not None:
+                ledger.release(result["product_id"], result["quantity"])
+            result["error"] = error
+            result["total_price"] = None
+            result["discount_applied"] = None
+    return [results[line] for line, _ in pending if results[line]["status"] == "created"]
+
+
+def batch_summary(results):
+    created = sum(1 for result in results if result["status"] == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
@@ -0,0 +1,237 @@
+"""
+Durable write-behind queue for transactions.
+
+The request path appends the priced transaction to a local append-only log and
+fsyncs it; a background flusher group-commits queued rows to the database in
+multi-row upserts when `batch_size` rows are waiting or `flush_interval`
+seconds have passed. Every row carries an idempotency key (unique in the
+transactions table), so retries and replays after a crash never insert twice.
+
+Log records are JSON lines:
+    {"op": "txn", "key": ..., "row": {...}}   queued transaction
+    {"op": "ack", "keys": [...]}               rows committed to the database
+    {"op": "reject", "keys": [...], "error"}   rows the database refused
+On startup every txn without an ack/reject is queued again.
+
+Only errors where the database refused the rows themselves (a constraint or
+check violation, a trigger RAISE) reject them. Anything else - connection
+errors, timeouts, 429 and 5xx responses - leaves the group at the head of the
+queue, and the flusher backs off and retries it until the database is back.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE classes meaning the database refused the data itself: data exception,
+# integrity constraint violation, and RAISE EXCEPTION from a trigger (e.g. insufficient inventory)
+REFUSED_SQLSTATE_CLASSES = ('22', '23', 'P0')
+MAX_RETRY_BACKOFF = 60.0
+
+
+def is_retryable(error):
+    """False only when the database refused the rows; transport errors, timeouts, 429 and 5xx are retryable"""
+    code = str(getattr(error, 'code', None) or '')
+    if code[:2] in REFUSED_SQLSTATE_CLASSES:
+        return False
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return True
+
+
+class WriteBehindLog:
+    def __init__(self, path, insert_rows, batch_size=500, flush_interval=1.0, max_retries=5,
+                 retry_backoff=0.5, on_commit=None, on_reject=None, compact_bytes=64 * 1024 * 1024,
+                 retryable=is_retryable):
+        """
+        insert_rows(rows) writes rows to the database (idempotently on row['idempotency_key']).
+        on_commit(rows) / on_reject(rows, error) are called after a group is acknowledged or refused.
+        retryable(error) tells transient failures from rows the database refused.
+        """
+        self.path = path
+        self.insert_rows = insert_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.on_commit = on_commit
+        self.on_reject = on_reject
+        self.compact_bytes = compact_bytes
+        self.retryable = retryable
+        self.queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        self._thread = None
+        self._file = open(path, 'a+', encoding='utf-8')
+        self._compacted_bytes = 0  # log size right after the last compaction
+
+    # --- request path ---
+
+    def append(self, row, key=None):
+        """Durably queue one transaction row; returns its idempotency key"""
+        key = key or uuid.uuid4().hex
+        row = dict(row, idempotency_key=key)
+        with self._lock:
+            self._write({"op": "txn", "key": key, "row": row})
+            self.queue.append(row)
+            if len(self.queue) >= self.batch_size:
+                self._wakeup.notify()
+        return key
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    # --- recovery ---
+
+    def replay(self):
+        """Queue every logged transaction that was never acknowledged; returns those rows"""
+        self._file.seek(0)
+        pending = {}
+        for line in self._file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash mid-append was never acknowledged to a client
+                continue
+            if record["op"] == "txn":
+                pending[record["key"]] = record["row"]
+            else:
+                for key in record["keys"]:
+                    pending.pop(key, None)
+        self._file.seek(0, os.SEEK_END)
+        rows = list(pending.values())
+        with self._lock:
+            self.queue.extend(rows)
+        if rows:
+            logger.info(f"Replaying {len(rows)} unflushed transactions from {self.path}")
+        return rows
+
+    # --- flusher ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="transaction-write-behind", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._lock:
+                if not self._stopping and len(self.queue) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                while self.flush_once():
+                    failures = 0
+            except Exception as e:
+                # The database is unreachable: the queue keeps every row, back off and try again
+                failures += 1
+                backoff = min(MAX_RETRY_BACKOFF, self.retry_backoff * 2 ** failures)
+                logger.error(f"Write-behind flush failed ({len(self.queue)} rows queued), retrying in {backoff:.1f}s: {e}")
+                if stopping:
+                    return
+                time.sleep(backoff)
+                continue
+            if stopping:
+                return
+
+    def flush_once(self):
+        """
+        Group-commit up to batch_size queued rows; returns the number handled.
+        Raises, leaving the unhandled rows at the head of the queue, when the database is unavailable.
+        """
+        with self._lock:
+            group = [self.queue[i] for i in range(min(self.batch_size, len(self.queue)))]
+        if not group:
+            return 0
+
+        try:
+            self._insert_with_retries(group)
+            committed, rejected = group, []
+        except Exception as group_error:
+            if self.retryable(group_error):
+                raise
+            # The database refused something in the group: find the bad rows one by one
+            logger.warning(f"Group commit of {len(group)} rows refused ({group_error}); retrying rows individually")
+            committed, rejected = [], []
+            for row in group:
+                try:
+                    self._insert_with_retries([row])
+                    committed.append(row)
+                except Exception as row_error:
+                    if self.retryable(row_error):
+                        # Settle the rows handled so far; the rest stay queued
+                        self._settle(len(committed) + len(rejected), committed, rejected)
+                        raise
+                    rejected.append((row, str(row_error)))
+        return self._settle(len(group), committed, rejected)
+
+    def _settle(self, handled, committed, rejected):
+        """Drop the first `handled` queued rows, logging and reporting their outcome"""
+        with self._lock:
+            for _ in range(handled):
+                self.queue.popleft()
+            if committed:
+                self._write({"op": "ack", "keys": [row["idempotency_key"] for row in committed]})
+            for row, error in rejected:
+                self._write({"op": "reject", "keys": [row["idempotency_key"]], "error": error})
+            self._maybe_compact()
+
+        if committed and self.on_commit:
+            self.on_commit(committed)
+        for row, error in rejected:
+            logger.error(f"Transaction {row['idempotency_key']} rejected by the database: {error}")
+            if self.on_reject:
+                self.on_reject([row], error)
+        return handled
+
+    def _insert_with_retries(self, rows):
+        for attempt in range(self.max_retries):
+            try:
+                return self.insert_rows(rows)
+            except Exception as e:
+                if attempt == self.max_retries - 1 or not self.retryable(e):
+                    raise
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def _maybe_compact(self):
+        """
+        Rewrite the log as just the still-queued rows once it outgrows compact_bytes
+        (caller holds the lock). The queue need not be empty, so the file stays bounded
+        by the un-acknowledged tail under sustained load.
+        """
+        if self._file.tell() < max(self.compact_bytes, 2 * self._compacted_bytes):
+            return
+        compacted = self.path + ".compact"
+        with open(compacted, "w", encoding="utf-8") as out:
+            for row in self.queue:
+                out.write(json.dumps({"op": "txn", "key": row["idempotency_key"], "row": row}, separators=(",", ":")) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(compacted, self.path)
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self._file.close()
+        self._file = open(self.path, "a+", encoding="utf-8")
+        self._compacted_bytes = self._file.tell()
+
+    def close(self):
+        """Stop the flusher after draining what it can"""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self._file.close()
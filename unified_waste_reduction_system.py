@@ -2,12 +2,19 @@ import pandas as pd
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.decomposition import TruncatedSVD
-from scipy.sparse import csr_matrix
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from datetime import datetime, timedelta
+import itertools
+import threading
 import warnings
 warnings.filterwarnings('ignore')
+import instrumentation
+import metrics
+import product_store
+import implicit_als
+
+# Increases with every collaborative model fit; cached recommendations are tied to one
+_model_generations = itertools.count(1)
 
 # --- Dynamic Threshold Logic (from dynamic_threshold_system.py) ---
 class DynamicThresholdCalculator:
@@ -20,7 +27,7 @@ class DynamicThresholdCalculator:
         self.category_thresholds = {}
         self.product_thresholds = {}
     def calculate_category_baseline_thresholds(self):
-        category_metrics = self.products_df.groupby('category').agg({
+        category_metrics = self.products_df.groupby('category', observed=True).agg({
             'shelf_life_days': 'mean',
             'product_id': 'count'
         }).rename(columns={'product_id': 'product_count'})
@@ -28,7 +35,7 @@ class DynamicThresholdCalculator:
             self.products_df[['product_id', 'category']], on='product_id')
         # Ensure purchase_date is datetime
         sales_by_category['purchase_date'] = pd.to_datetime(sales_by_category['purchase_date'])
-        category_velocity = sales_by_category.groupby('category').agg({
+        category_velocity = sales_by_category.groupby('category', observed=True).agg({
             'quantity': 'sum',
             'purchase_date': lambda x: (x.max() - x.min()).days + 1
         }).rename(columns={'purchase_date': 'days_active'})
@@ -107,6 +114,7 @@ class DynamicThresholdCalculator:
                 'seasonal_multiplier': seasonal_multiplier
             }
         }
+    @metrics.timed_build('thresholds')
     def calculate_all_thresholds(self):
         self.calculate_category_baseline_thresholds()
         thresholds = []
@@ -132,6 +140,7 @@ class DynamicPricingEngine:
         self.transactions_df = transactions_df
         self.threshold_calculator = threshold_calculator
         
+    @instrumentation.timed('pricing.urgency_score')
     def calculate_dynamic_urgency_score(self, product_row):
         """Calculate dynamic urgency score based on multiple factors"""
         days_until_expiry = product_row['days_until_expiry']
@@ -207,6 +216,7 @@ class DynamicPricingEngine:
         # Cap at 1.0
         return min(final_urgency, 1.0)
     
+    @instrumentation.timed('pricing.discount')
     def calculate_dynamic_discount(self, product_row):
         """Calculate recommended discount based on multiple factors"""
         current_discount = product_row.get('current_discount_percent', 0)
@@ -267,6 +277,86 @@ class DynamicPricingEngine:
             'reasoning': self._get_discount_reasoning(product_row, urgency_score, recommended_discount)
         }
     
+    @instrumentation.timed('pricing.urgency_scores_vectorized')
+    def calculate_dynamic_urgency_scores(self, products):
+        """Vectorized calculate_dynamic_urgency_score over a DataFrame of products"""
+        return self._urgency_and_inputs(products)[0]
+
+    def _urgency_and_inputs(self, products):
+        def column(name, default):
+            if name in products.columns:
+                return products[name].fillna(default).to_numpy(dtype=float)
+            return np.full(len(products), float(default))
+
+        days = products['days_until_expiry'].to_numpy(dtype=float)
+        current_discount = column('current_discount_percent', 0)
+        sales_velocity = column('sales_velocity', 0)
+        inventory_quantity = column('inventory_quantity', 100)
+        is_dead_stock = column('is_dead_stock_risk', 0) != 0
+        if 'avg_user_engagement' in products.columns:
+            avg_engagement = column('avg_user_engagement', 0)
+        else:
+            avg_engagement = column('deal_engagement_rate', 0)
+        threshold = np.array([self.threshold_calculator.get_threshold(pid) for pid in products['product_id']], dtype=float)
+
+        # Same factors as calculate_dynamic_urgency_score
+        with np.errstate(divide='ignore', invalid='ignore'):
+            base_urgency = np.where(days <= threshold, 1 - np.exp(-2 * (threshold - days) / threshold), 0.0)
+            days_to_clear = inventory_quantity / sales_velocity
+            overshoot = np.minimum(0.3, (days_to_clear - days) / days)
+        velocity_multiplier = np.select([sales_velocity < 0.1, sales_velocity < 0.5], [1.5, 1.2], 1.0)
+        discount_multiplier = np.where(current_discount > 0, np.where(avg_engagement < 0.3, 1.3, 1.0), 1.1)
+        dead_stock_multiplier = np.where(is_dead_stock, 1.5, 1.0)
+        category_multipliers = {'Dairy': 1.3, 'Meat': 1.3, 'Beverages': 1.1, 'Snacks': 0.9, 'Biscuits': 0.9}
+        category_multiplier = products['category'].map(category_multipliers).fillna(1.0).to_numpy(dtype=float)
+        inventory_multiplier = np.where(
+            sales_velocity > 0, np.where(days_to_clear > days, 1.2 + overshoot, 1.0), 1.3
+        )
+        urgency = np.minimum(
+            base_urgency * velocity_multiplier * discount_multiplier * dead_stock_multiplier
+            * category_multiplier * inventory_multiplier, 1.0
+        )
+        urgency = np.where(days <= 0, 1.0, urgency)
+        return urgency, days, current_discount, sales_velocity, is_dead_stock
+
+    @instrumentation.timed('pricing.discounts_vectorized')
+    def calculate_dynamic_discounts(self, products):
+        """Vectorized calculate_dynamic_discount over a DataFrame of products (one row per product)"""
+        urgency, days, current_discount, sales_velocity, is_dead_stock = self._urgency_and_inputs(products)
+        price = products['price_mrp'].to_numpy(dtype=float)
+
+        # Recommended discount, same steps as calculate_dynamic_discount
+        base_discount_target = np.select([urgency >= 0.8, urgency >= 0.6, urgency >= 0.4, urgency >= 0.2],
+                                         [50, 40, 30, 20], 10)
+        price_adjustment = np.select([price > 400, price < 100], [0.8, 1.2], 1.0)
+        velocity_adjustment = np.select([(sales_velocity == 0) & (days < 14), sales_velocity < 0.5], [1.5, 1.2], 1.0)
+        recommended = np.maximum(base_discount_target * price_adjustment * velocity_adjustment, current_discount)
+        recommended = np.minimum(recommended, np.where(urgency > 0.8, 70, 50))
+        recommended = np.round(recommended / 5) * 5
+
+        reasoning = []
+        for d, v, dead, u in zip(days, sales_velocity, is_dead_stock, urgency):
+            reasons = []
+            if d <= 7:
+                reasons.append("Critical expiry window")
+            elif d <= 14:
+                reasons.append("Approaching expiry")
+            if v < 0.5:
+                reasons.append("Low sales velocity")
+            if dead:
+                reasons.append("High dead stock risk")
+            if u > 0.7:
+                reasons.append("High urgency score")
+            reasoning.append(", ".join(reasons) if reasons else "Standard pricing optimization")
+
+        return pd.DataFrame({
+            'current_discount': current_discount,
+            'recommended_discount': recommended,
+            'discount_increase': recommended - current_discount,
+            'urgency_score': urgency,
+            'reasoning': reasoning
+        }, index=products.index)
+
     def _get_discount_reasoning(self, product_row, urgency_score, recommended_discount):
         """Generate human-readable reasoning for the discount recommendation"""
         reasons = []
@@ -318,18 +408,19 @@ def calculate_dead_stock_risk_dynamic(row, threshold_calculator):
     return 0
 
 # --- Dietary/Allergy Filtering Logic (from product_recommendation_model_final.py) ---
+DIET_HIERARCHY = {
+    "vegan": 0,
+    "vegetarian": 1,
+    "eggs": 2,
+    "dairy": 2,
+    "non-vegetarian": 3
+}
+
 def is_compatible_diet_allergy(user, product):
     # Diet compatibility
-    diet_hierarchy = {
-        "vegan": 0,
-        "vegetarian": 1,
-        "eggs": 2,
-        "dairy": 2,
-        "non-vegetarian": 3
-    }
     user_diet = user.get('diet_type', 'non-vegetarian').lower()
     product_diet = product.get('diet_type', 'non-vegetarian').lower()
-    if diet_hierarchy.get(product_diet, 3) > diet_hierarchy.get(user_diet, 3):
+    if DIET_HIERARCHY.get(product_diet, 3) > DIET_HIERARCHY.get(user_diet, 3):
         return False
     # Allergen check
     user_allergies = set()
@@ -346,12 +437,52 @@ def is_compatible_diet_allergy(user, product):
         return False
     return True
 
+def diet_ranks(diet_types):
+    """DIET_HIERARCHY rank per diet_type value (unknown counts as non-vegetarian)"""
+    return pd.Series(diet_types).astype(str).str.lower().map(DIET_HIERARCHY).fillna(3).to_numpy(dtype=np.int8)
+
+def user_allergy_mask(user, vocabulary):
+    """The user's allergies (read as is_compatible_diet_allergy reads them) as a bitmask over the allergen vocabulary"""
+    allergies = user.get('allergies')
+    if isinstance(allergies, str):
+        allergies = [a.strip() for a in allergies.split(',') if a.strip()]
+    elif not isinstance(allergies, (set, list)):
+        allergies = []
+    return product_store.allergen_mask(list(allergies), vocabulary)
+
+def compatible_products_mask(user, products, vocabulary):
+    """is_compatible_diet_allergy for every row of a compacted product frame (with allergen_bits) at once"""
+    user_rank = DIET_HIERARCHY.get(str(user.get('diet_type', 'non-vegetarian')).lower(), 3)
+    allergy_bits = user_allergy_mask(user, vocabulary)
+    return (diet_ranks(products['diet_type']) <= user_rank) & (
+        (products['allergen_bits'].to_numpy().astype(np.int64) & allergy_bits) == 0
+    )
+
 def calculate_risk_score(row, threshold):
     expiry_score = max(0, min(0.5, (threshold - row['days_until_expiry']) / threshold * 0.5))
     velocity_score = 0.3 * (1 - min(1, row['sales_velocity'] / 5))
     stagnation_score = 0.2 * min(1, row['days_since_last_sale'] / 30)
     return expiry_score + velocity_score + stagnation_score
 
+def _top_positions(scores, k):
+    """Positions of the k largest finite scores, best first"""
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+def _first_positions(ids):
+    """(distinct ids as a pd.Index, row position of each id's first occurrence)"""
+    index = pd.Index(ids)
+    first = ~index.duplicated()
+    return index[first], np.flatnonzero(first)
+
+def _lookup_positions(positions, ids):
+    index, rows = positions
+    found = index.get_indexer(ids)
+    return np.where(found >= 0, rows[found], -1)
+
 # --- Hybrid Recommendation System (from dynamic_recommendation_system.py, with improved compatibility logic) ---
 class UnifiedRecommendationSystem:
     """
@@ -359,15 +490,31 @@ class UnifiedRecommendationSystem:
     """
     def __init__(self, users_df, products_df, transactions_df):
         self.users_df = users_df
-        self.all_products_df = products_df.copy()
+        self.all_products_df = None  # every product incl. expired; products_df is its alive prefix
+        self._alive_products = None  # the slice of all_products_df that products_df was set to
         self.products_df = products_df
+        self.allergen_vocabulary = []
         self.transactions_df = transactions_df
         self.le_diet = LabelEncoder()
         self.le_category = LabelEncoder()
         self.content_similarity_matrix = None
-        self.user_item_matrix = None
+        self.user_item_matrix = None  # CSR users x products, rows/columns labelled by user_index/product_index
+        self.user_index = None
+        self.product_index = None
+        self.collaborative_model = None
+        self.model_generation = 0
         self.user_factors = None
         self.item_factors = None
+        # Interactions not yet in the collaborative model: user_id -> {product_id: strength}
+        self.fresh_interactions = {}
+        self._folded_users = {}  # user_id -> (factor vector, interacted product positions)
+        self._fold_lock = threading.Lock()
+        self._product_positions = None  # (distinct product ids, their first products_df row)
+        self._user_positions = None
+        self._urgency_scores = None  # product_urgency_scores(), aligned with products_df
+        self._compatibility = None  # (diet rank, allergen bits) per products_df row
+        self._model_positions = None  # (product_index, products_df row of each model column)
+        self.candidate_pools = None  # optional offline pools (candidate_pools.PoolFile), re-ranked per request
         self.product_features = None
         self.threshold_calculator = DynamicThresholdCalculator(products_df, transactions_df)
         self.threshold_calculator.calculate_category_baseline_thresholds()
@@ -382,6 +529,7 @@ class UnifiedRecommendationSystem:
     
     def update_discounts_for_at_risk_products(self):
         # Update current_discount_percent for at-risk products
+        updates = {}
         for idx, row in self.products_df.iterrows():
             if row.get('is_dead_stock_risk', 0) == 1:
                 threshold = self.threshold_calculator.get_threshold(row['product_id'])
@@ -396,9 +544,47 @@ class UnifiedRecommendationSystem:
                     new_discount = min(50, base_discount + add_discount)
                     # Only update if new_discount > base_discount
                     if new_discount > base_discount:
-                        self.products_df.at[idx, 'current_discount_percent'] = new_discount
+                        updates[row['product_id']] = new_discount
+        if updates:
+            self.set_product_values('current_discount_percent', updates)
+    def set_product_values(self, column, values):
+        """
+        Write {product_id: value} into a product column. Writes go to all_products_df and
+        products_df is re-sliced from it (writing into the slice would copy it under
+        copy-on-write and split the two), then every cache derived from the table is dropped.
+        """
+        ids, new_values = list(values), np.asarray(list(values.values()))
+        alive_slice = self.products_df is self._alive_products
+        tables = [self.all_products_df] if alive_slice else [self.all_products_df, self.products_df]
+        for table in tables:
+            if table is None or column not in table.columns:
+                continue
+            positions = _lookup_positions(_first_positions(table['product_id']), ids)
+            found = positions >= 0
+            if table[column].dtype.kind in 'iu' and not np.all(np.mod(new_values[found], 1) == 0):
+                table[column] = table[column].astype(np.float64)
+            table.iloc[positions[found], table.columns.get_loc(column)] = new_values[found]
+        if alive_slice:
+            self._slice_alive_products(len(self.products_df))
+        else:
+            self._reset_product_caches()
+    def _slice_alive_products(self, n_alive):
+        """products_df as the alive prefix of all_products_df"""
+        self.products_df = self._alive_products = self.all_products_df.iloc[:n_alive]
+        self._reset_product_caches()
+    def _reset_product_caches(self):
+        """Drop everything derived from products_df (positions, urgency, compatibility, content features)"""
+        self._product_positions = None
+        self._urgency_scores = None
+        self._compatibility = None
+        self._model_positions = None
+        self.content_similarity_matrix = None
+        if getattr(self, 'pricing_engine', None) is not None:
+            self.pricing_engine.products_df = self.products_df
+    @metrics.timed_build('preprocess')
     def preprocess_data(self):
         current_date = pd.Timestamp.now()
+        self.products_df = self.products_df.copy(deep=False)  # new columns must not leak into the caller's frame
         
         # Ensure date columns are in datetime format
         if not pd.api.types.is_datetime64_any_dtype(self.products_df['expiry_date']):
@@ -436,6 +622,8 @@ class UnifiedRecommendationSystem:
             # Calculate sales velocity (units sold per day)
             sales_metrics['days_on_market'] = (sales_metrics['last_sale_date'] - sales_metrics['first_sale_date']).dt.days + 1
             sales_metrics['sales_velocity'] = sales_metrics['total_quantity_sold'] / sales_metrics['days_on_market']
+            # Only needed for the velocity; not kept on the product table
+            sales_metrics = sales_metrics.drop(columns=['first_sale_date', 'days_on_market'])
 
             # Merge sales metrics with products
             self.products_df = self.products_df.merge(sales_metrics, on='product_id', how='left')
@@ -452,45 +640,61 @@ class UnifiedRecommendationSystem:
             if 'days_since_last_sale' not in self.products_df.columns and 'last_sale_date' in self.products_df.columns:
                 self.products_df['days_since_last_sale'] = (current_date - pd.to_datetime(self.products_df['last_sale_date'])).dt.days
         
-        # Remove already expired products
-        self.products_df = self.products_df[self.products_df['days_until_expiry'] > 0].copy()
-
         # Fill NaN values for products with no sales
-        if 'total_quantity_sold' in self.products_df.columns:
-            self.products_df['total_quantity_sold'].fillna(0, inplace=True)
-        if 'number_of_sales' in self.products_df.columns:
-            self.products_df['number_of_sales'].fillna(0, inplace=True)
-        if 'sales_velocity' in self.products_df.columns:
-            self.products_df['sales_velocity'].fillna(0, inplace=True)
-        if 'days_since_last_sale' in self.products_df.columns:
-            self.products_df['days_since_last_sale'].fillna(999, inplace=True)
+        fills = {'total_quantity_sold': 0, 'number_of_sales': 0, 'sales_velocity': 0, 'days_since_last_sale': 999}
+        for column, value in fills.items():
+            if column in self.products_df.columns:
+                self.products_df[column] = self.products_df[column].fillna(value)
         
         # Use inventory_quantity directly from products (no need to calculate)
         if 'inventory_quantity' not in self.products_df.columns:
             # Default inventory if not present
             self.products_df['inventory_quantity'] = 200
         
-        # Calculate dead stock risk for each product using the threshold calculator
-        self.products_df['is_dead_stock_risk'] = self.products_df.apply(
-            lambda row: calculate_dead_stock_risk_dynamic(row, self.threshold_calculator), axis=1
+        # One compact base table, alive products first (stable, so their order is kept);
+        # products_df is a slice of it rather than a filtered copy
+        alive = (self.products_df['days_until_expiry'] > 0).to_numpy()
+        order = np.argsort(~alive, kind='stable')
+        base, self.allergen_vocabulary = product_store.compact_products(
+            self.products_df.iloc[order].reset_index(drop=True)
         )
+        n_alive = int(alive.sum())
+        
+        # Calculate dead stock risk for each product using the threshold calculator (expired ones are at risk)
+        is_dead_stock_risk = np.ones(len(base), dtype=np.int8)
+        if n_alive:
+            is_dead_stock_risk[:n_alive] = base.iloc[:n_alive].apply(
+                lambda row: calculate_dead_stock_risk_dynamic(row, self.threshold_calculator), axis=1
+            ).to_numpy()
+        base['is_dead_stock_risk'] = is_dead_stock_risk
+        self.all_products_df = base
+        self._slice_alive_products(n_alive)
+        for column, nbytes in product_store.memory_report(base).items():
+            metrics.set_gauge('product_store_bytes', int(nbytes), column=column)
+    def memory_usage(self):
+        """Bytes per column of the product table and content features"""
+        return product_store.memory_report(self.all_products_df, self.product_features)
     def prepare_content_features(self):
-        products = self.products_df.copy()
+        products = self.products_df.copy(deep=False)
         products['content_text'] = (
-            products['name'] + ' ' +
-            products['category'] + ' ' +
-            products['diet_type'] + ' ' +
-            products['brand'] + ' ' +
+            products['name'].astype(str) + ' ' +
+            products['category'].astype(str) + ' ' +
+            products['diet_type'].astype(str) + ' ' +
+            products['brand'].astype(str) + ' ' +
             'price_' + pd.cut(products['price_mrp'], bins=5, labels=['very_low', 'low', 'medium', 'high', 'very_high']).astype(str) + ' '
         )
-        products['allergen_text'] = products['allergens'].apply(
-            lambda x: ' '.join(eval(x)) if isinstance(x, str) and x != '[]' else ''
-        )
+        products['allergen_text'] = products['allergens'].map(lambda x: ' '.join(product_store.parse_allergens(x))).astype(str)
         products['content_text'] += ' ' + products['allergen_text']
-        products['diet_encoded'] = self.le_diet.fit_transform(products['diet_type'])
-        products['category_encoded'] = self.le_category.fit_transform(products['category'])
-        self.product_features = products
+        products['diet_encoded'] = self.le_diet.fit_transform(products['diet_type'].astype(str))
+        products['category_encoded'] = self.le_category.fit_transform(products['category'].astype(str))
+        # Only the encodings are kept; the text is needed once, for the TF-IDF fit
+        self.product_features = pd.DataFrame({
+            'product_id': products['product_id'],
+            'diet_encoded': products['diet_encoded'].astype(np.int16),
+            'category_encoded': products['category_encoded'].astype(np.int16),
+        })
         return products
+    @metrics.timed_build('content_similarity')
     def build_content_similarity_matrix(self):
         products = self.prepare_content_features()
         tfidf = TfidfVectorizer(max_features=100, stop_words='english')
@@ -504,175 +708,266 @@ class UnifiedRecommendationSystem:
         ])
         self.content_similarity_matrix = cosine_similarity(combined_features)
         return self.content_similarity_matrix
+    @metrics.timed_build('collaborative_filtering')
     def build_collaborative_filtering_model(self, n_factors=50):
-        pivot_table = self.transactions_df.pivot_table(
-            index='user_id', columns='product_id', values='quantity', aggfunc='sum', fill_value=0)
-        engagement_pivot = self.transactions_df.pivot_table(
-            index='user_id', columns='product_id', values='user_engaged_with_deal', aggfunc='mean', fill_value=0)
-        self.user_item_matrix = pivot_table + 0.5 * engagement_pivot
-        sparse_matrix = csr_matrix(self.user_item_matrix.values)
-        svd = TruncatedSVD(n_components=n_factors, random_state=42)
-        self.user_factors = svd.fit_transform(sparse_matrix)
-        self.item_factors = svd.components_.T
+        # Sparse from the start: quantity + 0.5 * engagement per (user, product), never a dense pivot
+        self.user_item_matrix, user_ids, product_ids = implicit_als.interaction_matrix(self.transactions_df)
+        self.user_index = pd.Index(user_ids)
+        self.product_index = pd.Index(product_ids)
+        self.collaborative_model = implicit_als.ImplicitALS(factors=n_factors).fit(self.user_item_matrix)
+        self.user_factors = self.collaborative_model.user_factors
+        self.item_factors = self.collaborative_model.item_factors
+        self.model_generation = next(_model_generations)
+        with self._fold_lock:
+            self._folded_users = {}
         return self.user_factors, self.item_factors
+    def reuse_collaborative_model(self, previous):
+        """
+        Adopt the fitted collaborative model of a previous system, with the
+        interactions folded into it since, instead of refitting. Returns False
+        if the previous system has no fitted model.
+        """
+        if previous is None or previous.collaborative_model is None:
+            return False
+        with previous._fold_lock:
+            self.fresh_interactions = {user_id: dict(fresh) for user_id, fresh in previous.fresh_interactions.items()}
+            self._folded_users = dict(previous._folded_users)
+        self.user_item_matrix = previous.user_item_matrix
+        self.user_index = previous.user_index
+        self.product_index = previous.product_index
+        self.collaborative_model = previous.collaborative_model
+        self.model_generation = previous.model_generation
+        self.user_factors = previous.user_factors
+        self.item_factors = previous.item_factors
+        return True
+    def record_interaction(self, user_id, product_id, quantity=1, engaged=0):
+        """
+        Record a purchase made after the collaborative model was fitted and fold
+        the user's updated interactions onto the fixed item factors, so the next
+        recommendation reflects it (new users included) without a refit.
+        A negative quantity (and engaged) retracts a sale recorded earlier.
+        """
+        strength = quantity + implicit_als.ENGAGEMENT_WEIGHT * engaged
+        with self._fold_lock:
+            fresh = self.fresh_interactions.setdefault(user_id, {})
+            fresh[product_id] = fresh.get(product_id, 0) + strength
+            if fresh[product_id] <= 1e-9:
+                del fresh[product_id]
+            if not fresh:
+                del self.fresh_interactions[user_id]
+            self._folded_users.pop(user_id, None)
+        if self.collaborative_model is not None:
+            self._user_vector(user_id)
+    def _user_vector(self, user_id):
+        """(factor vector, interacted product positions) for a user, or None if the model knows nothing of them"""
+        known = user_id in self.user_index
+        if user_id not in self.fresh_interactions:
+            if not known:
+                return None
+            user_idx = self.user_index.get_loc(user_id)
+            return self.user_factors[user_idx], self.user_item_matrix[user_idx].indices
+        with self._fold_lock:
+            folded = self._folded_users.get(user_id)
+            if folded is not None:
+                return folded
+            # Fitted row plus fresh strengths; products the model has never seen carry no factors
+            strengths = {}
+            if known:
+                row = self.user_item_matrix[self.user_index.get_loc(user_id)]
+                strengths = dict(zip(row.indices.tolist(), row.data.tolist()))
+            fresh = self.fresh_interactions[user_id]
+            for position, strength in zip(self.product_index.get_indexer(list(fresh)), fresh.values()):
+                if position >= 0:
+                    strengths[position] = strengths.get(position, 0) + strength
+            if not strengths:
+                return None
+            positions = np.fromiter(strengths, dtype=np.int32, count=len(strengths))
+            vector = self.collaborative_model.fold_in(positions, list(strengths.values()))
+            folded = self._folded_users[user_id] = (vector, positions)
+        metrics.inc('collaborative_fold_ins_total')
+        return folded
+    def purchased_products(self, user_id):
+        """Product ids the user has bought: their collaborative model row (or transactions) plus purchases recorded since"""
+        if self.user_item_matrix is not None:
+            row = self.user_index.get_indexer([user_id])[0]
+            purchased = self.product_index[self.user_item_matrix[row].indices].tolist() if row >= 0 else []
+        else:
+            purchased = self.transactions_df.loc[self.transactions_df['user_id'] == user_id, 'product_id'].tolist()
+        return purchased + list(self.fresh_interactions.get(user_id, ()))
+    def product_positions(self, product_ids):
+        """Row positions in products_df of the given product ids (-1 for expired or unknown ones)"""
+        if self._product_positions is None:
+            self._product_positions = _first_positions(self.products_df['product_id'])
+        return _lookup_positions(self._product_positions, product_ids)
+    def user_record(self, user_id):
+        """The user's users_df row as a dict, or None"""
+        if self._user_positions is None:
+            self._user_positions = _first_positions(self.users_df['user_id'])
+        position = _lookup_positions(self._user_positions, [user_id])[0]
+        return self.users_df.iloc[position].to_dict() if position >= 0 else None
     def get_hybrid_recommendations(self, user_id, n_recommendations=10, content_weight=0.4, collaborative_weight=0.6):
-        user_products = self.transactions_df[
-            self.transactions_df['user_id'] == user_id
-        ]['product_id'].unique()
+        with instrumentation.trace('hybrid.total', user_id=user_id):
+            if self.candidate_pools is not None:
+                with instrumentation.stage('hybrid.candidate_pool'):
+                    pooled = self.candidate_pools.recommend(self, user_id, n_recommendations)
+                if pooled is not None:
+                    return pooled
+            return self._hybrid_recommendations(user_id, n_recommendations, content_weight, collaborative_weight)
+    def _hybrid_recommendations(self, user_id, n_recommendations, content_weight, collaborative_weight):
+        with instrumentation.stage('hybrid.user_history'):
+            user_products = self.transactions_df[
+                self.transactions_df['user_id'] == user_id
+            ]['product_id'].unique()
+            # Purchases recorded since the data snapshot count as history too
+            seen = set(user_products)
+            fresh_products = [p for p in list(self.fresh_interactions.get(user_id, ())) if p not in seen]
+            if fresh_products:
+                user_products = np.concatenate([user_products, fresh_products])
         if len(user_products) == 0:
+            instrumentation.count('hybrid.cold_start_users')
             return self.get_popular_expiring_products(n_recommendations, user_id=user_id)
-        collab_recs = self.get_collaborative_recommendations(user_id, n_recommendations * 2)
-        content_recs_list = []
-        for product_id in user_products[-3:]:
-            content_recs = self.get_content_based_recommendations(product_id, n_recommendations)
-            if not content_recs.empty:
-                content_recs_list.append(content_recs)
-        if content_recs_list:
-            content_recs_combined = pd.concat(content_recs_list).groupby('product_id').agg({
-                'final_score': 'mean',
-                'product_name': 'first',
-                'days_until_expiry': 'first',
-                'category': 'first',
-                'price': 'first',
-                'discount': 'first'
-            }).reset_index()
-        else:
-            content_recs_combined = pd.DataFrame(columns=[
-                'product_id', 'final_score', 'product_name', 'days_until_expiry', 'category', 'price', 'discount'
-            ])
-        all_products = set()
-        if not collab_recs.empty:
-            all_products.update(collab_recs['product_id'].tolist())
-        if not content_recs_combined.empty:
-            all_products.update(content_recs_combined['product_id'].tolist())
-        hybrid_scores = []
-        user = self.users_df[self.users_df['user_id'] == user_id].iloc[0].to_dict()
-        for product_id in all_products:
-            score = 0
-            if not collab_recs.empty and product_id in collab_recs['product_id'].values:
-                collab_score = collab_recs[collab_recs['product_id'] == product_id]['final_score'].iloc[0]
-                score += collaborative_weight * collab_score
-            if not content_recs_combined.empty and product_id in content_recs_combined['product_id'].values:
-                content_score = content_recs_combined[content_recs_combined['product_id'] == product_id]['final_score'].iloc[0]
-                score += content_weight * content_score
-            product_row = self.products_df[self.products_df['product_id'] == product_id]
-            if product_row.empty:
-                continue  # Skip if product not found (e.g., filtered out as expired)
-            product = product_row.iloc[0].to_dict()
-            if not is_compatible_diet_allergy(user, product):
-                continue
-            # Calculate dynamic urgency for this product
-            urgency_score = self.pricing_engine.calculate_dynamic_urgency_score(product)
-            
-            # Apply urgency boost to hybrid score
-            score_with_urgency = score * (1 + urgency_score * 0.5)  # Up to 50% boost
-            
-            hybrid_scores.append({
-                'product_id': product_id,
-                'product_name': product['name'],
-                'hybrid_score': score_with_urgency,
-                'base_score': score,
-                'urgency_score': urgency_score,
-                'days_until_expiry': product['days_until_expiry'],
-                'category': product['category'],
-                'price': product['price_mrp'],
-                'discount': product['current_discount_percent'],
-                'is_dead_stock_risk': product.get('is_dead_stock_risk', 0)
-            })
-            # Add small boost for at-risk products (discount already given)
-            if product.get('is_dead_stock_risk', 0) == 1:
-                at_risk_boost = 0.15  # 15% additional boost
-                hybrid_scores[-1]['hybrid_score'] += at_risk_boost
-        hybrid_df = pd.DataFrame(hybrid_scores)
+        user = self.user_record(user_id) or {}
+        with instrumentation.stage('hybrid.collaborative'):
+            collaborative = self._collaborative_candidates(user_id, user, n_recommendations * 2)
+        instrumentation.count('hybrid.collab_candidates', 0 if collaborative is None else len(collaborative[0]))
+        with instrumentation.stage('hybrid.content'):
+            # One scorer over the last three products, as many candidates as three single-seed lookups gave
+            seeds = user_products[-3:]
+            content = self._content_candidates(seeds, n_recommendations * len(seeds))
+        instrumentation.count('hybrid.content_candidates', 0 if content is None else len(content[0]))
+        with instrumentation.stage('hybrid.blend'):
+            # Scatter both sources' weighted scores onto products_df positions and sum per position
+            sources = [(weight, source) for weight, source in ((collaborative_weight, collaborative), (content_weight, content))
+                       if source is not None]
+            positions = np.concatenate([source[0] for _, source in sources] + [np.array([], dtype=np.int64)])
+            weighted = np.concatenate([weight * source[2] for weight, source in sources] + [np.array([])])
+            positions, slots = np.unique(positions, return_inverse=True)
+            base_scores = np.bincount(slots, weights=weighted, minlength=len(positions))
+            instrumentation.count('hybrid.candidates', len(positions))
+            compatible = self.compatible_mask(user, positions)
+            instrumentation.count('hybrid.filtered_incompatible', int((~compatible).sum()))
+            positions, base_scores = positions[compatible], base_scores[compatible]
+            products = self.products_df.iloc[positions]
+            urgency = self.product_urgency_scores()[positions]
+            at_risk = products['is_dead_stock_risk'].to_numpy() if 'is_dead_stock_risk' in products else np.zeros(len(positions))
+            # Up to 50% urgency boost, plus a small boost for at-risk products (discount already given)
+            hybrid_scores = base_scores * (1 + urgency * 0.5) + np.where(at_risk == 1, 0.15, 0)
+        instrumentation.count('hybrid.scored', len(positions))
+        hybrid_df = pd.DataFrame({
+            'product_id': products['product_id'].to_numpy(),
+            'product_name': products['name'].to_numpy(),
+            'hybrid_score': hybrid_scores,
+            'base_score': base_scores,
+            'urgency_score': urgency,
+            'days_until_expiry': products['days_until_expiry'].to_numpy(),
+            'category': products['category'].to_numpy(),
+            'price': products['price_mrp'].to_numpy(),
+            'discount': products['current_discount_percent'].to_numpy(),
+            'is_dead_stock_risk': at_risk
+        })
         return hybrid_df.nlargest(n_recommendations, 'hybrid_score')
     def get_content_based_recommendations(self, product_id, n_recommendations=10, filter_expired=True, urgency_boost=True):
+        return self.get_multi_seed_content_recommendations([product_id], n_recommendations, filter_expired, urgency_boost)
+    def get_multi_seed_content_recommendations(self, seed_product_ids, n_recommendations=10, filter_expired=True, urgency_boost=True):
+        """
+        Content-based recommendations for several seed products at once: the seeds'
+        similarity rows are averaged, and the expiry filter, urgency boost and top-k
+        run on arrays. Expired or unknown seeds have no similarity row and are skipped.
+        """
+        scored = self._content_candidates(seed_product_ids, n_recommendations, filter_expired, urgency_boost)
+        if scored is None:
+            return pd.DataFrame()
+        top, similarity, final_scores, urgency = scored
+        products = self.products_df.iloc[top]
+        return pd.DataFrame({
+            'product_id': products['product_id'].to_numpy(),
+            'product_name': products['name'].to_numpy(),
+            'similarity_score': similarity,
+            'days_until_expiry': products['days_until_expiry'].to_numpy(),
+            'category': products['category'].to_numpy(),
+            'price': products['price_mrp'].to_numpy(),
+            'discount': products['current_discount_percent'].to_numpy(),
+            'final_score': final_scores,
+            'urgency_score': urgency
+        })
+    def _content_candidates(self, seed_product_ids, n_recommendations, filter_expired=True, urgency_boost=True):
+        """(products_df positions, similarity, final score, urgency) of the top content candidates, or None without a live seed"""
         if self.content_similarity_matrix is None:
             self.build_content_similarity_matrix()
-        # Use all_products_df for lookup to allow for expired products in history
-        product_row = self.all_products_df[self.all_products_df['product_id'] == product_id]
-        if product_row.empty:
-            return pd.DataFrame()  # Product not found, return empty
-        # Find the index in the filtered products_df for similarity
-        filtered_row = self.products_df[self.products_df['product_id'] == product_id]
-        if filtered_row.empty:
-            # If the product is not in the filtered set, pick the first available for similarity (fallback)
-            product_idx = 0
-        else:
-            # Get positional index, not DataFrame index
-            product_idx = self.products_df.index.get_loc(filtered_row.index[0])
-        sim_scores = list(enumerate(self.content_similarity_matrix[product_idx]))
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-        similar_products = []
-        for idx, score in sim_scores[1:]:
-            product = self.products_df.iloc[idx]
-            if filter_expired and product['days_until_expiry'] <= 0:
-                continue
-            recommendation = {
-                'product_id': product['product_id'],
-                'product_name': product['name'],
-                'similarity_score': score,
-                'days_until_expiry': product['days_until_expiry'],
-                'category': product['category'],
-                'price': product['price_mrp'],
-                'discount': product['current_discount_percent']
-            }
-            if urgency_boost:
-                # Use dynamic urgency scoring
-                urgency_score = self.pricing_engine.calculate_dynamic_urgency_score(product)
-                urgency_factor = 1 + urgency_score  # Can boost up to 2x for max urgency
-                recommendation['final_score'] = score * urgency_factor
-                recommendation['urgency_score'] = urgency_score
-            else:
-                recommendation['final_score'] = score
-                recommendation['urgency_score'] = 0
-            similar_products.append(recommendation)
-            if len(similar_products) >= n_recommendations:
-                break
-        return pd.DataFrame(similar_products).sort_values('final_score', ascending=False)
-    def get_collaborative_recommendations(self, user_id, n_recommendations=10, filter_purchased=True, focus_on_expiring=True):
+        seeds = self.product_positions(list(seed_product_ids))
+        seeds = np.unique(seeds[seeds >= 0])
+        if len(seeds) == 0:
+            return None
+        similarity = self.content_similarity_matrix[seeds].mean(axis=0)
+        eligible = np.ones(len(similarity), dtype=bool)
+        eligible[seeds] = False
+        if filter_expired:
+            eligible &= self.products_df['days_until_expiry'].to_numpy() > 0
+        # Dynamic urgency can boost up to 2x
+        urgency = self.product_urgency_scores() if urgency_boost else np.zeros(len(similarity))
+        final_scores = np.where(eligible, similarity * (1 + urgency), -np.inf)
+        top = _top_positions(final_scores, n_recommendations)
+        return top, similarity[top], final_scores[top], urgency[top]
+    def product_urgency_scores(self):
+        """Dynamic urgency of every products_df row, computed once per system (the table does not change)"""
+        if self._urgency_scores is None:
+            self._urgency_scores = self.pricing_engine.calculate_dynamic_urgency_scores(self.products_df)
+        return self._urgency_scores
+    def compatible_mask(self, user, positions):
+        """is_compatible_diet_allergy for the products_df rows at `positions`"""
+        if self._compatibility is None:
+            self._compatibility = (diet_ranks(self.products_df['diet_type']),
+                                   self.products_df['allergen_bits'].to_numpy().astype(np.int64))
+        product_ranks, product_allergens = self._compatibility
+        user_rank = DIET_HIERARCHY.get(str(user.get('diet_type', 'non-vegetarian')).lower(), 3)
+        allergy_bits = user_allergy_mask(user, self.allergen_vocabulary)
+        return (product_ranks[positions] <= user_rank) & ((product_allergens[positions] & allergy_bits) == 0)
+    def _model_product_positions(self):
+        """products_df row of each collaborative model column (-1 for products no longer listed)"""
+        if self._model_positions is None or self._model_positions[0] is not self.product_index:
+            self._model_positions = (self.product_index, self.product_positions(self.product_index))
+        return self._model_positions[1]
+    def _collaborative_candidates(self, user_id, user, n_recommendations, filter_purchased=True, focus_on_expiring=True):
+        """(products_df positions, predicted rating, final score, urgency) of the top collaborative candidates, or None for users the model cannot place"""
         if self.user_factors is None:
             self.build_collaborative_filtering_model()
-        if user_id not in self.user_item_matrix.index:
+        user_entry = self._user_vector(user_id)
+        if user_entry is None:
+            return None
+        user_vector, interacted = user_entry
+        columns = self._model_product_positions()
+        listed = columns >= 0
+        ratings = np.full(len(self.products_df), -np.inf)
+        ratings[columns[listed]] = (self.item_factors[listed] @ user_vector).astype(np.float64)
+        eligible = np.isfinite(ratings) & (self.products_df['days_until_expiry'].to_numpy() > 0)
+        if filter_purchased:
+            purchased = columns[interacted]
+            eligible[purchased[purchased >= 0]] = False
+        candidates = np.flatnonzero(eligible)
+        candidates = candidates[self.compatible_mask(user, candidates)]
+        # Dynamic urgency can boost up to 2x
+        urgency = self.product_urgency_scores()[candidates] if focus_on_expiring else np.zeros(len(candidates))
+        final_scores = ratings[candidates] * (1 + urgency)
+        top = _top_positions(final_scores, n_recommendations)
+        return candidates[top], ratings[candidates[top]], final_scores[top], urgency[top]
+    def get_collaborative_recommendations(self, user_id, n_recommendations=10, filter_purchased=True, focus_on_expiring=True):
+        scored = self._collaborative_candidates(user_id, self.user_record(user_id) or {}, n_recommendations,
+                                                filter_purchased, focus_on_expiring)
+        if scored is None:
             return self.get_popular_expiring_products(n_recommendations, user_id=user_id)
-        user_idx = self.user_item_matrix.index.get_loc(user_id)
-        user_vector = self.user_factors[user_idx]
-        predicted_ratings = np.dot(user_vector, self.item_factors.T)
-        product_ids = self.user_item_matrix.columns
-        recommendations = []
-        user = self.users_df[self.users_df['user_id'] == user_id].iloc[0].to_dict()
-        for idx, rating in enumerate(predicted_ratings):
-            product_id = product_ids[idx]
-            if filter_purchased and self.user_item_matrix.iloc[user_idx, idx] > 0:
-                continue
-            product_row = self.products_df[self.products_df['product_id'] == product_id]
-            if product_row.empty:
-                continue  # Skip if product not found (e.g., filtered out as expired)
-            product = product_row.iloc[0].to_dict()
-            if product['days_until_expiry'] <= 0:
-                continue
-            if not is_compatible_diet_allergy(user, product):
-                continue
-            recommendation = {
-                'product_id': product_id,
-                'product_name': product['name'],
-                'predicted_rating': rating,
-                'days_until_expiry': product['days_until_expiry'],
-                'category': product['category'],
-                'price': product['price_mrp'],
-                'discount': product['current_discount_percent']
-            }
-            if focus_on_expiring:
-                # Use dynamic urgency scoring
-                urgency_score = self.pricing_engine.calculate_dynamic_urgency_score(product)
-                urgency_factor = 1 + urgency_score  # Can boost up to 2x for max urgency
-                recommendation['final_score'] = rating * urgency_factor
-                recommendation['urgency_score'] = urgency_score
-            else:
-                recommendation['final_score'] = rating
-                recommendation['urgency_score'] = 0
-            recommendations.append(recommendation)
-        recommendations_df = pd.DataFrame(recommendations)
-        return recommendations_df.nlargest(n_recommendations, 'final_score')
+        top, ratings, final_scores, urgency = scored
+        products = self.products_df.iloc[top]
+        return pd.DataFrame({
+            'product_id': products['product_id'].to_numpy(),
+            'product_name': products['name'].to_numpy(),
+            'predicted_rating': ratings,
+            'days_until_expiry': products['days_until_expiry'].to_numpy(),
+            'category': products['category'].to_numpy(),
+            'price': products['price_mrp'].to_numpy(),
+            'discount': products['current_discount_percent'].to_numpy(),
+            'final_score': final_scores,
+            'urgency_score': urgency
+        })
     def get_popular_expiring_products(self, n_recommendations=10, user_id=None):
         expiring_products = self.products_df[(self.products_df['days_until_expiry'] > 0) & (self.products_df['days_until_expiry'] <= 30)].copy()
         product_popularity = self.transactions_df.groupby('product_id').agg({